@@ -1,21 +1,38 @@
 # /Users/loanas/Desktop/ClassyCam Project/Backend/app.py
+import time
+STARTUP_BEGAN = time.time() # Before the imports below, so cold-start numbers include them
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routes.stream_routes import router as stream_router
+from routes.event_routes import router as event_router
+from routes.analysis_routes import router as analysis_router
 import logging
 import uvicorn # Ensure uvicorn is imported if used directly here
-from core.video_stream_manager import get_video_stream_manager # Import the manager helper
+from core.video_stream_manager import get_video_stream_manager, DEFAULT_STREAM_ID, MODEL_LOADING # Import the manager helper
+from core.thread_priority import shorten_gil_switch_interval
 
 # --- Logging Configuration (Good to have this near the top) ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# --- FastAPI App Instance (MUST be defined before decorators or middleware) ---
-app = FastAPI()
+# --- Startup / Shutdown ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    shorten_gil_switch_interval() # Pipeline threads share the GIL with the event loop
+    # Start loading the model once the server can already answer /heartbeat
+    app.state.serving_after_seconds = round(time.time() - STARTUP_BEGAN, 3)
+    logger.info(f"API serving {app.state.serving_after_seconds:.2f}s after start (model loading: {MODEL_LOADING}).")
+    if MODEL_LOADING == "background":
+        get_video_stream_manager().start_model_loading()
+    yield
+    # Release every camera when the server shuts down
+    get_video_stream_manager().shutdown()
 
-# --- Get the Singleton VideoStreamManager Instance ---
-stream_manager = get_video_stream_manager()
+# --- FastAPI App Instance (MUST be defined before decorators or middleware) ---
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Middleware ---
 # Place this directly after the app instance is created
@@ -30,18 +47,68 @@ app.add_middleware(
 # --- Include Routers ---
 # Place this after middleware setup
 app.include_router(stream_router)
+app.include_router(event_router)
+app.include_router(analysis_router)
 
 
 # --- API Endpoints (Define your routes here) ---
 
-# This endpoint now correctly uses the stream_manager instance
+def _detected_objects_response(stream_id: str):
+    stream_manager = get_video_stream_manager()
+    if stream_manager.is_running(stream_id):
+        # Using get_detected_objects for raw detections, or get_tracked_persons for tracked data
+        objects = stream_manager.get_tracked_persons(stream_id) # Changed to get_tracked_persons
+        return {"status": "success", "stream_id": stream_id, "objects": objects}
+    return {"status": "error", "stream_id": stream_id, "message": "Stream not active. Start stream first via /start_stream."}
+
+# This endpoint now correctly uses the VideoStreamManager (default stream)
 @app.get("/api/detected_objects")
 async def get_detected_objects():
-    if stream_manager.is_running():
-        # Using get_detected_objects for raw detections, or get_tracked_persons for tracked data
-        objects = stream_manager.get_tracked_persons() # Changed to get_tracked_persons
-        return {"status": "success", "objects": objects}
-    return {"status": "error", "message": "Stream not active. Start stream first via /stream/start."}
+    return _detected_objects_response(DEFAULT_STREAM_ID)
+
+# Per-camera variant of /api/detected_objects
+@app.get("/api/detected_objects/{stream_id}")
+async def get_detected_objects_for_stream(stream_id: str):
+    return _detected_objects_response(stream_id)
+
+# Batch latency and batch fill of the shared inference scheduler
+@app.get("/api/inference_stats")
+async def get_inference_stats():
+    return {"status": "success", "stats": get_video_stream_manager().get_inference_stats()}
+
+# Tune cross-stream batching without restarting the server
+@app.post("/api/inference_config")
+async def set_inference_config(
+    max_batch_size: int = Body(None, embed=True, ge=1),
+    max_wait_ms: float = Body(None, embed=True, ge=0)
+):
+    stats = get_video_stream_manager().configure_inference(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    return {"status": "success", "stats": stats}
+
+# Prometheus scrape endpoint: per-stage latency histograms, FPS, drops, queue depths, viewer send rates
+# Plain def: rendering walks every stream's histograms, so it runs in the threadpool
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(get_video_stream_manager().render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Per-stage p50/p95/p99 (ms) of one stream, for quick checks without Prometheus
+@app.get("/api/profile/{stream_id}")
+async def get_stream_profile(stream_id: str):
+    profile = get_video_stream_manager().get_stream_profile(stream_id)
+    if profile is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"Unknown stream '{stream_id}'."})
+    return {"status": "success", "profile": profile}
+
+# Liveness is /heartbeat; readiness waits for the model (503 while it loads, so orchestrators hold traffic back)
+@app.get("/ready")
+async def readiness():
+    model = get_video_stream_manager().get_model_status()
+    startup = {"serving_after_seconds": getattr(app.state, "serving_after_seconds", None),
+               "ready_after_seconds": round(model["ready_at"] - STARTUP_BEGAN, 3) if model["ready_at"] else None}
+    # In lazy mode the first stream start loads the model, so an unloaded model doesn't make us unready
+    ready = model["state"] == "ready" or (MODEL_LOADING == "lazy" and model["state"] == "not_loaded")
+    content = {"ready": ready, "model": model, "startup": startup}
+    return JSONResponse(status_code=200 if content["ready"] else 503, content=content)
 
 # --- Main execution block ---
 if __name__ == "__main__":
@@ -0,0 +1,215 @@
+# benchmarks/bench_pipeline.py
+"""
+End-to-end benchmark of the live pipeline (capture -> inference -> tracking -> zones -> JPEG).
+
+Run from the Backend folder:
+    python -m benchmarks.bench_pipeline --streams 4 --duration 60 --json pipeline.json
+    python -m benchmarks.bench_pipeline --source recordings/class.mp4 --detector yolo --duration 300
+    python -m benchmarks.bench_pipeline --detector blob --people 100 --tracker-sizes 10 50 100 200
+
+Sources: 'synthetic' (SyntheticCapture, no camera or network needed) or a video file path.
+Detectors: 'yolo' drives the real VideoStreamManager (shared model + InferenceScheduler);
+'blob' runs the same VideoStream/InferenceScheduler classes with ColorBlobDetector so the
+numbers show pipeline overhead without model cost (synthetic source only).
+
+Reported (and written as JSON with --json, for comparing commits):
+  - per-stage p50/p95/p99 and throughput from the built-in StageProfiler, including
+    capture_to_jpeg (frame decoded -> annotated JPEG bytes ready for viewers)
+  - capture/processing FPS and dropped frames per stream
+  - process RSS over the run and its growth rate after warm-up
+  - PersonTracker.update time vs crowd size (see bench_tracker)
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+from benchmarks.synthetic_source import SyntheticCapture, ColorBlobDetector
+from benchmarks.bench_tracker import run_config
+
+
+def rss_mb():
+    """Resident set size of this process in MB (Linux /proc; falls back to peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+class MemorySampler:
+    """Samples RSS on a background thread every `interval` seconds."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.samples = [] # [(seconds since start, rss_mb)]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._start = time.perf_counter()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter() - self._start, rss_mb()))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append((time.perf_counter() - self._start, rss_mb()))
+
+    def summary(self, warmup):
+        values = np.array([rss for _, rss in self.samples])
+        steady = [(t, rss) for t, rss in self.samples if t >= warmup]
+        slope = 0.0
+        if len(steady) >= 2:
+            t, rss = np.array(steady).T
+            slope = float(np.polyfit(t, rss, 1)[0]) * 60.0 # MB per minute
+        return {
+            "start_mb": round(float(values[0]), 1),
+            "end_mb": round(float(values[-1]), 1),
+            "peak_mb": round(float(values.max()), 1),
+            "growth_mb_per_min": round(slope, 3),
+            "samples": [(round(t, 1), round(rss, 1)) for t, rss in self.samples],
+        }
+
+
+def make_source(args, index):
+    if args.source == "synthetic":
+        return SyntheticCapture(width=args.width, height=args.height, fps=args.fps, people=args.people,
+                                seed=args.seed + index, realtime=not args.unpaced)
+    return args.source
+
+
+def start_pipelines(args):
+    """Returns (streams, stop_callable)."""
+    stream_ids = [f"bench-{i}" for i in range(args.streams)]
+    if args.detector == "yolo":
+        from core.video_stream_manager import get_video_stream_manager
+        manager = get_video_stream_manager()
+        for index, stream_id in enumerate(stream_ids):
+            if not manager.start_stream(make_source(args, index), stream_id=stream_id, target_fps=args.target_fps):
+                raise SystemExit(f"Could not start {stream_id}")
+        streams = [manager.get_stream(stream_id) for stream_id in stream_ids]
+        return streams, manager.shutdown
+
+    from core.inference_scheduler import InferenceScheduler
+    from core.video_stream import VideoStream
+    if args.source != "synthetic":
+        raise SystemExit("--detector blob only understands --source synthetic")
+    detector = ColorBlobDetector()
+    scheduler = InferenceScheduler(detector)
+    scheduler.start()
+    streams = []
+    for index, stream_id in enumerate(stream_ids):
+        stream = VideoStream(stream_id, detector, scheduler)
+        stream.update_settings(target_fps=args.target_fps)
+        if not stream.start(make_source(args, index)):
+            raise SystemExit(f"Could not start {stream_id}")
+        streams.append(stream)
+
+    def stop():
+        for stream in streams:
+            stream.stop()
+        scheduler.stop()
+    return streams, stop
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="synthetic", help="'synthetic' or a video file path")
+    parser.add_argument("--detector", default="blob", choices=["blob", "yolo"])
+    parser.add_argument("--streams", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run after warm-up")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds excluded from memory growth")
+    parser.add_argument("--target-fps", type=float, default=None, help="Per-stream processing rate (default: stream default)")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=25.0, help="Synthetic source frame rate")
+    parser.add_argument("--people", type=int, default=10, help="People in the synthetic scene")
+    parser.add_argument("--unpaced", action="store_true", help="Synthetic source delivers frames as fast as possible")
+    parser.add_argument("--memory-interval", type=float, default=1.0)
+    parser.add_argument("--tracker-sizes", type=int, nargs="*", default=[10, 50, 100, 200])
+    parser.add_argument("--tracker-frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR) # Zone alerts would drown the report
+
+    memory = MemorySampler(args.memory_interval)
+    memory.start()
+    streams, stop = start_pipelines(args)
+    started = time.perf_counter()
+    try:
+        time.sleep(args.warmup + args.duration)
+        elapsed = time.perf_counter() - started
+        stream_results = []
+        for stream in streams:
+            status = stream.get_status()
+            stages = stream.get_profile()["stages"]
+            for stage in stages.values():
+                stage["per_second"] = round(stage["count"] / elapsed, 2)
+            stream_results.append({"status": status, "stages": stages})
+    finally:
+        stop()
+        memory.stop()
+
+    tracker_results = [run_config("hungarian", size, args.tracker_frames, args.seed) for size in args.tracker_sizes]
+
+    results = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+        },
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "streams": stream_results,
+        "memory": memory.summary(args.warmup),
+        "tracker_scaling": tracker_results,
+    }
+
+    print(f"{'stream':<10}{'proc fps':>10}{'cap fps':>10}{'dropped':>10}{'e2e p50 ms':>12}{'e2e p95 ms':>12}")
+    for row in stream_results:
+        status, e2e = row["status"], row["stages"].get("capture_to_jpeg", {})
+        print(f"{status['stream_id']:<10}{status['processing_fps']:>10.1f}{status.get('capture_fps', 0):>10.1f}"
+              f"{status.get('frames_dropped', 0):>10}{e2e.get('p50_ms', 0):>12.2f}{e2e.get('p95_ms', 0):>12.2f}")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per sec':>10}")
+    for stage, values in stream_results[0]["stages"].items():
+        print(f"{stage:<16}{values.get('p50_ms', 0):>10.3f}{values.get('p95_ms', 0):>10.3f}"
+              f"{values.get('p99_ms', 0):>10.3f}{values['per_second']:>10.1f}")
+    mem = results["memory"]
+    print(f"RSS {mem['start_mb']} -> {mem['end_mb']} MB (peak {mem['peak_mb']}), growth {mem['growth_mb_per_min']} MB/min")
+    for row in tracker_results:
+        print(f"tracker people={row['people']:<5} mean {row['mean_ms']:.3f} ms  p95 {row['p95_ms']:.3f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
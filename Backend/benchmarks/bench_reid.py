@@ -0,0 +1,143 @@
+# benchmarks/bench_reid.py
+"""
+Re-identification benchmark: ID stability of PersonTracker with and without the ReIdentifier on
+synthetic classroom frames where people are regularly hidden (occlusion / missed detections),
+reappear somewhere else, and the camera is restarted halfway through.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_reid --people 12 --frames 3000
+    python -m benchmarks.bench_reid --budget-ms 1 --json reid.json
+
+People are drawn as boxes with their own shirt/trouser colours on a noisy background; the
+detections are their boxes with some jitter. Reported per run: ID switches (extra IDs given to
+a person), wrong merges (IDs shared by two people), "Unauthorized Entry" events from the zones,
+and the per-frame cost of the re-identification step.
+"""
+import argparse
+import json
+import logging
+import time
+import numpy as np
+from core.person_tracker import PersonTracker
+from core.reid import ReIdentifier
+from core.zone_monitor import ZoneMonitor
+
+WIDTH, HEIGHT = 640, 480
+BOX_W, BOX_H = 40, 100
+AREA = (100, 100, 540, 330) # Where centroids stay: inside the default classroom zone, above its doorway line
+
+
+def scene(num_frames, num_people, hide_rate, seed=0):
+    """
+    Yields (frame, detections, person of each detection, restart) per frame. Each person keeps a
+    colour pair; a hidden person is neither drawn nor detected and may reappear up to 250 px away.
+    """
+    rng = np.random.default_rng(seed)
+    shirts = rng.integers(0, 256, size=(num_people, 3))
+    trousers = rng.integers(0, 256, size=(num_people, 3))
+    positions = rng.uniform(AREA[:2], AREA[2:], size=(num_people, 2))
+    velocities = np.zeros((num_people, 2))
+    hidden = np.zeros(num_people, dtype=np.int64) # Frames left hidden
+    background = rng.integers(60, 120, size=(HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for index in range(num_frames):
+        starting = (hidden == 0) & (rng.random(num_people) < hide_rate)
+        hidden[starting] = rng.integers(5, 120, size=int(starting.sum())) # Some outlast the tracker's max_disappeared
+        jumps = starting & (rng.random(num_people) < 0.5)
+        positions[jumps] += rng.uniform(-250, 250, size=(int(jumps.sum()), 2))
+        velocities += rng.normal(0.0, 0.3, size=velocities.shape)
+        np.clip(velocities, -3.0, 3.0, out=velocities)
+        positions += velocities
+        np.clip(positions, AREA[:2], AREA[2:], out=positions)
+
+        frame = background.copy()
+        detections, people = [], []
+        for person in np.flatnonzero(hidden == 0).tolist():
+            x, y = positions[person]
+            x1, y1 = int(x - BOX_W / 2), int(y - BOX_H / 2)
+            frame[y1 + 15:y1 + 55, x1:x1 + BOX_W] = shirts[person]
+            frame[y1 + 55:y1 + BOX_H, x1 + 5:x1 + BOX_W - 5] = trousers[person]
+            jitter = rng.integers(-3, 4, size=4)
+            detections.append({'class': 'person', 'confidence': 0.9,
+                               'bbox': [x1 + jitter[0], y1 + jitter[1], x1 + BOX_W + jitter[2], y1 + BOX_H + jitter[3]]})
+            people.append(person)
+        hidden = np.maximum(hidden - 1, 0)
+        yield frame, detections, people, index == num_frames // 2
+
+
+def run(args, reid_enabled):
+    tracker = PersonTracker(max_disappeared=50, max_distance=150) # As in VideoStream
+    reidentifier = ReIdentifier("bench", budget_ms=args.budget_ms) if reid_enabled else None
+    zones = ZoneMonitor("bench")
+    ids_of_person = {} # {person: set of IDs shown}
+    people_of_id = {} # {ID: set of persons it was shown on}
+    entries = 0
+    reid_seconds = []
+    timestamp = 1_700_000_000.0
+    for frame, detections, people, restart in scene(args.frames, args.people, args.hide_rate, args.seed):
+        timestamp += 1 / 15
+        if restart: # Camera stop/start: VideoStream and tracker are created anew
+            if reidentifier is not None:
+                reidentifier.end_session(timestamp, zones.in_room_ids())
+            tracker = PersonTracker(max_disappeared=50, max_distance=150)
+            zones = ZoneMonitor("bench")
+        tracked = tracker.update(detections)
+        if reidentifier is not None:
+            start = time.perf_counter()
+            tracked = reidentifier.apply(tracker, tracked, frame, timestamp, zones.in_room_ids())
+            reid_seconds.append(time.perf_counter() - start)
+            for person_id, was_in_room in reidentifier.relinked:
+                if was_in_room:
+                    zones.readmit(person_id)
+        events = zones.check(tracked, WIDTH, HEIGHT, timestamp)
+        entries += sum(1 for event in events if event["type"] == "Unauthorized Entry")
+
+        # tracker.detection_ids: the track each detection went to; with ReID, mapped to the ID actually shown
+        for person, person_id in zip(people, tracker.detection_ids.tolist()):
+            if reidentifier is not None:
+                person_id = reidentifier.stable_id(person_id)
+                if person_id is None:
+                    continue # Still pending: not shown yet
+            ids_of_person.setdefault(person, set()).add(person_id)
+            people_of_id.setdefault(person_id, set()).add(person)
+
+    result = {
+        "reid": reid_enabled,
+        "id_switches": sum(len(ids) - 1 for ids in ids_of_person.values()),
+        "wrong_merges": sum(len(people) - 1 for people in people_of_id.values()),
+        "unauthorized_entries": entries,
+    }
+    if reidentifier is not None:
+        cost = np.array(reid_seconds) * 1000.0
+        result.update({"reid_ms_p50": round(float(np.percentile(cost, 50)), 3),
+                       "reid_ms_p99": round(float(np.percentile(cost, 99)), 3),
+                       "reid_ms_max": round(float(cost.max()), 3), **reidentifier.get_stats()})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--people", type=int, default=12)
+    parser.add_argument("--hide-rate", type=float, default=0.004, help="Chance per person and frame of getting hidden")
+    parser.add_argument("--budget-ms", type=float, default=4.0, help="ReIdentifier per-frame embedding budget")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR) # Every entry/re-link is logged otherwise
+
+    results = [run(args, reid_enabled=False), run(args, reid_enabled=True)]
+    for row in results:
+        line = (f"reid {'on ' if row['reid'] else 'off'}  ID switches {row['id_switches']:>4}  wrong merges {row['wrong_merges']:>3}  "
+                f"entries {row['unauthorized_entries']:>4}")
+        if row["reid"]:
+            line += (f"  relinks {row['reid_relinks']:>4}  embeddings {row['reid_embeddings']:>5} ({row['reid_embedding_ms']} ms each)  "
+                     f"step p50 {row['reid_ms_p50']} / p99 {row['reid_ms_p99']} / max {row['reid_ms_max']} ms")
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# benchmarks/bench_tracker.py
+"""
+Compares PersonTracker matchers on synthetic classroom crowds.
+
+Run from the Backend folder:
+    python -m benchmarks.bench_tracker --sizes 10 50 100 200 --frames 200
+    python -m benchmarks.bench_tracker --json tracker_bench.json
+
+"legacy" is the original nested-loop greedy tracker (kept here only as a baseline);
+the others are the current PersonTracker with different matcher/metric settings.
+Reported per configuration and crowd size: mean/p95 update time and ID switches.
+"""
+import argparse
+import json
+import math
+import time
+import numpy as np
+from core.person_tracker import PersonTracker
+
+
+class LegacyGreedyTracker:
+    """The pre-vectorization PersonTracker.update (math.dist loops + full rescan greedy match)."""
+
+    def __init__(self, max_disappeared=50):
+        self.next_object_id = 0
+        self.objects = {}
+        self.disappeared = {}
+        self.max_disappeared = max_disappeared
+        self.tracked_persons_data = {}
+
+    def _register(self, centroid, bbox_info):
+        self.objects[self.next_object_id] = centroid
+        self.disappeared[self.next_object_id] = 0
+        self.tracked_persons_data[self.next_object_id] = bbox_info
+        self.next_object_id += 1
+
+    def _deregister(self, object_id):
+        del self.objects[object_id]
+        del self.disappeared[object_id]
+        del self.tracked_persons_data[object_id]
+
+    def update(self, detected_persons_info):
+        if len(detected_persons_info) == 0:
+            for object_id in list(self.disappeared.keys()):
+                self.disappeared[object_id] += 1
+                if self.disappeared[object_id] > self.max_disappeared:
+                    self._deregister(object_id)
+            return
+        input_centroids = []
+        for p_info in detected_persons_info:
+            x1, y1, x2, y2 = p_info['bbox']
+            input_centroids.append((int((x1 + x2) / 2.0), int((y1 + y2) / 2.0)))
+        if len(self.objects) == 0:
+            for i, centroid in enumerate(input_centroids):
+                self._register(centroid, detected_persons_info[i])
+            return
+        object_ids = list(self.objects.keys())
+        object_centroids = list(self.objects.values())
+        D = [[math.dist(oc, ic) for ic in input_centroids] for oc in object_centroids]
+        used_rows, used_cols = set(), set()
+        for _ in range(min(len(D), len(D[0]))):
+            min_dist, min_row, min_col = float('inf'), -1, -1
+            for r in range(len(D)):
+                if r in used_rows:
+                    continue
+                for c in range(len(D[r])):
+                    if c in used_cols:
+                        continue
+                    if D[r][c] < min_dist:
+                        min_dist, min_row, min_col = D[r][c], r, c
+            if min_row == -1:
+                break
+            object_id = object_ids[min_row]
+            self.objects[object_id] = input_centroids[min_col]
+            self.disappeared[object_id] = 0
+            self.tracked_persons_data[object_id] = detected_persons_info[min_col]
+            used_rows.add(min_row)
+            used_cols.add(min_col)
+        for r in range(len(D)):
+            if r not in used_rows:
+                object_id = object_ids[r]
+                self.disappeared[object_id] += 1
+                if self.disappeared[object_id] > self.max_disappeared:
+                    self._deregister(object_id)
+        for c in range(len(input_centroids)):
+            if c not in used_cols:
+                self._register(input_centroids[c], detected_persons_info[c])
+
+
+TRACKER_CONFIGS = {
+    "legacy": lambda: LegacyGreedyTracker(max_disappeared=50),
+    "greedy": lambda: PersonTracker(max_disappeared=50, max_distance=150, matcher='greedy'),
+    "hungarian": lambda: PersonTracker(max_disappeared=50, max_distance=150),
+    "hungarian_iou": lambda: PersonTracker(max_disappeared=50, match_metric='iou', min_iou=0.1),
+}
+
+
+def synthetic_crowd(num_people, num_frames, seed=0, width=1920, height=1080, miss_rate=0.05):
+    """
+    Yields (frame_index, detections, ground_truth_ids) for a crowd of people drifting around a room.
+    Detections are in ObjectDetector's dict format; a few are randomly missed each frame.
+    """
+    rng = np.random.default_rng(seed)
+    box_w, box_h = 60, 150
+    positions = rng.uniform([box_w, box_h], [width - box_w, height - box_h], size=(num_people, 2))
+    velocities = rng.normal(0.0, 2.0, size=(num_people, 2))
+    for frame_index in range(num_frames):
+        velocities += rng.normal(0.0, 0.5, size=velocities.shape)
+        np.clip(velocities, -6.0, 6.0, out=velocities)
+        positions += velocities
+        np.clip(positions, [box_w, box_h], [width - box_w, height - box_h], out=positions)
+        jitter = rng.normal(0.0, 1.5, size=positions.shape)
+        visible = rng.random(num_people) >= miss_rate
+        detections, truth = [], []
+        for person, (cx, cy) in enumerate(positions + jitter):
+            if not visible[person]:
+                continue
+            detections.append({'class': 'person', 'confidence': 0.9,
+                               'bbox': [int(cx - box_w / 2), int(cy - box_h / 2), int(cx + box_w / 2), int(cy + box_h / 2)]})
+            truth.append(person)
+        yield frame_index, detections, truth
+
+
+def run_config(name, num_people, num_frames, seed):
+    tracker = TRACKER_CONFIGS[name]()
+    timings_ms = []
+    assigned = {} # ground-truth person -> tracker ID last seen
+    id_switches = 0
+    for _, detections, truth in synthetic_crowd(num_people, num_frames, seed=seed):
+        start = time.perf_counter()
+        tracker.update(detections)
+        timings_ms.append((time.perf_counter() - start) * 1000.0)
+
+        # Which tracker ID ended up holding each detection this frame?
+        if hasattr(tracker, 'detection_ids'):
+            owners = tracker.detection_ids.tolist()
+        else: # Legacy tracker: it keeps the detection dicts themselves
+            owner = {id(info): object_id for object_id, info in tracker.tracked_persons_data.items()}
+            owners = [owner.get(id(detection)) for detection in detections]
+        for person, object_id in zip(truth, owners):
+            if object_id is None or object_id < 0:
+                continue
+            if person in assigned and assigned[person] != object_id:
+                id_switches += 1
+            assigned[person] = object_id
+    timings = np.asarray(timings_ms)
+    return {
+        "tracker": name,
+        "people": num_people,
+        "frames": num_frames,
+        "mean_ms": round(float(timings.mean()), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+        "id_switches": id_switches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100, 200])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--trackers", nargs="+", default=list(TRACKER_CONFIGS), choices=list(TRACKER_CONFIGS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'tracker':<14}{'people':>8}{'mean ms':>12}{'p95 ms':>12}{'ID switches':>14}")
+    for num_people in args.sizes:
+        for name in args.trackers:
+            row = run_config(name, num_people, args.frames, args.seed)
+            results.append(row)
+            print(f"{name:<14}{num_people:>8}{row['mean_ms']:>12.3f}{row['p95_ms']:>12.3f}{row['id_switches']:>14}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "tracker", "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/compare_backends.py
+"""
+Accuracy/latency comparison of ObjectDetector backends on a folder of sample frames.
+
+Run from the Backend folder:
+    python -m benchmarks.compare_backends --frames-dir samples/ --backends pytorch onnx openvino --int8
+    python -m benchmarks.compare_backends --frames-dir samples/ --json backends.json
+
+The PyTorch FP32 model is the reference. For every other backend, detections are matched to the
+reference per frame (same class, IoU >= --iou) and agreement is reported as precision/recall
+against the reference, together with mean/p95 latency per frame.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+from core.object_detector import ObjectDetector
+from core.matching import iou_matrix, linear_assignment
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def load_frames(frames_dir, limit):
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(frames_dir, pattern)))
+    if limit:
+        paths = paths[:limit]
+    frames = [cv2.imread(p) for p in paths]
+    return [f for f in frames if f is not None]
+
+
+def run_backend(detector, frames, warmup):
+    for frame in frames[:warmup]:
+        detector.detect(frame) # First calls include graph compilation / allocation
+    timings_ms, outputs = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        detections = detector.detect(frame)
+        timings_ms.append((time.perf_counter() - start) * 1000.0)
+        outputs.append(detector.to_dicts(detections))
+    return np.asarray(timings_ms), outputs
+
+
+def agreement(reference, candidate, iou_threshold):
+    """Counts candidate detections that match a reference detection of the same class."""
+    matched = 0
+    for class_name in {d['class'] for d in reference} | {d['class'] for d in candidate}:
+        ref_boxes = [d['bbox'] for d in reference if d['class'] == class_name]
+        cand_boxes = [d['bbox'] for d in candidate if d['class'] == class_name]
+        if not ref_boxes or not cand_boxes:
+            continue
+        ious = iou_matrix(ref_boxes, cand_boxes)
+        rows, cols = linear_assignment(1.0 - ious)
+        matched += int(np.count_nonzero(ious[rows, cols] >= iou_threshold))
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames-dir", required=True, help="Folder with sample frames (jpg/png)")
+    parser.add_argument("--model", default="models/yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="Also test the INT8 variant of each exported backend")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N frames")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count a detection as matching the reference")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames_dir, args.limit)
+    if not frames:
+        parser.error(f"No readable frames found in {args.frames_dir}")
+
+    configs = [("pytorch", False)]
+    for backend in args.backends:
+        if backend == "pytorch":
+            continue
+        configs.append((backend, False))
+        if args.int8:
+            configs.append((backend, True))
+
+    reference_outputs = None
+    results = []
+    print(f"{'backend':<18}{'mean ms':>10}{'p95 ms':>10}{'detections':>12}{'precision':>11}{'recall':>9}")
+    for backend, int8 in configs:
+        detector = ObjectDetector(args.model, backend=backend, int8=int8)
+        detector.load_model()
+        timings, outputs = run_backend(detector, frames, args.warmup)
+        if reference_outputs is None:
+            reference_outputs = outputs
+
+        total_ref = sum(len(o) for o in reference_outputs)
+        total_cand = sum(len(o) for o in outputs)
+        matched = sum(agreement(ref, cand, args.iou) for ref, cand in zip(reference_outputs, outputs))
+        row = {
+            "backend": backend,
+            "int8": int8,
+            "model": detector.loaded_model_path,
+            "frames": len(frames),
+            "mean_ms": round(float(timings.mean()), 3),
+            "p95_ms": round(float(np.percentile(timings, 95)), 3),
+            "detections": total_cand,
+            "precision_vs_pytorch": round(matched / total_cand, 4) if total_cand else 1.0,
+            "recall_vs_pytorch": round(matched / total_ref, 4) if total_ref else 1.0,
+        }
+        results.append(row)
+        label = f"{backend}{' int8' if int8 else ''}"
+        print(f"{label:<18}{row['mean_ms']:>10.2f}{row['p95_ms']:>10.2f}{total_cand:>12}"
+              f"{row['precision_vs_pytorch']:>11.3f}{row['recall_vs_pytorch']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "detector_backends", "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/load_heartbeat.py
+"""
+Event-loop responsiveness under load: measures /heartbeat latency while streams are being started
+and stopped over and over and viewers pull scaled /video_feed encodings.
+
+Run from the Backend folder (starts its own server unless --url is given):
+    python -m benchmarks.load_heartbeat --source recordings/class.mp4 --streams 4 --duration 60
+    python -m benchmarks.load_heartbeat --url http://127.0.0.1:8000 --source rtsp://cam/1 --json heartbeat.json
+
+Each stream cycles start (job, wait=false) -> poll /stream_jobs until done -> --hold seconds with
+--viewers clients on /video_feed/<id>?max_width=... -> stop (job) -> poll. A probe process requests
+/heartbeat every --probe-interval seconds over one keep-alive connection, first with nothing
+running (baseline) and then during the load. Exits with status 1 when the load-phase
+--percentile latency is above --max-ms.
+
+Reference runs (defaults: 4 streams, 2 viewers each, 30 s; 640x480 test clip, stub model) on a
+1 vCPU Intel Xeon VM (x86_64, Linux 6.18, Python 3.11.7, 5 GB RAM, ~10% CPU steal):
+    --worker-mode process   p99 under load 5.0-8.2 ms in 6 of 8 runs: PASS; 13.8 and 15.9 ms in two
+                            back-to-back runs while the host was busy (idle baseline p99 11.5 / 7.7 ms)
+    --worker-mode thread    p99 under load 14-20 ms: FAIL; the pipeline threads hold the GIL the event
+                            loop needs, which niceness can't hand over (a 0.2 ms GIL switch interval
+                            halves the tail compared with Python's 5 ms, but not below 10 ms on one core)
+On a single core the limit holds only with worker processes; the VM's steal alone puts the idle
+baseline p99 at 3-12 ms, so compare a failing run against its own baseline and repeat it.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """Tiny JSON client on http.client (one connection per thread; keep-alive)."""
+
+    def __init__(self, base_url, timeout=30.0):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host, self.port, self.timeout = parsed.hostname, parsed.port or 80, timeout
+        self._conn = None
+
+    def request(self, method, path, body=None):
+        """Returns (status, decoded JSON or None, seconds)."""
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            self._conn.request(method, path, body=payload, headers=headers)
+            response = self._conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self._conn.close()
+            self._conn = None
+            raise
+        elapsed = time.perf_counter() - start
+        try:
+            return response.status, json.loads(data), elapsed
+        except ValueError:
+            return response.status, None, elapsed
+
+
+def wait_until_ready(client, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            status, _, _ = client.request("GET", "/ready")
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def probe(base_url, interval, duration):
+    """
+    Requests /heartbeat every interval seconds for duration seconds. Returns the latencies (ms).
+    Runs in its own process so the load generator threads don't add GIL waits to the numbers.
+    """
+    client = Client(base_url)
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            status, _, elapsed = client.request("GET", "/heartbeat")
+            if status == 200:
+                samples.append(elapsed * 1000.0)
+        except OSError:
+            pass
+        time.sleep(interval)
+    return samples
+
+
+def run_job(client, path, body, poll_interval, timeout=120.0):
+    """Submits a start/stop job with wait=false and polls it. Returns (job status, seconds to finish)."""
+    start = time.perf_counter()
+    status, response, _ = client.request("POST", path, {**body, "wait": False})
+    if status != 202:
+        return f"http {status}", time.perf_counter() - start
+    job_id = response["job_id"]
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, response, _ = client.request("GET", f"/stream_jobs/{job_id}")
+        if response and response["job"]["status"] in ("completed", "failed"):
+            return response["job"]["status"], time.perf_counter() - start
+        time.sleep(poll_interval)
+    return "timeout", time.perf_counter() - start
+
+
+def viewer(base_url, stream_id, max_width, stop, counters):
+    """Reads /video_feed/<stream_id> and counts bytes; reconnects whenever the stream ends (it is restarted)."""
+    parsed = urllib.parse.urlsplit(base_url)
+    path = f"/video_feed/{stream_id}?max_width={max_width}"
+    while not stop.is_set():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=5)
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            while not stop.is_set():
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                counters["bytes"] += len(chunk)
+                counters["frames"] += chunk.count(b"--frame")
+        except (OSError, http.client.HTTPException):
+            pass
+        finally:
+            conn.close()
+        stop.wait(0.2)
+
+
+def churn(base_url, stream_id, source, hold, stop, results, poll_interval):
+    """Starts and stops one stream until stop is set."""
+    client = Client(base_url)
+    while not stop.is_set():
+        state, seconds = run_job(client, "/start_stream", {"rtsp_url": source, "stream_id": stream_id}, poll_interval)
+        results["start"].append((state, seconds))
+        stop.wait(hold)
+        state, seconds = run_job(client, "/stop_stream", {"stream_id": stream_id}, poll_interval)
+        results["stop"].append((state, seconds))
+
+
+def machine_info():
+    """What the numbers were measured on; the percentiles depend on it as much as on the server."""
+    return {"cpus": os.cpu_count(), "processor": platform.processor() or platform.machine(),
+            "platform": platform.platform(), "python": platform.python_version()}
+
+
+def latency_summary(samples):
+    if not samples:
+        return {"count": 0}
+    values = np.array(samples)
+    return {"count": int(len(values)), "p50_ms": round(float(np.percentile(values, 50)), 3),
+            "p95_ms": round(float(np.percentile(values, 95)), 3), "p99_ms": round(float(np.percentile(values, 99)), 3),
+            "max_ms": round(float(values.max()), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Video file path or camera URL every stream is opened with")
+    parser.add_argument("--url", help="Running server; default: start 'uvicorn app:app' on --port")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--worker-mode", choices=("process", "thread"), default="process",
+                        help="CLASSYCAM_WORKER_MODE of the server this starts (ignored with --url)")
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--viewers", type=int, default=2, help="/video_feed clients per stream")
+    parser.add_argument("--viewer-width", type=int, default=320, help="max_width the viewers ask for (scaled encodes)")
+    parser.add_argument("--hold", type=float, default=3.0, help="Seconds each stream runs between start and stop")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--baseline", type=float, default=5.0, help="Seconds of probing before the load starts")
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Job status polling interval")
+    parser.add_argument("--client-nice", type=int, default=10,
+                        help="Niceness of the load generator threads; they stand in for remote clients, so on the "
+                             "server's machine they shouldn't compete with it (0 = off)")
+    parser.add_argument("--percentile", type=float, default=99.0)
+    parser.add_argument("--max-ms", type=float, default=10.0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning"],
+                                  cwd=BACKEND_DIR, env={**os.environ, "CLASSYCAM_WORKER_MODE": args.worker_mode})
+    try:
+        if not wait_until_ready(Client(base_url), timeout=300):
+            raise SystemExit(f"{base_url} did not become ready")
+
+        prober = ProcessPoolExecutor(max_workers=1)
+        baseline = prober.submit(probe, base_url, args.probe_interval, args.baseline).result()
+
+        if args.client_nice > 0 and hasattr(os, "nice"):
+            os.nice(args.client_nice) # Linux: only this thread, and the load threads it starts; the probe process keeps its priority
+        stop_load = threading.Event()
+        jobs = {"start": [], "stop": []}
+        counters = {"bytes": 0, "frames": 0}
+        stream_ids = [f"load-{i}" for i in range(args.streams)]
+        threads = [threading.Thread(target=churn, args=(base_url, stream_id, args.source, args.hold, stop_load, jobs, args.poll_interval),
+                                    daemon=True) for stream_id in stream_ids]
+        threads += [threading.Thread(target=viewer, args=(base_url, stream_id, args.viewer_width, stop_load, counters), daemon=True)
+                    for stream_id in stream_ids for _ in range(args.viewers)]
+        for thread in threads:
+            thread.start()
+        loaded = prober.submit(probe, base_url, args.probe_interval, args.duration).result()
+        prober.shutdown()
+        stop_load.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        cleanup = Client(base_url)
+        for stream_id in stream_ids:
+            cleanup.request("POST", "/stop_stream", {"stream_id": stream_id})
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def job_summary(entries):
+        seconds = [s for state, s in entries if state == "completed"]
+        return {"count": len(entries), "completed": len(seconds),
+                "p50_s": round(float(np.median(seconds)), 3) if seconds else None,
+                "max_s": round(max(seconds), 3) if seconds else None}
+
+    limit_value = float(np.percentile(loaded, args.percentile)) if loaded else float("inf")
+    results = {
+        "benchmark": "heartbeat_under_load",
+        "config": vars(args),
+        "machine": machine_info(),
+        "baseline": latency_summary(baseline),
+        "under_load": latency_summary(loaded),
+        "starts": job_summary(jobs["start"]),
+        "stops": job_summary(jobs["stop"]),
+        "viewer_frames": counters["frames"],
+        "viewer_mb": round(counters["bytes"] / (1024 * 1024), 1),
+        "passed": limit_value <= args.max_ms,
+    }
+    machine = results["machine"]
+    print(f"machine     {machine['cpus']} CPU(s), {machine['processor']}, {machine['platform']}, Python {machine['python']}")
+    for phase in ("baseline", "under_load"):
+        row = results[phase]
+        print(f"{phase:<11} {row['count']:>6} probes  p50 {row.get('p50_ms', 0):7.3f}  p95 {row.get('p95_ms', 0):7.3f}  "
+              f"p99 {row.get('p99_ms', 0):7.3f}  max {row.get('max_ms', 0):7.3f} ms")
+    for action in ("starts", "stops"):
+        row = results[action]
+        print(f"{action:<11} {row['completed']}/{row['count']} completed, p50 {row['p50_s']} s, max {row['max_s']} s")
+    print(f"viewers     {results['viewer_frames']} frames, {results['viewer_mb']} MB")
+    print(f"{'PASS' if results['passed'] else 'FAIL'}: p{args.percentile:g} under load {limit_value:.3f} ms (limit {args.max_ms} ms)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    raise SystemExit(0 if results["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
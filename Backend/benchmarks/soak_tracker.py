@@ -0,0 +1,157 @@
+# benchmarks/soak_tracker.py
+"""
+Soak test for the per-frame track state: PersonTracker -> ZoneMonitor -> TrackEventHub ->
+OccupancyTracker over a long run of synthetic frames with constant churn (people keep walking in
+and out, so track IDs keep climbing: ~25k per 100k frames with --lifetime 20).
+
+Run from the Backend folder:
+    python -m benchmarks.soak_tracker --frames 100000 --people 40
+    python -m benchmarks.soak_tracker --frames 1000000 --json soak.json
+
+Every --checkpoint frames it records the traced Python heap (tracemalloc) and the size of each
+internal structure (tracker slot capacity, zone status entries, hub tracks, active occupancy
+records). After --warmup frames the heap must stay flat: the script exits with status 1 when it
+grows by more than --max-growth-mb, or when a structure outgrows the largest crowd seen.
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+import numpy as np
+from core.person_tracker import PersonTracker
+from core.zone_monitor import ZoneMonitor
+from core.track_event_hub import TrackEventHub
+from core.occupancy import OccupancyTracker
+
+WIDTH, HEIGHT = 1280, 720
+BOX_W, BOX_H = 50, 120
+
+
+def churning_crowd(num_frames, mean_people, mean_lifetime, seed=0):
+    """
+    Yields detection lists for a crowd where people enter at the bottom edge, wander for about
+    mean_lifetime frames and leave, so the population stays around mean_people.
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.empty((0, 2))
+    velocities = np.empty((0, 2))
+    remaining = np.empty(0, dtype=np.int64) # Frames left before each person walks out
+    arrival_rate = mean_people / mean_lifetime
+    for _ in range(num_frames):
+        arrivals = rng.poisson(arrival_rate)
+        if arrivals:
+            start = np.column_stack([rng.uniform(BOX_W, WIDTH - BOX_W, arrivals), np.full(arrivals, HEIGHT - BOX_H)])
+            positions = np.vstack([positions, start])
+            velocities = np.vstack([velocities, rng.normal(0.0, 2.0, size=(arrivals, 2))])
+            remaining = np.concatenate([remaining, rng.geometric(1.0 / mean_lifetime, arrivals)])
+        remaining -= 1
+        staying = remaining > 0
+        positions, velocities, remaining = positions[staying], velocities[staying], remaining[staying]
+
+        velocities += rng.normal(0.0, 0.4, size=velocities.shape)
+        np.clip(velocities, -5.0, 5.0, out=velocities)
+        positions += velocities
+        np.clip(positions, [BOX_W, BOX_H], [WIDTH - BOX_W, HEIGHT - BOX_H], out=positions)
+        visible = positions[rng.random(len(positions)) >= 0.05] # A few misses per frame
+        yield [{'class': 'person', 'confidence': 0.9,
+                'bbox': [int(x - BOX_W / 2), int(y - BOX_H / 2), int(x + BOX_W / 2), int(y + BOX_H / 2)]}
+               for x, y in visible.tolist()]
+
+
+def structure_sizes(tracker, zones, hub, occupancy):
+    return {
+        "tracker_capacity": len(tracker._active),
+        "tracker_active": int(tracker._active.sum()),
+        "zone_status": len(zones._person_in_room_status),
+        "zone_prev": len(zones._prev_ids),
+        "hub_tracks": len(hub._tracks),
+        "occupancy_active": len(occupancy._active),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--people", type=int, default=40, help="Mean crowd size")
+    parser.add_argument("--lifetime", type=int, default=60, help="Mean frames a person stays (short = more churn)")
+    parser.add_argument("--checkpoint", type=int, default=10000, help="Frames between memory samples")
+    parser.add_argument("--warmup", type=int, default=20000, help="Frames before the memory baseline is taken")
+    parser.add_argument("--max-growth-mb", type=float, default=2.0, help="Allowed heap growth after warm-up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR) # One zone alert per entering person would drown the report
+
+    tracker = PersonTracker(max_disappeared=15, max_distance=150, matcher='greedy') # Matching quality is not what's tested here
+    zones = ZoneMonitor("soak")
+    hub = TrackEventHub("soak")
+    occupancy = OccupancyTracker("soak")
+
+    tracemalloc.start()
+    checkpoints = []
+    baseline_mb = None
+    largest_crowd = 0
+    events = 0
+    started = time.perf_counter()
+    timestamp = 1_700_000_000.0
+    for frame_index, detections in enumerate(churning_crowd(args.frames, args.people, args.lifetime, args.seed), 1):
+        timestamp += 1 / 15
+        tracked = tracker.update(detections)
+        frame_events = zones.check(tracked, WIDTH, HEIGHT, timestamp)
+        hub.publish(tracked, frame_events)
+        occupancy.update(timestamp, tracked, zones.in_room_ids())
+        events += len(frame_events)
+        largest_crowd = max(largest_crowd, len(tracked))
+
+        if frame_index % args.checkpoint == 0:
+            heap_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+            if baseline_mb is None and frame_index >= args.warmup:
+                baseline_mb = heap_mb
+            checkpoint = {"frame": frame_index, "heap_mb": round(heap_mb, 2), "next_id": tracker.next_object_id,
+                          "events": events, **structure_sizes(tracker, zones, hub, occupancy)}
+            checkpoints.append(checkpoint)
+            print(f"{frame_index:>9} frames  heap {heap_mb:7.2f} MB  ids {tracker.next_object_id:>8}  "
+                  f"capacity {checkpoint['tracker_capacity']:>4}  zone status {checkpoint['zone_status']:>4}  "
+                  f"hub {checkpoint['hub_tracks']:>4}  occupancy {checkpoint['occupancy_active']:>4}")
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+
+    failures = []
+    if baseline_mb is not None:
+        growth = max(c["heap_mb"] for c in checkpoints if c["frame"] >= args.warmup) - baseline_mb
+        if growth > args.max_growth_mb:
+            failures.append(f"heap grew {growth:.2f} MB after warm-up (limit {args.max_growth_mb} MB)")
+    else:
+        growth = None
+        failures.append("run shorter than --warmup; no baseline")
+    # Per-person structures may hold the current crowd plus tracks waiting out max_disappeared, never the ID history
+    bound = 2 * largest_crowd + tracker.max_disappeared
+    for name in ("zone_status", "zone_prev", "hub_tracks", "occupancy_active"):
+        peak = max(c[name] for c in checkpoints) if checkpoints else 0
+        if peak > bound:
+            failures.append(f"{name} reached {peak} entries (largest crowd {largest_crowd})")
+
+    result = {
+        "frames": args.frames,
+        "frames_per_second": round(args.frames / elapsed, 1),
+        "track_ids": tracker.next_object_id,
+        "largest_crowd": largest_crowd,
+        "events": events,
+        "heap_growth_mb": None if growth is None else round(growth, 2),
+        "checkpoints": checkpoints,
+        "failures": failures,
+    }
+    print(f"\n{args.frames} frames in {elapsed:.1f} s ({result['frames_per_second']} fps), {tracker.next_object_id} track IDs, "
+          f"largest crowd {largest_crowd}, heap growth after warm-up {result['heap_growth_mb']} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
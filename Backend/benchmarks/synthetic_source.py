@@ -0,0 +1,120 @@
+# benchmarks/synthetic_source.py
+"""
+Camera-free fixtures for the benchmarks: a synthetic capture object that VideoStream.start() accepts
+in place of an RTSP URL, and a cheap colour-blob detector that finds the synthetic people again.
+"""
+import time
+import cv2
+import numpy as np
+from core.object_detector import DETECTION_DTYPE, empty_detections
+
+PERSON_COLOR = (40, 200, 240) # BGR fill of the synthetic people; the background is grey noise
+
+
+class SyntheticCapture:
+    """
+    Mimics the parts of cv2.VideoCapture used by LatestFrameCapture: people are coloured rectangles
+    walking across a noisy background. Deterministic for a given seed, so runs are comparable.
+    """
+
+    def __init__(self, width=1280, height=720, fps=25.0, people=10, num_frames=None, seed=0, realtime=True):
+        """
+        Args:
+            num_frames (int): Frames before read() starts failing like an ended file (None = endless).
+            realtime (bool): Sleep so frames arrive at `fps` like a camera; False decodes as fast as possible.
+        """
+        self.width, self.height, self.fps = width, height, fps
+        self.num_frames = num_frames
+        self.realtime = realtime
+        self._rng = np.random.default_rng(seed)
+        self._positions = self._rng.uniform((0, 0), (width - 60, height - 150), size=(people, 2))
+        self._velocities = self._rng.normal(0, 3.0, size=(people, 2))
+        self._background = self._rng.integers(90, 130, size=(height, width, 3), dtype=np.uint8)
+        self._frame_index = 0
+        self._opened = True
+        self._next_frame_time = time.perf_counter()
+
+    def isOpened(self):
+        return self._opened
+
+    def release(self):
+        self._opened = False
+
+    def set(self, prop_id, value):
+        return False
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        return 0.0
+
+    def read(self):
+        if not self._opened or (self.num_frames is not None and self._frame_index >= self.num_frames):
+            return False, None
+        if self.realtime:
+            delay = self._next_frame_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_time = max(self._next_frame_time + 1.0 / self.fps, time.perf_counter())
+
+        # Walk and bounce off the borders
+        self._positions += self._velocities
+        limits = np.array([self.width - 60, self.height - 150])
+        bounced = (self._positions < 0) | (self._positions > limits)
+        self._velocities[bounced] *= -1
+        np.clip(self._positions, 0, limits, out=self._positions)
+
+        frame = self._background.copy()
+        for x, y in self._positions.astype(int):
+            cv2.rectangle(frame, (x, y), (x + 60, y + 150), PERSON_COLOR, -1)
+        self._frame_index += 1
+        return True, frame
+
+    def __repr__(self):
+        return f"SyntheticCapture({self.width}x{self.height}@{self.fps}, people={len(self._positions)})"
+
+
+class ColorBlobDetector:
+    """
+    Stand-in for ObjectDetector on SyntheticCapture frames: thresholds PERSON_COLOR and returns
+    connected components as 'person' detections. Isolates pipeline overhead from model cost.
+    """
+    class_names = {0: 'person'}
+    person_class_id = 0
+    model = True # VideoStream only checks that a model is loaded
+
+    def __init__(self, min_area=500):
+        self.min_area = min_area
+        self._lower = np.array([c - 10 for c in PERSON_COLOR], dtype=np.uint8)
+        self._upper = np.array([c + 10 for c in PERSON_COLOR], dtype=np.uint8)
+        self.loaded_model_path = "color-blob"
+
+    def detect(self, frame, classes=None, min_confidence=0.0, imgsz=None):
+        mask = cv2.inRange(frame, self._lower, self._upper)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        stats = stats[1:count] # Component 0 is the background
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.min_area]
+        if len(stats) == 0:
+            return empty_detections()
+        detections = np.empty(len(stats), dtype=DETECTION_DTYPE)
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        detections['bbox'] = np.stack([x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]], axis=1)
+        detections['confidence'] = 1.0
+        detections['class_id'] = 0
+        return detections
+
+    def detect_batch(self, frames, classes=None, min_confidence=0.0, imgsz=None):
+        return [self.detect(frame) for frame in frames]
+
+    def draw_detections(self, frame, detections, classes=None):
+        for x1, y1, x2, y2 in detections['bbox'].tolist():
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        return frame
+
+    def to_dicts(self, detections):
+        return [{'class': 'person', 'confidence': round(float(c), 2), 'bbox': b}
+                for b, c in zip(detections['bbox'].tolist(), detections['confidence'].tolist())]
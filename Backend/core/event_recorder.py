@@ -0,0 +1,277 @@
+# src/core/event_recorder.py
+import os
+import re
+import json
+import shutil
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+# Event recordings: JPEG burst (+ optional MJPEG clip) of the seconds around each zone event
+RECORDING_ENABLED = os.getenv("CLASSYCAM_RECORDING", "1") == "1"
+RECORDINGS_DIR = os.getenv("CLASSYCAM_RECORDINGS_DIR", "data/recordings")
+RECORD_PRE_SECONDS = float(os.getenv("CLASSYCAM_RECORD_PRE_SECONDS", "3"))
+RECORD_POST_SECONDS = float(os.getenv("CLASSYCAM_RECORD_POST_SECONDS", "3"))
+RECORD_BURST_FPS = float(os.getenv("CLASSYCAM_RECORD_BURST_FPS", "5")) # Frames per second kept in the JPEG burst
+RECORD_CLIP = os.getenv("CLASSYCAM_RECORD_CLIP", "0") == "1" # Also write clip.avi (decodes every frame once)
+PREROLL_MAX_MB = float(os.getenv("CLASSYCAM_PREROLL_MAX_MB", "16")) # Per-stream ring buffer cap
+# Retention: recordings older than this many days, or beyond this total size, are deleted (oldest first)
+RECORDINGS_MAX_AGE_DAYS = float(os.getenv("CLASSYCAM_RECORDINGS_MAX_AGE_DAYS", "7"))
+RECORDINGS_MAX_MB = float(os.getenv("CLASSYCAM_RECORDINGS_MAX_MB", "2048"))
+RETENTION_CHECK_INTERVAL = 60.0 # Seconds between retention sweeps
+
+_recording_writer_instance = None # To hold the singleton instance
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+def safe_name(name):
+    """Makes a stream/recording ID safe to use as a single path component."""
+    return _SAFE_NAME.sub("_", str(name)) or "_"
+
+class FrameRingBuffer:
+    """
+    The most recent encoded frames of one stream, [(timestamp, jpeg_bytes)], bounded both by age
+    (max_seconds) and by total size (max_bytes) so a high-resolution camera can't grow it unchecked.
+    The JPEG bytes are the ones the FrameBroadcaster already produced, so nothing is re-encoded.
+    """
+
+    def __init__(self, max_seconds, max_bytes):
+        self.max_seconds = max_seconds
+        self.max_bytes = int(max_bytes)
+        self._frames = deque()
+        self._bytes = 0
+
+    def append(self, timestamp, jpeg):
+        self._frames.append((timestamp, jpeg))
+        self._bytes += len(jpeg)
+        while self._frames and (self._bytes > self.max_bytes or timestamp - self._frames[0][0] > self.max_seconds):
+            _, old = self._frames.popleft()
+            self._bytes -= len(old)
+
+    def snapshot(self):
+        """Returns a list of the buffered (timestamp, jpeg) pairs (the bytes are shared, not copied)."""
+        return list(self._frames)
+
+    def clear(self):
+        self._frames.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+
+class _PendingRecording:
+    __slots__ = ('recording_id', 'trigger_time', 'end_time', 'frames', 'events')
+
+    def __init__(self, recording_id, trigger_time, end_time, frames, events):
+        self.recording_id = recording_id
+        self.trigger_time = trigger_time
+        self.end_time = end_time
+        self.frames = frames
+        self.events = events
+
+
+class RecordingWriter:
+    """
+    Shared worker pool that writes finished recordings to disk and applies the retention policy.
+    Layout: <output_dir>/<stream_id>/<recording_id>/{snapshot.jpg, frame_000.jpg, ..., clip.avi, meta.json}
+    """
+
+    def __init__(self, output_dir=RECORDINGS_DIR, max_workers=2, max_age_days=RECORDINGS_MAX_AGE_DAYS,
+                 max_total_mb=RECORDINGS_MAX_MB):
+        self.output_dir = output_dir
+        self.max_age_seconds = max_age_days * 86400.0
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recording-writer",
+                                            initializer=lower_thread_priority)
+        self._retention_lock = threading.Lock()
+        self._last_retention = 0.0
+        self.recordings_written = 0
+        self.recordings_deleted = 0 # output_dir is created by the first recording written (see _write)
+
+    def submit(self, stream_id, recording):
+        self._executor.submit(self._write, stream_id, recording)
+
+    def recording_path(self, stream_id, recording_id):
+        return os.path.join(self.output_dir, safe_name(stream_id), safe_name(recording_id))
+
+    def _write(self, stream_id, recording):
+        path = self.recording_path(stream_id, recording.recording_id)
+        try:
+            os.makedirs(path, exist_ok=True)
+            frames = recording.frames
+            # The frame closest to the trigger is the alert thumbnail
+            trigger_index = min(range(len(frames)), key=lambda i: abs(frames[i][0] - recording.trigger_time))
+            with open(os.path.join(path, "snapshot.jpg"), "wb") as f:
+                f.write(frames[trigger_index][1])
+
+            # Burst: thin to RECORD_BURST_FPS; the bytes are written as-is
+            burst, last_kept = [], None
+            for timestamp, jpeg in frames:
+                if last_kept is None or not RECORD_BURST_FPS or timestamp - last_kept >= 1.0 / RECORD_BURST_FPS:
+                    burst.append((timestamp, jpeg))
+                    last_kept = timestamp
+            for index, (_, jpeg) in enumerate(burst):
+                with open(os.path.join(path, f"frame_{index:03d}.jpg"), "wb") as f:
+                    f.write(jpeg)
+
+            if RECORD_CLIP:
+                self._write_clip(os.path.join(path, "clip.avi"), frames)
+
+            meta = {
+                "stream_id": stream_id,
+                "recording_id": recording.recording_id,
+                "trigger_time": recording.trigger_time,
+                "start_time": frames[0][0],
+                "end_time": frames[-1][0],
+                "frames": len(burst),
+                "clip": RECORD_CLIP,
+                "events": recording.events,
+            }
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            self.recordings_written += 1
+            logger.info(f"[{stream_id}] Recording {recording.recording_id} saved ({len(burst)} frame(s)).")
+        except Exception as e:
+            logger.error(f"[{stream_id}] Failed to write recording {recording.recording_id}: {e}")
+        self._apply_retention()
+
+    @staticmethod
+    def _write_clip(clip_path, frames):
+        duration = max(frames[-1][0] - frames[0][0], 1e-3)
+        fps = max(1.0, min(30.0, (len(frames) - 1) / duration)) if len(frames) > 1 else 1.0
+        writer = None
+        try:
+            for _, jpeg in frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    continue
+                if writer is None:
+                    height, width = image.shape[:2]
+                    writer = cv2.VideoWriter(clip_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+                writer.write(image)
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def _apply_retention(self, force=False):
+        """Deletes recordings past max age, then the oldest ones until the total fits max_total_bytes."""
+        now = time.time()
+        with self._retention_lock:
+            if not force and now - self._last_retention < RETENTION_CHECK_INTERVAL:
+                return
+            self._last_retention = now
+            recordings = []
+            if not os.path.isdir(self.output_dir):
+                return
+            for stream_dir in os.scandir(self.output_dir):
+                if not stream_dir.is_dir():
+                    continue
+                for entry in os.scandir(stream_dir.path):
+                    if entry.is_dir():
+                        size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                        recordings.append((entry.stat().st_mtime, size, entry.path))
+            recordings.sort() # Oldest first
+            total = sum(size for _, size, _ in recordings)
+            for mtime, size, path in recordings:
+                if now - mtime <= self.max_age_seconds and total <= self.max_total_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.recordings_deleted += 1
+
+    def list_recordings(self, stream_id=None, limit=100):
+        """Newest-first metadata of saved recordings (optionally of one stream)."""
+        if stream_id is not None:
+            stream_dirs = [os.path.join(self.output_dir, safe_name(stream_id))]
+        elif os.path.isdir(self.output_dir):
+            stream_dirs = [entry.path for entry in os.scandir(self.output_dir) if entry.is_dir()]
+        else:
+            return [] # Nothing recorded yet
+        entries = []
+        for stream_dir in stream_dirs:
+            if os.path.isdir(stream_dir):
+                entries.extend(entry for entry in os.scandir(stream_dir) if entry.is_dir())
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        recordings = []
+        for entry in entries[:limit]:
+            try:
+                with open(os.path.join(entry.path, "meta.json")) as f:
+                    recordings.append(json.load(f))
+            except (OSError, ValueError):
+                continue # Still being written
+        return recordings
+
+    def file_path(self, stream_id, recording_id, filename):
+        """Path of one file of a recording, or None if it doesn't exist."""
+        path = os.path.join(self.recording_path(stream_id, recording_id), safe_name(filename))
+        return path if os.path.isfile(path) else None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class EventRecorder:
+    """
+    Per-stream pre-roll buffer plus the recordings currently collecting post-roll frames.
+    Called only from the stream's frame grabber thread, so it needs no locking; the disk work
+    happens in the shared RecordingWriter pool.
+    """
+
+    def __init__(self, stream_id, writer, pre_seconds=RECORD_PRE_SECONDS, post_seconds=RECORD_POST_SECONDS,
+                 max_buffer_mb=PREROLL_MAX_MB):
+        self.stream_id = stream_id
+        self._writer = writer
+        self.post_seconds = post_seconds
+        self._ring = FrameRingBuffer(pre_seconds, max_buffer_mb * 1024 * 1024)
+        self._active = None # _PendingRecording collecting post-roll; events during it join it
+
+    def trigger(self, events, timestamp=None):
+        """
+        Starts (or extends) a recording for the given events and tags every event with its
+        'recording_id'. The pre-roll is taken from the ring buffer right away.
+        """
+        if not events:
+            return None
+        timestamp = timestamp or time.time()
+        if self._active is None:
+            recording_id = f"{int(timestamp * 1000)}"
+            self._active = _PendingRecording(recording_id, timestamp, timestamp + self.post_seconds,
+                                             self._ring.snapshot(), [])
+        for event in events:
+            event['recording_id'] = self._active.recording_id
+            self._active.events.append(dict(event))
+        return self._active.recording_id
+
+    def add_frame(self, jpeg, timestamp=None):
+        """Feeds one encoded frame into the ring buffer and the active recording."""
+        timestamp = timestamp or time.time()
+        self._ring.append(timestamp, jpeg)
+        active = self._active
+        if active is not None:
+            active.frames.append((timestamp, jpeg))
+            if timestamp >= active.end_time:
+                self._active = None
+                self._writer.submit(self.stream_id, active)
+
+    def flush(self):
+        """Writes the active recording with whatever post-roll it has (stream stopping)."""
+        active, self._active = self._active, None
+        if active is not None and active.frames:
+            self._writer.submit(self.stream_id, active)
+        self._ring.clear()
+
+
+# Helper to get the singleton instance
+def get_recording_writer():
+    global _recording_writer_instance
+    if _recording_writer_instance is None:
+        _recording_writer_instance = RecordingWriter()
+    return _recording_writer_instance
@@ -0,0 +1,251 @@
+# src/core/event_store.py
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+# Where zone events are persisted; ':memory:' is not supported because readers use their own connections
+EVENT_DB_PATH = os.getenv("CLASSYCAM_EVENT_DB", "data/events.db")
+# Writer batching: at most this many rows per transaction, flushed at least every EVENT_FLUSH_INTERVAL seconds
+EVENT_BATCH_SIZE = int(os.getenv("CLASSYCAM_EVENT_BATCH_SIZE", "500"))
+EVENT_FLUSH_INTERVAL = float(os.getenv("CLASSYCAM_EVENT_FLUSH_INTERVAL", "0.5"))
+# Events waiting for the writer; beyond this record() drops instead of blocking the grab thread
+EVENT_QUEUE_SIZE = 100000
+MAX_PAGE_SIZE = 1000
+
+_event_store_instance = None # To hold the singleton instance
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        stream_id TEXT NOT NULL,
+        event_type TEXT NOT NULL,
+        person_id INTEGER,
+        payload TEXT
+    )""",
+    # Every query filters on a time range, optionally narrowed by stream and/or type
+    "CREATE INDEX IF NOT EXISTS idx_events_stream_type_ts ON events (stream_id, event_type, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_stream_ts ON events (stream_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events (event_type, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts)",
+)
+
+class EventStore:
+    """
+    Embedded SQLite (WAL mode) store for zone events.
+
+    record() only puts rows on a queue, so the frame grabber threads never touch the disk. A single
+    writer thread drains the queue and inserts in batches with executemany() inside one
+    transaction. Readers use their own per-thread connections (WAL lets them run alongside the
+    writer) and page through results with a (ts, id) keyset cursor, so page N costs the same as
+    page 1 no matter how many millions of rows are stored.
+    """
+
+    def __init__(self, db_path=EVENT_DB_PATH, batch_size=EVENT_BATCH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False # The file (and its directory) is only created by the first write
+
+        self._queue = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._local = threading.local() # Per-thread read connections
+        self._running = False
+        self._writer_thread = None
+        self.events_written = 0
+        self.events_dropped = 0
+        logger.info(f"EventStore using {db_path}.")
+
+    def _ensure_schema(self):
+        """Creates the directory, database file and tables if needed (first write, or first read of an existing file)."""
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = self._connect()
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+                connection.commit()
+            finally:
+                connection.close()
+            self._schema_ready = True
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        connection.execute("PRAGMA synchronous=NORMAL") # Safe with WAL; fsync only at checkpoints
+        return connection
+
+    def start(self):
+        """Starts the background writer (no-op if already running)."""
+        if self._running:
+            return
+        self._running = True
+        self._writer_thread = threading.Thread(target=self._write_loop, name="event-store-writer", daemon=True)
+        self._writer_thread.start()
+
+    def stop(self):
+        """Flushes everything still queued and stops the writer."""
+        if not self._running:
+            return
+        self._running = False
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._writer_thread.join(timeout=10)
+        logger.info(f"EventStore stopped ({self.events_written} written, {self.events_dropped} dropped).")
+
+    def record(self, stream_id, events):
+        """Queues zone events ({'type', 'person_id', 'timestamp', ...}) of one stream. Never blocks."""
+        for event in events:
+            extra = {k: v for k, v in event.items() if k not in ('type', 'person_id', 'timestamp')}
+            person_id = event.get('person_id')
+            row = (event.get('timestamp', time.time()), stream_id, event['type'], None if person_id is None else int(person_id),
+                   json.dumps(extra) if extra else None)
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.events_dropped += 1
+                if self.events_dropped % 1000 == 1:
+                    logger.warning(f"EventStore queue full; {self.events_dropped} event(s) dropped so far.")
+
+    def _write_loop(self):
+        """Thread target: batches queued rows into executemany() transactions."""
+        lower_thread_priority()
+        connection = None # Opened with the first batch, so an idle server never creates the file
+        try:
+            while self._running or not self._queue.empty():
+                batch = []
+                deadline = time.perf_counter() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        if remaining > 0:
+                            batch.append(self._queue.get(timeout=remaining))
+                        else:
+                            batch.append(self._queue.get_nowait()) # Still take rows that are already waiting
+                    except queue.Empty:
+                        break
+                if not batch:
+                    continue
+                try:
+                    if connection is None:
+                        self._ensure_schema()
+                        connection = self._connect()
+                    with connection: # One transaction per batch
+                        connection.executemany(
+                            "INSERT INTO events (ts, stream_id, event_type, person_id, payload) VALUES (?, ?, ?, ?, ?)", batch
+                        )
+                    self.events_written += len(batch)
+                except (sqlite3.Error, OSError) as e: # OSError: the directory could not be created
+                    logger.error(f"EventStore failed to write {len(batch)} event(s): {e}")
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _reader(self):
+        """This thread's read connection, or None while there is no database file yet (nothing recorded)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if not self._schema_ready:
+                if not os.path.exists(self.db_path):
+                    return None
+                self._ensure_schema()
+            connection = self._connect()
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _filters(stream_id, event_type, since, until):
+        clauses, params = [], []
+        if stream_id is not None:
+            clauses.append("stream_id = ?")
+            params.append(stream_id)
+        if event_type is not None:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return clauses, params
+
+    def query(self, stream_id=None, event_type=None, since=None, until=None, limit=100, cursor=None):
+        """
+        Returns one page of events, newest first.
+        Args:
+            since/until (float): Unix timestamps; since is inclusive, until exclusive.
+            cursor (str): next_cursor of the previous page.
+        Returns:
+            dict: {'events': [...], 'next_cursor': str or None}
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._filters(stream_id, event_type, since, until)
+        if cursor:
+            cursor_ts, cursor_id = cursor.split(":", 1)
+            clauses.append("(ts < ? OR (ts = ? AND id < ?))")
+            params.extend([float(cursor_ts), float(cursor_ts), int(cursor_id)])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        reader = self._reader()
+        if reader is None:
+            return {"events": [], "next_cursor": None}
+        rows = reader.execute(
+            f"SELECT id, ts, stream_id, event_type, person_id, payload FROM events {where} "
+            f"ORDER BY ts DESC, id DESC LIMIT ?", params + [limit + 1]
+        ).fetchall()
+
+        events = []
+        for row in rows[:limit]:
+            event = {"id": row["id"], "timestamp": row["ts"], "stream_id": row["stream_id"],
+                     "type": row["event_type"], "person_id": row["person_id"]}
+            if row["payload"]:
+                event.update(json.loads(row["payload"]))
+            events.append(event)
+        next_cursor = f"{events[-1]['timestamp']!r}:{events[-1]['id']}" if len(rows) > limit else None
+        return {"events": events, "next_cursor": next_cursor}
+
+    def summary(self, stream_id=None, since=None, until=None, bucket_seconds=None):
+        """
+        Event counts per stream and type (and per time bucket if bucket_seconds is given), for reports.
+        """
+        clauses, params = self._filters(stream_id, None, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        if bucket_seconds:
+            bucket = "CAST(ts / ? AS INTEGER) * ?"
+            params = [bucket_seconds, bucket_seconds] + params
+            sql = (f"SELECT {bucket} AS bucket, stream_id, event_type, COUNT(*) AS n FROM events {where} "
+                   f"GROUP BY bucket, stream_id, event_type ORDER BY bucket")
+        else:
+            sql = f"SELECT stream_id, event_type, COUNT(*) AS n FROM events {where} GROUP BY stream_id, event_type"
+        reader = self._reader()
+        if reader is None:
+            return []
+        return [dict(row) for row in reader.execute(sql, params).fetchall()]
+
+    def get_stats(self):
+        return {
+            "db_path": self.db_path,
+            "events_written": self.events_written,
+            "events_dropped": self.events_dropped,
+            "queue_depth": self._queue.qsize(),
+        }
+
+
+# Helper to get the singleton instance
+def get_event_store():
+    global _event_store_instance
+    if _event_store_instance is None:
+        _event_store_instance = EventStore()
+        _event_store_instance.start()
+    return _event_store_instance
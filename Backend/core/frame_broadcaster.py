@@ -0,0 +1,301 @@
+# src/core/frame_broadcaster.py
+import os
+import cv2
+import asyncio
+import itertools
+import threading
+import time
+import logging
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+# What a viewer gets: width cap (0 = full resolution) and JPEG quality. Requests are snapped to a
+# small ladder so clients asking for similar profiles share one cached encoding.
+StreamProfile = namedtuple('StreamProfile', ['max_width', 'quality'])
+DEFAULT_JPEG_QUALITY = 95 # OpenCV's default; the shared full-size encoding uses it
+DEFAULT_PROFILE = StreamProfile(0, DEFAULT_JPEG_QUALITY)
+WIDTH_LADDER = (160, 320, 480, 640, 800, 960, 1280, 1920)
+MIN_ADAPTIVE_QUALITY = 30
+MIN_ADAPTIVE_WIDTH = 320
+MAX_CACHED_PROFILES = 16
+
+# Adaptive quality: a send slower than this (EWMA) means the client's socket buffer is backing up
+SLOW_SEND_SECONDS = float(os.getenv("CLASSYCAM_FEED_SLOW_SEND_MS", "100")) / 1000.0
+ADAPT_INTERVAL = 2.0 # Seconds between two quality changes of one client
+
+# Scaled encodings run here, not on the event loop (cv2.resize/imencode release the GIL)
+_encode_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CLASSYCAM_ENCODE_WORKERS", "2")),
+                                      thread_name_prefix="jpeg-encode", initializer=lower_thread_priority)
+
+def make_profile(max_width=None, quality=None):
+    """Snaps a requested width/quality onto the shared ladder."""
+    quality = DEFAULT_JPEG_QUALITY if quality is None else min(95, max(10, int(round(quality / 5.0)) * 5))
+    width = 0
+    if max_width:
+        width = max([w for w in WIDTH_LADDER if w <= max_width], default=WIDTH_LADDER[0])
+    return StreamProfile(width, quality)
+
+def encode_profile(frame, jpeg, profile):
+    """
+    Encodes one frame for a profile. frame may be None (only JPEG bytes were published, e.g. by a
+    worker process); the JPEG is decoded first then.
+    """
+    if frame is None:
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    height, width = frame.shape[:2]
+    if profile.max_width and width > profile.max_width:
+        frame = cv2.resize(frame, (profile.max_width, max(1, round(height * profile.max_width / width))),
+                           interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, profile.quality])
+    if not ok:
+        raise RuntimeError(f"JPEG encoding failed for {profile}")
+    return buffer.tobytes()
+
+class _QualityController:
+    """
+    Per-viewer adaptation: lowers quality (then resolution) while sends are slow, and climbs back
+    towards the requested profile once they have been fast for a while.
+    """
+
+    def __init__(self, requested):
+        self.requested = requested
+        self.current = requested
+        self._send_ewma = 0.0
+        self._last_change = time.perf_counter()
+        self.downgrades = 0
+
+    def observe(self, send_seconds, frame_width=None):
+        """Feeds one send duration; returns the profile to use for the next frame."""
+        self._send_ewma = 0.7 * self._send_ewma + 0.3 * send_seconds
+        now = time.perf_counter()
+        if now - self._last_change < ADAPT_INTERVAL:
+            return self.current
+        width, quality = self.current
+        effective_width = min(width or float('inf'), frame_width or float('inf'))
+        if self._send_ewma > SLOW_SEND_SECONDS:
+            smaller = [w for w in WIDTH_LADDER if MIN_ADAPTIVE_WIDTH <= w < effective_width]
+            if quality - 15 >= MIN_ADAPTIVE_QUALITY:
+                quality -= 15
+            elif smaller:
+                width = smaller[-1]
+            else:
+                return self.current # Already at the floor
+            self.downgrades += 1
+        elif self._send_ewma < SLOW_SEND_SECONDS / 4 and self.current != self.requested:
+            if width != self.requested.max_width: # Undo in reverse order: resolution first, then quality
+                larger = [w for w in WIDTH_LADDER if effective_width < w < (self.requested.max_width or float('inf'))
+                          and w < (frame_width or float('inf'))]
+                width = larger[0] if larger else self.requested.max_width
+            else:
+                quality = min(self.requested.quality, quality + 10)
+        else:
+            return self.current
+        self.current = StreamProfile(width, quality)
+        self._last_change = now
+        return self.current
+
+class _Subscriber:
+    """One connected viewer: its wake-up event plus send statistics."""
+    __slots__ = ('client_id', 'loop', 'event', 'connected_at', 'frames_sent', 'frames_skipped', 'bytes_sent',
+                 'profile', 'max_fps', 'controller')
+
+    def __init__(self, client_id, loop, event, profile=DEFAULT_PROFILE, max_fps=None, controller=None):
+        self.client_id = client_id
+        self.loop = loop
+        self.event = event
+        self.connected_at = time.time()
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+        self.profile = profile # What is being sent right now (changes when adaptive)
+        self.max_fps = max_fps
+        self.controller = controller
+
+class FrameBroadcaster:
+    """
+    Encode-once, fan-out distribution of annotated frames to /video_feed clients.
+
+    The frame grabber thread calls publish() once per annotated frame; the frame is JPEG-encoded
+    exactly once and tagged with a sequence number. Any number of async subscribers wait on a
+    per-subscriber asyncio.Event that publish() sets, then read the newest JPEG. Nothing is queued
+    per client, so a slow client simply skips to the newest frame instead of falling behind.
+
+    Viewers may ask for a smaller width, lower quality and lower frame rate. Such encodings are
+    made on demand in a thread pool, once per (profile, frame), and shared by every viewer on the
+    same profile.
+    """
+
+    def __init__(self, name="broadcaster"):
+        self.name = name
+        self._lock = threading.Lock() # Guards the latest frame and the subscriber set
+        self._seq = 0
+        self._jpeg = None # bytes of the latest encoded frame
+        self._frame = None # The latest annotated frame itself, for scaled encodings (None if only JPEG was published)
+        self._profile_cache = OrderedDict() # {StreamProfile: (seq, jpeg_bytes)}, least recently used first
+        self._pending = {} # {(StreamProfile, seq): concurrent Future} so concurrent viewers share one encode
+        self.profile_encodes = 0
+        self.frame_width = None # Width of the published frames, when known (helps adaptive downscaling)
+        self._subscribers = set() # {_Subscriber}
+        self._client_ids = itertools.count(1)
+        self._closed = False
+        self.frames_encoded = 0
+
+    def publish(self, frame):
+        """Encodes frame once and notifies every subscriber. Called from the frame grabber thread."""
+        ok, buffer = cv2.imencode('.jpg', frame)
+        if not ok:
+            logger.warning(f"[{self.name}] JPEG encoding failed; frame not published.")
+            return None
+        return self.publish_jpeg(buffer.tobytes(), frame=frame)
+
+    def publish_jpeg(self, jpeg_bytes, frame=None):
+        """
+        Publishes already-encoded JPEG bytes. Returns the new sequence number.
+        frame (the source image, not modified afterwards) spares scaled profiles a JPEG decode.
+        """
+        with self._lock:
+            self._seq += 1
+            self._jpeg = jpeg_bytes
+            self._frame = frame
+            if frame is not None:
+                self.frame_width = frame.shape[1]
+            self.frames_encoded += 1
+            seq = self._seq
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.event.set)
+            except RuntimeError:
+                pass # Subscriber's event loop is already closed; it will be unregistered on exit
+        return seq
+
+    def latest(self):
+        """Returns (seq, jpeg_bytes) of the newest frame; jpeg_bytes is None before the first publish."""
+        with self._lock:
+            return self._seq, self._jpeg
+
+    def close(self):
+        """Wakes every subscriber so their generators can finish (stream stopped)."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.event.set)
+            except RuntimeError:
+                pass
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    async def _encoded(self, profile):
+        """Returns (seq, jpeg_bytes) of the newest frame in profile, encoding it at most once."""
+        with self._lock:
+            seq, jpeg, frame = self._seq, self._jpeg, self._frame
+            if profile == DEFAULT_PROFILE:
+                return seq, jpeg
+            cached = self._profile_cache.get(profile)
+            if cached is not None and cached[0] == seq:
+                self._profile_cache.move_to_end(profile)
+                return cached
+            future = self._pending.get((profile, seq))
+            if future is None:
+                future = _encode_executor.submit(encode_profile, frame, jpeg, profile)
+                self._pending[(profile, seq)] = future
+                self.profile_encodes += 1
+        try:
+            jpeg = await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self._pending.pop((profile, seq), None)
+        with self._lock:
+            self._profile_cache[profile] = (seq, jpeg)
+            self._profile_cache.move_to_end(profile)
+            while len(self._profile_cache) > MAX_CACHED_PROFILES:
+                self._profile_cache.popitem(last=False)
+        return seq, jpeg
+
+    async def subscribe(self, max_width=None, quality=None, max_fps=None, adaptive=False):
+        """
+        Async generator yielding (seq, jpeg_bytes) for every frame this subscriber gets to see.
+        Frames published while the client was still sending the previous one are skipped.
+        Args:
+            max_width (int): Downscale wider frames (snapped to WIDTH_LADDER); None = full resolution.
+            quality (int): JPEG quality 10-95 (snapped to steps of 5); None = DEFAULT_JPEG_QUALITY.
+            max_fps (float): Send at most this many frames per second; the others are skipped.
+            adaptive (bool): Lower quality/resolution automatically while sends are slow.
+        """
+        event = asyncio.Event()
+        profile = make_profile(max_width, quality)
+        token = _Subscriber(next(self._client_ids), asyncio.get_running_loop(), event, profile=profile, max_fps=max_fps,
+                            controller=_QualityController(profile) if adaptive else None)
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        with self._lock:
+            if self._closed:
+                return
+            self._subscribers.add(token)
+            if self._jpeg is not None:
+                event.set() # Send the current frame right away instead of waiting for the next one
+        last_seq = 0
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass # Periodic wake-up so a silent, stopped stream is noticed
+                event.clear()
+                with self._lock:
+                    closed, seq, jpeg = self._closed, self._seq, self._jpeg
+                if closed:
+                    break
+                if jpeg is None or seq == last_seq:
+                    continue
+                if token.profile != DEFAULT_PROFILE:
+                    try:
+                        seq, jpeg = await self._encoded(token.profile)
+                    except Exception as e:
+                        logger.warning(f"[{self.name}] Encoding for {token.profile} failed: {e}")
+                        continue
+                if last_seq:
+                    token.frames_skipped += max(0, seq - last_seq - 1)
+                last_seq = seq
+                send_start = time.perf_counter()
+                yield seq, jpeg # Resumes once the consumer has handed the bytes to the socket
+                send_seconds = time.perf_counter() - send_start
+                token.frames_sent += 1
+                token.bytes_sent += len(jpeg)
+                if token.controller is not None:
+                    token.profile = token.controller.observe(send_seconds, self.frame_width)
+                if min_interval > send_seconds:
+                    await asyncio.sleep(min_interval - send_seconds) # Frames published meanwhile are skipped
+        finally:
+            with self._lock:
+                self._subscribers.discard(token)
+            logger.debug(f"[{self.name}] Subscriber {token.client_id} left after skipping {token.frames_skipped} frame(s).")
+
+    def get_client_stats(self):
+        """Per-viewer send statistics: frames sent/skipped and average send rate."""
+        now = time.time()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return [
+            {
+                "client_id": s.client_id,
+                "frames_sent": s.frames_sent,
+                "frames_skipped": s.frames_skipped,
+                "send_fps": round(s.frames_sent / max(now - s.connected_at, 1e-6), 2),
+                "send_kbps": round(s.bytes_sent * 8 / 1000 / max(now - s.connected_at, 1e-6), 1),
+                "max_width": s.profile.max_width or None,
+                "quality": s.profile.quality,
+                "max_fps": s.max_fps,
+                "adaptive": s.controller is not None,
+                "quality_downgrades": s.controller.downgrades if s.controller is not None else 0,
+            }
+            for s in subscribers
+        ]
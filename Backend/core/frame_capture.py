@@ -0,0 +1,276 @@
+# src/core/frame_capture.py
+import os
+import random
+import threading
+import time
+import logging
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+# Reconnection of live sources: exponential backoff with jitter between attempts
+RECONNECT_INITIAL_BACKOFF = 0.5
+RECONNECT_MAX_BACKOFF = float(os.getenv("CLASSYCAM_RECONNECT_MAX_BACKOFF", "30"))
+
+class LatestFrameCapture:
+    """
+    Reads a VideoCapture on its own thread and keeps only the newest decoded frame.
+
+    The consumer (the inference stage of a VideoStream) calls read_latest() whenever it is free
+    and always gets the most recent frame, so a slow detector never lets the FFMPEG buffer back
+    up. Frames that were overwritten before anybody consumed them are counted as dropped.
+
+    With retrieve_fps set, frames beyond that rate are only grab()bed (decoded, never converted
+    to BGR or copied), and keyframes_only is passed on to captures that support it (PyAVCapture).
+    The CPU time of every read is counted per stream as decode_cpu_seconds.
+
+    Live sources (given a reopen callable) are reconnected when reads fail or no frame arrives
+    for stall_timeout seconds, with exponential backoff and jitter; finite sources (files) end
+    on the first failed read.
+    """
+
+    def __init__(self, cap, name="capture", pace_fps=None, profiler=None, reopen=None, stall_timeout=10.0,
+                 retrieve_fps=None):
+        """
+        Args:
+            cap (cv2.VideoCapture): An opened capture (anything with read()/isOpened()).
+            name (str): Used for the thread name and log messages.
+            pace_fps (float): Only for file sources, which otherwise decode as fast as the CPU allows.
+                              Live cameras are paced by the camera itself, so leave this as None.
+            profiler (StageProfiler): Optional; receives the duration of every read as 'capture_read'.
+            reopen (callable): Returns (cap, first_frame) or (None, None); enables reconnection.
+            stall_timeout (float): Seconds without a frame after which a live source is reconnected.
+            retrieve_fps (float): Convert at most this many frames per second; None converts every frame.
+        """
+        self._cap = cap
+        self.name = name
+        self._pace_interval = 1.0 / pace_fps if pace_fps else 0.0
+        self._profiler = profiler
+        self._reopen = reopen
+        self._stall_timeout = stall_timeout
+        self._stop_event = threading.Event() # Interrupts backoff sleeps on stop()
+        self.retrieve_fps = retrieve_fps # May be changed while running (follows the stream's target_fps)
+        self._keyframes_only = False
+
+        self._condition = threading.Condition() # Guards the fields below and wakes up waiting consumers
+        self._frame = None
+        self._frame_seq = 0 # Increments on every decoded frame
+        self._frame_time = 0.0 # time.time() at which _frame was decoded
+        self._consumed_seq = 0 # Sequence number of the last frame handed out
+
+        self._running = False
+        self._thread = None
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self._fps_window_start = time.perf_counter()
+        self._fps_window_frames = 0
+        self.capture_fps = 0.0
+        self.frames_grab_only = 0 # Decoded but skipped before conversion (retrieve_fps)
+        self.decode_cpu_seconds = 0.0 # CPU time of this stream's capture thread spent in read()/grab()
+        self.decode_cpu_percent = 0.0 # ... per wall-clock second over the last ~second
+        # Connection state: 'connected', 'reconnecting', 'ended' (finite source done) or 'stopped'
+        self.state = "connected"
+        self.reconnects = 0 # Successful reconnections
+        self.reconnect_attempts = 0
+        self.next_retry_at = None # time.time() of the next attempt while reconnecting
+        self._last_frame_at = time.time()
+
+    @property
+    def cap(self):
+        """The capture currently being read (replaced on reconnection)."""
+        return self._cap
+
+    def start(self, first_frame=None):
+        """Starts the capture thread. first_frame (e.g. from the open probe) is published immediately."""
+        if first_frame is not None:
+            self._publish(first_frame)
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the capture thread and wakes up anybody blocked in read_latest()."""
+        self._running = False
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning(f"[{self.name}] Capture thread did not terminate gracefully.")
+
+    def is_running(self):
+        return self._running
+
+    @property
+    def keyframes_only(self):
+        return self._keyframes_only
+
+    def set_keyframes_only(self, enabled):
+        """Asks the capture to decode keyframes only. Returns False if the capture can't do that."""
+        if not hasattr(self._cap, "keyframes_only"):
+            return False
+        if enabled != self._keyframes_only:
+            self._keyframes_only = enabled
+            self._cap.keyframes_only = enabled
+            logger.info(f"[{self.name}] {'Decoding keyframes only (idle)' if enabled else 'Decoding every frame again'}.")
+        return True
+
+    def _publish(self, frame):
+        with self._condition:
+            if self._frame is not None and self._consumed_seq < self._frame_seq:
+                self.frames_dropped += 1 # Nobody picked up the previous frame in time
+            self._frame = frame
+            self._frame_seq += 1
+            self._frame_time = time.time()
+            self._last_frame_at = self._frame_time
+            self.frames_captured += 1
+            self._condition.notify_all()
+
+        # Capture FPS over ~1 second windows
+        self._fps_window_frames += 1
+        elapsed = time.perf_counter() - self._fps_window_start
+        if elapsed >= 1.0:
+            self.capture_fps = self._fps_window_frames / elapsed
+            self._fps_window_frames = 0
+            self._fps_window_start = time.perf_counter()
+
+    def _capture_loop(self):
+        """Thread target: decodes frames as fast as the source delivers them."""
+        lower_thread_priority()
+        logger.info(f"[{self.name}] Capture thread started.")
+        next_read = time.perf_counter()
+        next_retrieve = next_read
+        cpu_window_start, cpu_window_seconds = time.perf_counter(), 0.0
+        failure_streak = 0 # Consecutive failed reads
+        while self._running and self._cap is not None:
+            if not self._cap.isOpened():
+                if self._reopen is None or not self._reconnect("capture closed"):
+                    break
+                continue
+            if self._pace_interval:
+                delay = next_read - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_read = max(next_read + self._pace_interval, time.perf_counter() - self._pace_interval)
+
+            read_start = time.perf_counter()
+            cpu_start = time.thread_time() # Includes decoding unless the decoder runs its own threads
+            if self.retrieve_fps and read_start < next_retrieve and hasattr(self._cap, "grab"):
+                ret, frame = self._cap.grab(), None # Decode only; the inference stage wouldn't get to this one
+            else:
+                ret, frame = self._cap.read()
+                if ret and self.retrieve_fps:
+                    next_retrieve = max(next_retrieve + 1.0 / self.retrieve_fps, read_start)
+            cpu_seconds = time.thread_time() - cpu_start
+            self.decode_cpu_seconds += cpu_seconds
+            cpu_window_seconds += cpu_seconds
+            if read_start - cpu_window_start >= 1.0:
+                self.decode_cpu_percent = 100.0 * cpu_window_seconds / (read_start - cpu_window_start)
+                cpu_window_start, cpu_window_seconds = read_start, 0.0
+            if self._profiler is not None:
+                self._profiler.observe('capture_read', time.perf_counter() - read_start)
+            if not ret:
+                self.read_failures += 1
+                if self._reopen is None:
+                    logger.info(f"[{self.name}] Source ended.")
+                    self.state = "ended"
+                    break
+                # A live source may recover from a glitch; reconnect once it has been silent too long
+                if time.time() - self._last_frame_at >= self._stall_timeout:
+                    failure_streak = 0
+                    if not self._reconnect(f"no frame for {self._stall_timeout:g}s"):
+                        break
+                    continue
+                if failure_streak == 0: # Once per outage, not every 50 ms
+                    logger.warning(f"[{self.name}] Failed to grab frame. Stream might be disconnected. Attempting to re-read...")
+                failure_streak += 1
+                self._stop_event.wait(0.05) # Small delay before retrying
+                continue
+            failure_streak = 0
+            if frame is None:
+                self.frames_grab_only += 1
+                self._last_frame_at = time.time() # The source is alive
+                continue
+            self._publish(frame)
+        self._running = False
+        if self.state != "ended":
+            self.state = "stopped"
+        with self._condition:
+            self._condition.notify_all()
+        logger.info(f"[{self.name}] Capture thread stopped.")
+
+    def _reconnect(self, reason):
+        """
+        Releases the current capture and reopens the source until it works or stop() is called.
+        Returns True once a new capture delivered a frame.
+        """
+        logger.warning(f"[{self.name}] Stream stalled ({reason}); reconnecting.")
+        self.state = "reconnecting"
+        try:
+            self._cap.release()
+        except Exception:
+            pass
+        backoff = RECONNECT_INITIAL_BACKOFF
+        while self._running:
+            delay = backoff * random.uniform(0.5, 1.5) # Jitter: cameras behind one switch don't retry in lockstep
+            self.next_retry_at = time.time() + delay
+            if self._stop_event.wait(delay):
+                break
+            self.reconnect_attempts += 1
+            cap, first_frame = self._reopen()
+            if cap is not None and not self._running: # stop() was called while we were opening
+                cap.release()
+                break
+            if cap is not None:
+                self._cap = cap
+                if self._keyframes_only and hasattr(cap, "keyframes_only"):
+                    cap.keyframes_only = True
+                self.reconnects += 1
+                self.state = "connected"
+                self.next_retry_at = None
+                self._publish(first_frame)
+                logger.info(f"[{self.name}] Reconnected after {self.reconnect_attempts} attempt(s) in total.")
+                return True
+            backoff = min(backoff * 2, RECONNECT_MAX_BACKOFF)
+            logger.warning(f"[{self.name}] Reconnect attempt failed; next try in ~{backoff:.1f}s.")
+        self.next_retry_at = None
+        return False
+
+    def read_latest(self, after_seq=0, timeout=1.0):
+        """
+        Returns the newest frame whose sequence number is greater than after_seq.
+        Blocks up to timeout seconds for one to arrive.
+        Returns:
+            tuple: (seq, frame, capture_time), or (after_seq, None, 0.0) on timeout / stop.
+        """
+        deadline = time.perf_counter() + timeout
+        with self._condition:
+            while self._frame_seq <= after_seq or self._frame is None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._running:
+                    return after_seq, None, 0.0
+                self._condition.wait(remaining)
+            self._consumed_seq = self._frame_seq
+            return self._frame_seq, self._frame, self._frame_time
+
+    def get_stats(self):
+        """Capture-side counters for status/metrics reporting."""
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+            "read_failures": self.read_failures,
+            "capture_fps": round(self.capture_fps, 2),
+            "frames_grab_only": self.frames_grab_only,
+            "decode_cpu_seconds": round(self.decode_cpu_seconds, 3),
+            "decode_cpu_percent": round(self.decode_cpu_percent, 1),
+            "keyframes_only": self._keyframes_only,
+            "connection_state": self.state,
+            "reconnects": self.reconnects,
+            "reconnect_attempts": self.reconnect_attempts,
+            "last_frame_age_s": round(time.time() - self._last_frame_at, 2),
+            "next_retry_in_s": round(max(0.0, self.next_retry_at - time.time()), 2) if self.next_retry_at else None,
+        }
@@ -0,0 +1,201 @@
+# src/core/inference_scheduler.py
+import threading
+import queue
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from core.metrics import get_metrics_registry
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+class InferenceScheduler:
+    """
+    Central, cross-stream batching front-end for the shared ObjectDetector.
+
+    Frame grabber threads call submit() and wait on the returned Future. A single worker
+    thread collects up to max_batch_size frames (or waits at most max_wait_ms after the
+    first frame arrives), runs one batched model call and hands each stream its own result.
+    """
+
+    def __init__(self, object_detector, max_batch_size=8, max_wait_ms=10.0, stats_window=200):
+        """
+        Args:
+            object_detector (ObjectDetector): The shared detector; must provide detect_batch().
+            max_batch_size (int): Maximum number of frames sent to the model in one call.
+            max_wait_ms (float): How long to wait for more frames once the first one is queued.
+            stats_window (int): Number of recent batches used for the latency/fill statistics.
+        """
+        self._object_detector = object_detector
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+
+        self._queue = queue.Queue() # Items: (stream_id, frame, imgsz, Future)
+        self._running = False
+        self._worker_thread = None
+
+        # Batch statistics
+        self._stats_lock = threading.Lock()
+        self._batch_latencies_ms = deque(maxlen=stats_window)
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._total_batches = 0
+        self._total_frames = 0
+
+        # Prometheus histograms (rendered at /metrics)
+        registry = get_metrics_registry()
+        self._batch_duration_hist = registry.histogram(
+            "classycam_inference_batch_duration_seconds", "Wall time of one batched detector call."
+        )
+        self._batch_size_hist = registry.histogram(
+            "classycam_inference_batch_size", "Frames per batched detector call.", buckets=(1, 2, 4, 8, 16, 32)
+        )
+
+        logger.info(f"InferenceScheduler initialized (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms}).")
+
+    def start(self):
+        """Starts the batching worker thread (no-op if already running)."""
+        if self._running:
+            return
+        self._running = True
+        self._worker_thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker_thread.start()
+        logger.info("InferenceScheduler worker started.")
+
+    def stop(self):
+        """Stops the worker and fails any frames still waiting in the queue."""
+        if not self._running:
+            return
+        self._running = False
+        if self._worker_thread and self._worker_thread.is_alive():
+            self._worker_thread.join(timeout=5)
+        # Anything still queued will never be processed
+        while True:
+            try:
+                _, _, _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+        logger.info("InferenceScheduler worker stopped.")
+
+    def configure(self, max_batch_size=None, max_wait_ms=None):
+        """Changes the batching parameters; takes effect from the next batch."""
+        if max_batch_size is not None:
+            self.max_batch_size = max(1, int(max_batch_size))
+        if max_wait_ms is not None:
+            self.max_wait_ms = max(0.0, float(max_wait_ms))
+        logger.info(f"InferenceScheduler reconfigured (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait_ms}).")
+
+    def submit(self, stream_id, frame, imgsz=None):
+        """
+        Queues a frame for detection.
+        Args:
+            imgsz (int): Per-stream inference resolution; frames are only batched with frames of the same imgsz.
+        Returns:
+            Future: Resolves to the frame's DETECTION_DTYPE array from ObjectDetector.detect_batch().
+        """
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("InferenceScheduler is not running."))
+            return future
+        self._queue.put((stream_id, frame, imgsz, future))
+        return future
+
+    def _collect_batch(self):
+        """Blocks for the first frame, then gathers more until the batch is full or max_wait_ms passes."""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait()) # Still take frames that are already waiting
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Thread target: collects batches and runs them through the detector."""
+        lower_thread_priority()
+        while self._running:
+            batch = self._collect_batch()
+            # Drop frames whose submitter already gave up on them
+            batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Streams may ask for different inference sizes; one model call per size
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[2], []).append(item)
+
+            start = time.perf_counter()
+            for imgsz, items in groups.items():
+                frames = [frame for _, frame, _, _ in items]
+                try:
+                    results = self._object_detector.detect_batch(frames, imgsz=imgsz)
+                except Exception as e:
+                    logger.error(f"Batched inference failed for {len(frames)} frame(s): {e}")
+                    for _, _, _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, _, _, future), result in zip(items, results):
+                    future.set_result(result)
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            self._batch_duration_hist.observe(latency_ms / 1000.0)
+            self._batch_size_hist.observe(len(batch))
+
+            with self._stats_lock:
+                self._batch_latencies_ms.append(latency_ms)
+                self._batch_sizes.append(len(batch))
+                self._total_batches += 1
+                self._total_frames += len(batch)
+
+            logger.debug(f"Inference batch of {len(batch)}/{self.max_batch_size} frame(s) took {latency_ms:.1f} ms.")
+
+    def get_stats(self):
+        """Returns per-batch latency and batch fill statistics over the recent window."""
+        with self._stats_lock:
+            latencies = sorted(self._batch_latencies_ms)
+            sizes = list(self._batch_sizes)
+            total_batches = self._total_batches
+            total_frames = self._total_frames
+
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+            return round(values[index], 2)
+
+        avg_size = sum(sizes) / len(sizes) if sizes else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "total_batches": total_batches,
+            "total_frames": total_frames,
+            "queue_depth": self._queue.qsize(),
+            "avg_batch_size": round(avg_size, 2),
+            "avg_batch_fill": round(avg_size / self.max_batch_size, 3) if sizes else 0.0,
+            "batch_latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "max": round(latencies[-1], 2) if latencies else 0.0,
+            },
+        }
+
+    def get_metric_samples(self):
+        """Yields (name, type, help, labels, value) gauges/counters for the /metrics collector."""
+        with self._stats_lock:
+            total_batches, total_frames = self._total_batches, self._total_frames
+        yield "classycam_inference_queue_depth", "gauge", "Frames waiting for the inference worker.", {}, self._queue.qsize()
+        yield "classycam_inference_batches_total", "counter", "Batched detector calls.", {}, total_batches
+        yield "classycam_inference_frames_total", "counter", "Frames run through the detector.", {}, total_frames
+        yield "classycam_inference_max_batch_size", "gauge", "Configured maximum batch size.", {}, self.max_batch_size
@@ -0,0 +1,131 @@
+# src/core/matching.py
+"""
+Vectorized cost matrices and assignment solvers used by PersonTracker.
+
+Everything here works on NumPy arrays so the tracker never loops over track/detection
+pairs in Python. scipy's linear_sum_assignment is used when scipy is installed; otherwise
+a NumPy implementation of the Hungarian (Kuhn-Munkres) algorithm is used instead.
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_linear_sum_assignment
+except ImportError: # scipy is optional
+    _scipy_linear_sum_assignment = None
+
+
+def bbox_centroids(bboxes):
+    """(N, 4) [x1, y1, x2, y2] boxes -> (N, 2) float centroids."""
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    return (bboxes[:, :2] + bboxes[:, 2:]) / 2.0
+
+
+def centroid_distance_matrix(centroids_a, centroids_b):
+    """Euclidean distance between every pair of centroids: (N, 2) x (M, 2) -> (N, M)."""
+    a = np.asarray(centroids_a, dtype=np.float64).reshape(-1, 2)
+    b = np.asarray(centroids_b, dtype=np.float64).reshape(-1, 2)
+    diff = a[:, None, :] - b[None, :, :]
+    return np.sqrt(np.einsum('ijk,ijk->ij', diff, diff))
+
+
+def iou_matrix(bboxes_a, bboxes_b):
+    """Intersection-over-union between every pair of boxes: (N, 4) x (M, 4) -> (N, M)."""
+    a = np.asarray(bboxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(bboxes_b, dtype=np.float64).reshape(-1, 4)
+    inter_w = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    intersection = inter_w * inter_h
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def _hungarian(cost):
+    """
+    Minimum-cost assignment for a rectangular cost matrix (shortest augmenting path with
+    potentials, O(n^2 * m)). The inner scan over columns is vectorized with NumPy.
+    Returns (row_indices, col_indices) like scipy.optimize.linear_sum_assignment.
+    """
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    u = np.zeros(n + 1) # Row potentials (1-indexed, slot 0 unused)
+    v = np.zeros(m + 1) # Column potentials (slot 0 is the virtual column)
+    p = np.zeros(m + 1, dtype=np.int64) # p[j] = row currently assigned to column j (0 = none)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            used_cols = np.flatnonzero(used)
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    assigned = np.flatnonzero(p[1:])
+    rows = p[1:][assigned] - 1
+    cols = assigned
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_assignment(cost):
+    """Optimal (minimum total cost) one-to-one assignment. Returns (row_indices, col_indices)."""
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    if _scipy_linear_sum_assignment is not None:
+        rows, cols = _scipy_linear_sum_assignment(cost)
+        return rows.astype(np.int64), cols.astype(np.int64)
+    return _hungarian(cost)
+
+
+def greedy_assignment(cost):
+    """
+    Greedy assignment: repeatedly take the cheapest remaining pair. Not optimal, but a single
+    sort instead of a full matrix rescan per match. Returns (row_indices, col_indices).
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order = np.argsort(cost, axis=None, kind='stable')
+    pair_rows, pair_cols = np.unravel_index(order, cost.shape)
+    used_rows = np.zeros(cost.shape[0], dtype=bool)
+    used_cols = np.zeros(cost.shape[1], dtype=bool)
+    rows, cols = [], []
+    limit = min(cost.shape)
+    for r, c in zip(pair_rows.tolist(), pair_cols.tolist()):
+        if used_rows[r] or used_cols[c]:
+            continue
+        used_rows[r] = used_cols[c] = True
+        rows.append(r)
+        cols.append(c)
+        if len(rows) == limit:
+            break
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
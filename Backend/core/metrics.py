@@ -0,0 +1,213 @@
+# src/core/metrics.py
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (0.5 ms .. 5 s), shared by every timing histogram
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_metrics_registry_instance = None # To hold the singleton instance
+
+class Histogram:
+    """
+    Fixed-bucket histogram plus a small window of recent samples for p50/p95/p99.
+    observe() is a bisect and a few integer updates, cheap enough to leave on in production.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self._upper_bounds = tuple(buckets)
+        self._counts = [0] * (len(self._upper_bounds) + 1) # Last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._recent.append(value)
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Quantiles over the recent window, {q: value}; empty dict if nothing was observed yet."""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return {}
+        last = len(recent) - 1
+        return {q: recent[min(last, int(round(q * last)))] for q in quantiles}
+
+    def snapshot(self):
+        """Returns (cumulative bucket counts incl. +Inf, sum, count)."""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+    @property
+    def upper_bounds(self):
+        return self._upper_bounds
+
+
+class StageProfiler:
+    """
+    Per-stream stage timer for the frame pipeline. Call begin() at the start of an iteration,
+    mark('stage') after each stage and end() when the frame is done. The time since the previous
+    mark is added to that stage (a stage marked twice in one frame is summed), and end() records
+    one sample per stage plus the whole iteration as 'total'.
+    """
+
+    def __init__(self, registry, stream_id, metric_name="classycam_stage_duration_seconds"):
+        self._registry = registry
+        self._stream_id = stream_id
+        self._metric_name = metric_name
+        self._histograms = {}
+        self._pending = {}
+        self._start = self._last = time.perf_counter()
+
+    def _histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._registry.histogram(
+                self._metric_name, "Time spent in each frame pipeline stage.", stream=self._stream_id, stage=stage
+            )
+            self._histograms[stage] = histogram
+        return histogram
+
+    def begin(self):
+        self._pending.clear()
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self._pending[stage] = self._pending.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def end(self):
+        for stage, seconds in self._pending.items():
+            self._histogram(stage).observe(seconds)
+        self._histogram('total').observe(self._last - self._start)
+        self._pending.clear()
+
+    def observe(self, stage, seconds):
+        """Records a duration measured elsewhere (e.g. in another thread or coroutine)."""
+        self._histogram(stage).observe(seconds)
+
+    def summary(self):
+        """{stage: {'p50_ms': .., 'p95_ms': .., 'p99_ms': .., 'count': n}} for JSON status endpoints."""
+        result = {}
+        for stage, histogram in list(self._histograms.items()):
+            quantiles = histogram.quantiles()
+            _, _, count = histogram.snapshot()
+            result[stage] = {f"p{int(q * 100)}_ms": round(v * 1000.0, 3) for q, v in quantiles.items()}
+            result[stage]["count"] = count
+        return result
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics store rendered in Prometheus text format at /metrics.
+    Hot-path timings live in Histograms; everything else (FPS, counters, queue depths) is read
+    from the pipeline objects by collectors only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {} # {name: {labels_tuple: Histogram}}
+        self._help = {}
+        self._collectors = [] # Callables yielding (name, type, help, labels dict, value)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        """Returns (creating if needed) the histogram for name + labels."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            histogram = family.get(key)
+            if histogram is None:
+                histogram = Histogram(buckets=buckets)
+                family[key] = histogram
+                self._help[name] = help_text
+            return histogram
+
+    def remove_labels(self, **labels):
+        """Drops every histogram whose labels include all of the given ones (e.g. a stopped stream)."""
+        wanted = set(labels.items())
+        with self._lock:
+            for family in self._histograms.values():
+                for key in [k for k in family if wanted.issubset(set(k))]:
+                    del family[key]
+
+    def register_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        parts = []
+        for key, value in labels:
+            escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            parts.append(f'{key}="{escaped}"')
+        return "{" + ",".join(parts) + "}"
+
+    def render_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            families = {name: dict(family) for name, family in self._histograms.items()}
+            collectors = list(self._collectors)
+
+        for name, family in families.items():
+            if not family:
+                continue
+            lines.append(f"# HELP {name} {self._help.get(name, '')}")
+            lines.append(f"# TYPE {name} histogram")
+            quantile_lines = []
+            for key, histogram in family.items():
+                cumulative, total, count = histogram.snapshot()
+                bounds = [str(b) for b in histogram.upper_bounds] + ["+Inf"]
+                for bound, value in zip(bounds, cumulative):
+                    lines.append(f"{name}_bucket{self._format_labels(key + (('le', bound),))} {value}")
+                lines.append(f"{name}_sum{self._format_labels(key)} {total}")
+                lines.append(f"{name}_count{self._format_labels(key)} {count}")
+                for q, value in histogram.quantiles().items():
+                    quantile_lines.append(f"{name}_quantile{self._format_labels(key + (('quantile', str(q)),))} {value}")
+            if quantile_lines:
+                lines.append(f"# HELP {name}_quantile Recent-window quantiles of {name}.")
+                lines.append(f"# TYPE {name}_quantile gauge")
+                lines.extend(quantile_lines)
+
+        # Gauges/counters read at scrape time, grouped per metric name
+        samples = {}
+        for collector in collectors:
+            try:
+                for name, metric_type, help_text, labels, value in collector():
+                    samples.setdefault(name, (metric_type, help_text, []))[2].append((labels, value))
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+        for name, (metric_type, help_text, values) in samples.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in values:
+                lines.append(f"{name}{self._format_labels(tuple(sorted(labels.items())))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Helper to get the singleton instance
+def get_metrics_registry():
+    global _metrics_registry_instance
+    if _metrics_registry_instance is None:
+        _metrics_registry_instance = MetricsRegistry()
+    return _metrics_registry_instance
@@ -0,0 +1,87 @@
+# src/core/motion_gate.py
+import cv2
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class MotionGate:
+    """
+    Decides, frame by frame, whether the full YOLO detector needs to run.
+
+    A cheap motion score (mean absolute difference of a small, blurred grayscale copy of the frame
+    against the frame used for the last detection) is computed for every frame. The detector runs
+    when the score crosses motion_threshold, or when the current detection interval has elapsed.
+    The interval shrinks from max_interval towards 1 as motion and the number of tracked people grow,
+    so busy scenes get near-full-rate detection and still lectures get very little.
+    """
+
+    def __init__(self, max_interval=6, motion_threshold=4.0, crowd_size=30, analysis_width=160):
+        """
+        Args:
+            max_interval (int): Largest number of frames between two detector runs (calm, empty room).
+            motion_threshold (float): Motion score (0-255 mean abs diff) that forces an immediate detection.
+            crowd_size (int): Number of tracked persons at which detection runs on every frame.
+            analysis_width (int): Width the frame is downscaled to for the motion score.
+        """
+        self.max_interval = max(1, int(max_interval))
+        self.motion_threshold = float(motion_threshold)
+        self.crowd_size = max(1, int(crowd_size))
+        self.analysis_width = analysis_width
+
+        self._reference = None # Small grayscale frame from the last detector run
+        self._frames_since_detection = 0
+        self.current_interval = 1
+        self.last_motion_score = 0.0
+        self.frames_seen = 0
+        self.detections_run = 0
+
+    def reset(self):
+        """Forget the reference frame so the next frame always triggers a detection."""
+        self._reference = None
+        self._frames_since_detection = 0
+        self.current_interval = 1
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.analysis_width / float(width) if width > self.analysis_width else 1.0
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_detect(self, frame, tracked_count=0):
+        """
+        Returns True if the detector should run on this frame. Call once per processed frame.
+        Args:
+            frame (np.array): The current frame (BGR).
+            tracked_count (int): Number of persons the tracker currently follows.
+        """
+        self.frames_seen += 1
+        small = self._downscale(frame)
+        if self._reference is None or self._reference.shape != small.shape:
+            self.last_motion_score = float('inf')
+        else:
+            self.last_motion_score = float(np.mean(cv2.absdiff(small, self._reference)))
+
+        # More motion or more people -> shorter interval between detector runs
+        motion_factor = min(1.0, self.last_motion_score / self.motion_threshold) if self.motion_threshold > 0 else 1.0
+        crowd_factor = min(1.0, tracked_count / float(self.crowd_size))
+        activity = max(motion_factor, crowd_factor)
+        self.current_interval = max(1, int(round(self.max_interval - (self.max_interval - 1) * activity)))
+
+        self._frames_since_detection += 1
+        if self.last_motion_score >= self.motion_threshold or self._frames_since_detection >= self.current_interval:
+            self._reference = small
+            self._frames_since_detection = 0
+            self.detections_run += 1
+            return True
+        return False
+
+    def get_stats(self):
+        motion = self.last_motion_score
+        return {
+            "detection_interval": self.current_interval,
+            "motion_score": round(motion, 2) if np.isfinite(motion) else None,
+            "detection_rate": round(self.detections_run / self.frames_seen, 3) if self.frames_seen else 0.0,
+        }
@@ -1,91 +1,249 @@
 # src/core/object_detector.py
-from ultralytics import YOLO
 import cv2
+import os
+import time
+import shutil
 import logging
 import threading
+import numpy as np
+# ultralytics (and torch) are imported in load_model(): importing this module must stay cheap so
+# the API can start serving before the model is loaded
 
 logger = logging.getLogger(__name__)
 
+# Inference backends ObjectDetector can run on. Anything other than 'pytorch' is exported from the
+# .pt weights on first use and cached under models/exported/ (see _export_model).
+SUPPORTED_BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+# Compact per-frame detection result: one record per box, no Python objects
+DETECTION_DTYPE = np.dtype([('bbox', np.int32, (4,)), ('confidence', np.float32), ('class_id', np.int16)])
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
 class ObjectDetector:
-    _instance = None
+    _instances = {} # One instance per (model_path, backend, int8) configuration
     _lock = threading.Lock() # Ensure thread safety for singleton
 
-    def __new__(cls, model_path='yolov8n.pt'):
-        if cls._instance is None:
+    def __new__(cls, model_path='yolov8n.pt', backend='pytorch', int8=False):
+        key = (model_path, backend, bool(int8))
+        if key not in cls._instances:
             with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(ObjectDetector, cls).__new__(cls)
-                    cls._instance._initialized = False # Use an internal flag for initialization
-        return cls._instance
+                if key not in cls._instances:
+                    instance = super(ObjectDetector, cls).__new__(cls)
+                    instance._initialized = False # Use an internal flag for initialization
+                    cls._instances[key] = instance
+        return cls._instances[key]
 
-    def __init__(self, model_path='yolov8n.pt'):
+    def __init__(self, model_path='yolov8n.pt', backend='pytorch', int8=False):
         if not self._initialized: # Only initialize once
+            if backend not in SUPPORTED_BACKENDS:
+                raise ValueError(f"Unsupported detector backend '{backend}' (expected one of {SUPPORTED_BACKENDS}).")
             self.model_path = model_path
+            self.backend = backend
+            self.int8 = bool(int8) # Use an INT8-quantized export (onnx / openvino only)
+            self.export_dir = os.path.join(os.path.dirname(model_path) or '.', 'exported')
+            self.loaded_model_path = None # The file/folder actually loaded (the .pt or the cached export)
             self.model = None
             self.class_names = [] # To store names of detected classes
+            self.person_class_id = -1 # Class ID of 'person' in the loaded model (COCO: 0); looked up once per load
+            self.load_seconds = None # Import + (export) + load time of the last load_model()
+            self.warmup_seconds = None
+            self._load_lock = threading.Lock() # Background loading and get_object_detector() may race
+            self._inference_lock = threading.Lock() # The model is shared by every stream; one forward pass at a time
             self._initialized = True
-            logger.info(f"ObjectDetector initialized with model path: {model_path}")
+            logger.info(f"ObjectDetector initialized with model path: {model_path} (backend={backend}, int8={self.int8})")
 
     def load_model(self):
-        """Loads the YOLOv8 model."""
-        if self.model is None:
+        """Loads the YOLOv8 model, exporting it to the configured backend first if needed."""
+        with self._load_lock:
+            if self.model is not None:
+                return
+            started = time.perf_counter()
             try:
-                # Load a pre-trained YOLOv8 model
-                self.model = YOLO(self.model_path)
+                from ultralytics import YOLO
+                if self.backend == 'pytorch':
+                    if self.int8:
+                        logger.warning("INT8 is only available for the onnx/openvino backends; loading FP32 PyTorch weights.")
+                    # Load a pre-trained YOLOv8 model
+                    self.loaded_model_path = self.model_path
+                    self.model = YOLO(self.model_path)
+                else:
+                    self.loaded_model_path = self._export_model()
+                    self.model = YOLO(self.loaded_model_path, task='detect') # Same predict()/Results API as PyTorch
                 self.class_names = self.model.names # Get class names from the model
-                logger.info(f"YOLOv8 model '{self.model_path}' loaded successfully.")
+                self.person_class_id = self.class_id('person') # Read per frame by the pipelines
+                self.load_seconds = time.perf_counter() - started
+                logger.info(f"YOLOv8 model '{self.loaded_model_path}' loaded successfully ({self.backend}) in {self.load_seconds:.2f}s.")
             except Exception as e:
-                logger.error(f"Failed to load YOLOv8 model from {self.model_path}: {e}")
+                logger.error(f"Failed to load YOLOv8 model from {self.model_path} ({self.backend}): {e}")
                 self.model = None # Ensure model is None on failure
                 raise
 
-    def detect(self, frame):
+    def _exported_model_path(self):
+        """Where the converted model for this backend/precision is cached."""
+        base = os.path.splitext(os.path.basename(self.model_path))[0]
+        precision = 'int8' if self.int8 else 'fp32'
+        if self.backend == 'onnx':
+            return os.path.join(self.export_dir, f"{base}_{precision}.onnx")
+        return os.path.join(self.export_dir, f"{base}_{precision}_openvino_model")
+
+    def _export_model(self):
+        """
+        Exports the .pt weights to ONNX/OpenVINO on first use and caches the result, so later
+        starts load the converted model directly. Exports use a dynamic batch axis so the
+        InferenceScheduler can still send batches.
+        """
+        target = self._exported_model_path()
+        if os.path.exists(target):
+            logger.info(f"Using cached {self.backend} export: {target}")
+            return target
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        logger.info(f"Exporting '{self.model_path}' to {self.backend} (int8={self.int8}); this only happens once...")
+        from ultralytics import YOLO
+        source_model = YOLO(self.model_path)
+        if self.backend == 'onnx':
+            exported = source_model.export(format='onnx', dynamic=True)
+            if self.int8:
+                # Ultralytics only exports FP32 ONNX; quantize the weights with ONNX Runtime
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+                os.remove(exported)
+            else:
+                shutil.move(exported, target)
+        else:
+            # OpenVINO INT8 uses NNCF post-training quantization on Ultralytics' calibration set
+            exported = source_model.export(format='openvino', dynamic=True, int8=self.int8)
+            shutil.move(exported, target)
+        logger.info(f"Cached {self.backend} export at {target}")
+        return target
+
+    def warm_up(self, imgsz=None, frame_size=(480, 640)):
+        """
+        Runs one inference on a blank frame so the first real frame doesn't pay for lazy
+        initialization in the runtime (CUDA context, kernel selection, graph optimization).
+        Returns the time it took in seconds.
+        """
+        if self.model is None:
+            return None
+        started = time.perf_counter()
+        self.detect_batch([np.zeros((*frame_size, 3), dtype=np.uint8)], imgsz=imgsz) # Same path as the scheduler
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info(f"YOLOv8 model warmed up in {self.warmup_seconds:.2f}s.")
+        return self.warmup_seconds
+
+    def class_id(self, class_name):
+        names = self.class_names.items() if isinstance(self.class_names, dict) else enumerate(self.class_names)
+        for class_id, name in names:
+            if name == class_name:
+                return int(class_id)
+        return -1
+
+    def detect(self, frame, classes=None, min_confidence=0.0, imgsz=None):
         """
         Performs object detection on a single frame.
         Args:
-            frame (np.array): The input image frame (OpenCV format).
+            frame (np.array): The input image frame (OpenCV format). It is not modified or copied.
+            classes (list[int]): Only keep these class IDs (None = all classes).
+            min_confidence (float): Drop detections below this confidence.
+            imgsz (int): Inference resolution (longest side, rounded up to a multiple of 32). The frame is
+                         letterboxed to this size and boxes come back in the frame's own coordinates.
+                         None uses the model default.
+        Returns:
+            np.ndarray: Structured array of DETECTION_DTYPE (fields 'bbox', 'confidence', 'class_id').
+                        Use to_dicts() to turn it into API-friendly dicts and draw_detections() to annotate.
+        """
+        if self.model is None:
+            logger.warning("YOLOv8 model not loaded. Skipping detection.")
+            return empty_detections()
+
+        with self._inference_lock:
+            results = self.model(frame, verbose=False, **self._predict_kwargs(imgsz)) # Run inference, suppress verbose output
+
+        return self._process_results(results[0], classes, min_confidence)
+
+    def detect_batch(self, frames, classes=None, min_confidence=0.0, imgsz=None):
+        """
+        Performs object detection on several frames with a single batched model call.
+        Args:
+            frames (list[np.array]): Input frames, possibly from different streams and of different sizes.
+            imgsz (int): Inference resolution shared by the whole batch (see detect()).
         Returns:
-            np.array: The frame with bounding boxes and labels drawn.
-            list: A list of detected objects (e.g., [{'class': 'person', 'confidence': 0.95, 'bbox': [x1, y1, x2, y2]}, ...])
+            list[np.ndarray]: One DETECTION_DTYPE array per input frame, in the same order.
         """
         if self.model is None:
             logger.warning("YOLOv8 model not loaded. Skipping detection.")
-            return frame, []
-
-        results = self.model(frame, verbose=False) # Run inference, suppress verbose output
-
-        detected_objects_info = []
-        annotated_frame = frame.copy() # Make a copy to draw on
-
-        # Process results and draw bounding boxes
-        for r in results:
-            boxes = r.boxes # Bounding boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0]) # Get coordinates
-                confidence = round(float(box.conf[0]), 2) # Confidence score
-                class_id = int(box.cls[0]) # Class ID
-                class_name = self.class_names[class_id] # Class name
-
-                detected_objects_info.append({
-                    'class': class_name,
-                    'confidence': confidence,
-                    'bbox': [x1, y1, x2, y2]
-                })
-
-                # Only draw for 'person' class for now, or if you want to see all
-                if class_name == 'person':
-                    # Draw bounding box
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 0), 2) # Green box
-                    # Put label
-                    label = f"{class_name} {confidence:.2f}"
-                    cv2.putText(annotated_frame, label, (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        return annotated_frame, detected_objects_info
-
-# Helper function to get the singleton instance
-def get_object_detector(model_path='yolov8n.pt'):
-    detector = ObjectDetector(model_path)
+            return [empty_detections() for _ in frames]
+        if not frames:
+            return []
+
+        with self._inference_lock:
+            results = self.model(list(frames), verbose=False, **self._predict_kwargs(imgsz)) # One Results object per frame
+
+        return [self._process_results(r, classes, min_confidence) for r in results]
+
+    @staticmethod
+    def _predict_kwargs(imgsz):
+        if not imgsz:
+            return {}
+        return {'imgsz': int(-(-int(imgsz) // 32) * 32)} # YOLO strides need a multiple of 32
+
+    def _process_results(self, result, classes=None, min_confidence=0.0):
+        """Turns one YOLO Results object into a DETECTION_DTYPE array using whole-array operations."""
+        # boxes.data is (N, 6): x1, y1, x2, y2, conf, cls -> one device-to-host transfer for everything
+        data = result.boxes.data
+        data = data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+        if data.size == 0:
+            return empty_detections()
+
+        keep = data[:, 4] >= min_confidence
+        if classes is not None:
+            keep &= np.isin(data[:, 5].astype(np.int64), np.asarray(classes, dtype=np.int64))
+        data = data[keep]
+
+        detections = np.empty(len(data), dtype=DETECTION_DTYPE)
+        detections['bbox'] = data[:, :4] # float -> int32 truncation, like the previous int() per coordinate
+        detections['confidence'] = data[:, 4]
+        detections['class_id'] = data[:, 5]
+        return detections
+
+    def draw_detections(self, frame, detections, classes=None):
+        """
+        Draws boxes and labels in place on frame (no copy). By default only 'person' boxes are drawn.
+        Returns the same frame for convenience.
+        """
+        if classes is None:
+            classes = [self.person_class_id]
+        if len(detections) == 0:
+            return frame
+        for bbox, confidence, class_id in zip(detections['bbox'].tolist(), detections['confidence'].tolist(),
+                                              detections['class_id'].tolist()):
+            if class_id not in classes:
+                continue
+            x1, y1, x2, y2 = bbox
+            # Draw bounding box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2) # Green box
+            # Put label
+            label = f"{self.class_names[class_id]} {confidence:.2f}"
+            cv2.putText(frame, label, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return frame
+
+    def to_dicts(self, detections):
+        """
+        API-boundary conversion of a DETECTION_DTYPE array into the historical dict format:
+        [{'class': 'person', 'confidence': 0.95, 'bbox': [x1, y1, x2, y2]}, ...]
+        """
+        return [
+            {'class': self.class_names[class_id], 'confidence': round(confidence, 2), 'bbox': bbox}
+            for bbox, confidence, class_id in zip(detections['bbox'].tolist(), detections['confidence'].tolist(),
+                                                  detections['class_id'].tolist())
+        ]
+
+# Helper function to get the singleton instance for a given model/backend
+def get_object_detector(model_path='yolov8n.pt', backend='pytorch', int8=False):
+    detector = ObjectDetector(model_path, backend=backend, int8=int8)
     if detector.model is None: # Load model only if not already loaded
         detector.load_model()
     return detector
\ No newline at end of file
@@ -0,0 +1,242 @@
+# src/core/occupancy.py
+import os
+import time
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rollups kept per stream: (bucket seconds, number of buckets). Defaults: 1 s for an hour,
+# 1 min for a day, 1 h for 60 days; older buckets are overwritten in place.
+ROLLUPS = ((1, 3600), (60, 1440), (3600, 24 * 60))
+DWELL_HISTORY = int(os.getenv("CLASSYCAM_DWELL_HISTORY", "20000")) # Finished tracks kept for dwell queries
+MAX_CURVE_POINTS = 2000 # query() picks the finest rollup that returns at most this many buckets
+MAX_SAMPLE_GAP = 2.0 # Seconds; a longer gap between frames (stall, restart) doesn't count as dwell time
+
+# Finished track: when it was first/last seen, how long it spent in the room, and the tracker session
+# it belonged to (IDs restart at every session, so person_id alone doesn't identify a track)
+DWELL_DTYPE = np.dtype([('person_id', np.int64), ('first_seen', np.float64), ('last_seen', np.float64),
+                        ('in_room_seconds', np.float64), ('session', np.int64)])
+
+class OccupancyRollup:
+    """
+    Occupancy at one resolution in fixed-size ring arrays: per bucket the sum/max of the visible
+    and in-room counts and the number of samples. A slot is reset when its bucket comes around
+    again, so adding a sample is O(1) and memory never grows.
+    """
+
+    def __init__(self, bucket_seconds, buckets):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self._bucket_id = np.full(buckets, -1, dtype=np.int64) # Absolute bucket number held by each slot
+        self._sum = np.zeros((buckets, 2), dtype=np.float64) # [visible, in_room]
+        self._max = np.zeros((buckets, 2), dtype=np.int32)
+        self._count = np.zeros(buckets, dtype=np.int32)
+
+    def add(self, timestamp, visible, in_room):
+        bucket = int(timestamp // self.bucket_seconds)
+        slot = bucket % self.buckets
+        if self._bucket_id[slot] != bucket: # Slot still holds an old bucket: start over
+            self._bucket_id[slot] = bucket
+            self._sum[slot] = 0
+            self._max[slot] = 0
+            self._count[slot] = 0
+        self._sum[slot, 0] += visible
+        self._sum[slot, 1] += in_room
+        self._max[slot, 0] = max(self._max[slot, 0], visible)
+        self._max[slot, 1] = max(self._max[slot, 1], in_room)
+        self._count[slot] += 1
+
+    def oldest(self, now):
+        """Start time of the oldest bucket this rollup can still hold."""
+        return (int(now // self.bucket_seconds) - self.buckets + 1) * self.bucket_seconds
+
+    def curve(self, since, until):
+        """
+        Returns buckets overlapping [since, until] as arrays, gathered with one fancy-index:
+        (bucket start times, avg visible, max visible, avg in room, max in room, valid mask).
+        """
+        last = int(until // self.bucket_seconds)
+        first = max(int(since // self.bucket_seconds), last - self.buckets + 1) # Older buckets are gone anyway
+        bucket_ids = np.arange(first, last + 1, dtype=np.int64)
+        slots = bucket_ids % self.buckets
+        valid = (self._bucket_id[slots] == bucket_ids) & (self._count[slots] > 0)
+        counts = np.maximum(self._count[slots], 1)[:, None]
+        averages = self._sum[slots] / counts
+        return bucket_ids * self.bucket_seconds, averages[:, 0], self._max[slots, 0], averages[:, 1], self._max[slots, 1], valid
+
+class OccupancyTracker:
+    """
+    Per-stream occupancy time series and dwell times, updated incrementally from every processed
+    frame (tracked persons + who the ZoneMonitor considers in the room), never recomputed from
+    raw detections.
+    """
+
+    def __init__(self, stream_id, rollups=ROLLUPS, dwell_history=DWELL_HISTORY):
+        self.stream_id = stream_id
+        self._lock = threading.Lock() # update() runs in the grabber thread, queries in API threads
+        self._rollups = [OccupancyRollup(seconds, buckets) for seconds, buckets in rollups]
+        self._active = {} # {person_id: [first_seen, last_seen, in_room_seconds, session]}
+        self._session = 0 # Bumped by reset_tracks(), when the tracker starts numbering its IDs again
+        self._last_update = None
+        self._current = (0, 0) # (visible, in_room) of the latest sample
+        # Finished tracks in a ring of DWELL_DTYPE records
+        self._dwell = np.zeros(dwell_history, dtype=DWELL_DTYPE)
+        self._dwell_count = 0 # Total ever written; slot = count % size
+
+    def update(self, timestamp, tracked_persons, in_room_ids):
+        """
+        Adds one frame's sample.
+        Args:
+            tracked_persons (dict): {person_id: {...}} currently tracked.
+            in_room_ids (set): IDs the ZoneMonitor currently counts as in the room.
+        """
+        with self._lock:
+            visible = len(tracked_persons)
+            in_room = sum(1 for person_id in tracked_persons if person_id in in_room_ids)
+            for rollup in self._rollups:
+                rollup.add(timestamp, visible, in_room)
+            self._current = (visible, in_room)
+
+            step = 0.0
+            if self._last_update is not None:
+                step = min(max(timestamp - self._last_update, 0.0), MAX_SAMPLE_GAP)
+            self._last_update = timestamp
+
+            for person_id in tracked_persons:
+                record = self._active.get(person_id)
+                if record is None:
+                    self._active[person_id] = [timestamp, timestamp, 0.0, self._session]
+                    continue
+                record[1] = timestamp
+                if person_id in in_room_ids:
+                    record[2] += step
+            if len(self._active) > visible: # Some tracks ended: move them to the dwell history
+                for person_id in [p for p in self._active if p not in tracked_persons]:
+                    self._finish(person_id, self._active.pop(person_id))
+
+    def current(self):
+        """(visible, in_room) counts of the latest sample."""
+        return self._current
+
+    def _finish(self, person_id, record):
+        slot = self._dwell_count % len(self._dwell)
+        self._dwell[slot] = (person_id, record[0], record[1], record[2], record[3])
+        self._dwell_count += 1
+
+    def resume(self, person_id):
+        """
+        Reopens the latest finished record of person_id (the track was re-identified after being
+        lost), so the gap counts as one visit instead of two. No-op if it is active or unknown.
+        """
+        with self._lock:
+            if person_id in self._active:
+                return
+            stored = min(self._dwell_count, len(self._dwell))
+            slots = np.flatnonzero(self._dwell['person_id'][:stored] == person_id)
+            if not len(slots):
+                return
+            slot = slots[np.argmax(self._dwell['last_seen'][slots])]
+            record = self._dwell[slot]
+            self._active[person_id] = [float(record['first_seen']), float(record['last_seen']), float(record['in_room_seconds']),
+                                       int(record['session'])] # Still the same visit
+            self._dwell['person_id'][slot] = -1 # Emptied; skipped by dwell_summary
+
+    def reset_tracks(self):
+        """Closes every active track (the tracker restarted, so its IDs are about to be reused)."""
+        with self._lock:
+            for person_id, record in self._active.items():
+                self._finish(person_id, record)
+            self._active = {}
+            self._session += 1
+            self._last_update = None
+            self._current = (0, 0)
+
+    def occupancy_curve(self, since=None, until=None, resolution=None):
+        """
+        Occupancy over [since, until] (defaults: the last hour).
+        Args:
+            resolution (int): Bucket size in seconds (one of the rollups); None = finest one that
+                              covers the range with at most MAX_CURVE_POINTS buckets.
+        Returns:
+            dict: {'resolution', 't', 'avg', 'max', 'in_room_avg', 'in_room_max'}; buckets without
+                  samples are null.
+        """
+        now = time.time()
+        until = now if until is None else until
+        since = until - 3600 if since is None else since
+        if since > until:
+            raise ValueError("since must not be after until")
+        if resolution is not None:
+            candidates = [r for r in self._rollups if r.bucket_seconds == resolution]
+            if not candidates:
+                raise ValueError(f"resolution must be one of {[r.bucket_seconds for r in self._rollups]}")
+            rollup = candidates[0]
+        else:
+            rollup = self._rollups[-1]
+            for candidate in self._rollups:
+                if candidate.oldest(now) <= since and (until - since) / candidate.bucket_seconds <= MAX_CURVE_POINTS:
+                    rollup = candidate
+                    break
+        with self._lock:
+            starts, avg, peak, in_room_avg, in_room_peak, valid = rollup.curve(since, until)
+
+        def column(values, digits=None):
+            values = np.round(values, digits).tolist() if digits is not None else values.tolist()
+            return [v if ok else None for v, ok in zip(values, valid.tolist())]
+
+        return {
+            "stream_id": self.stream_id,
+            "resolution": rollup.bucket_seconds,
+            "since": since,
+            "until": until,
+            "t": starts.tolist(),
+            "avg": column(avg, 2),
+            "max": column(peak),
+            "in_room_avg": column(in_room_avg, 2),
+            "in_room_max": column(in_room_peak),
+        }
+
+    def dwell_summary(self, since=None, until=None, limit=500):
+        """
+        Dwell times of the tracks seen during [since, until], finished and still active.
+        Returns:
+            dict: {'tracks': count, 'visible_seconds' / 'in_room_seconds': {mean, median, p90, max},
+                   'entries': newest-first per-track records (at most limit)}
+        """
+        until = time.time() if until is None else until
+        since = until - 3600 if since is None else since
+        with self._lock:
+            stored = min(self._dwell_count, len(self._dwell))
+            finished = self._dwell[:stored]
+            finished = finished[(finished['last_seen'] >= since) & (finished['first_seen'] <= until) & (finished['person_id'] >= 0)]
+            active = np.array([(person_id, *record) for person_id, record in self._active.items()
+                               if record[1] >= since and record[0] <= until], dtype=DWELL_DTYPE)
+        records = np.concatenate([finished, active])
+        is_active = np.arange(len(records)) >= len(finished) # From the records themselves: a finished track may share an active ID
+        visible = records['last_seen'] - records['first_seen']
+
+        def stats(values):
+            if not len(values):
+                return {"mean": 0.0, "median": 0.0, "p90": 0.0, "max": 0.0}
+            return {"mean": round(float(values.mean()), 1), "median": round(float(np.median(values)), 1),
+                    "p90": round(float(np.percentile(values, 90)), 1), "max": round(float(values.max()), 1)}
+
+        order = np.argsort(-records['last_seen'])[:limit]
+        entries = [
+            {"person_id": int(records['person_id'][i]), "first_seen": float(records['first_seen'][i]),
+             "last_seen": float(records['last_seen'][i]), "visible_seconds": round(float(visible[i]), 1),
+             "in_room_seconds": round(float(records['in_room_seconds'][i]), 1),
+             "session": int(records['session'][i]), "active": bool(is_active[i])}
+            for i in order.tolist()
+        ]
+        return {
+            "stream_id": self.stream_id,
+            "since": since,
+            "until": until,
+            "tracks": int(len(records)),
+            "visible_seconds": stats(visible),
+            "in_room_seconds": stats(records['in_room_seconds']),
+            "entries": entries,
+        }
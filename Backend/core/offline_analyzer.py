@@ -0,0 +1,344 @@
+# src/core/offline_analyzer.py
+"""
+Offline (faster than real time) analysis of recorded classroom videos.
+
+Runs the same ObjectDetector / PersonTracker / ZoneMonitor chain as a live VideoStream, but reads
+frames as fast as they decode: a reader thread decodes ahead into a bounded queue while the main
+thread runs batched inference, and several files are spread over a process pool.
+
+Per video, <output_dir>/<video name>-<path hash>/ receives (API jobs write under <output_dir>/<job_id>/):
+    tracks.jsonl   one line per analyzed frame: {"frame", "t", "tracks": {id: [x1, y1, x2, y2]}}
+    events.jsonl   zone events ({"frame", "t", "type", "person_id", "zone" or "line"}), 't' in seconds from the start of the video
+    summary.json   counts for attendance reports (unique persons, peak/average occupancy, events per type)
+
+CLI, from the Backend folder:
+    python -m core.offline_analyzer recordings/*.mp4 --output reports/ --workers 2 --batch-size 16
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import cv2
+from core.object_detector import get_object_detector
+from core.person_tracker import PersonTracker
+from core.zone_monitor import ZoneMonitor
+from core.zones import load_zone_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = 'models/yolov8n.pt'
+DEFAULT_OUTPUT_DIR = os.getenv("CLASSYCAM_ANALYSIS_DIR", "data/analysis")
+# Videos the API may analyze must be inside this folder (relative paths are taken relative to it)
+MEDIA_ROOT = os.getenv("CLASSYCAM_MEDIA_ROOT", "data/media")
+DEFAULT_BATCH_SIZE = 16
+# Limits for API jobs: every worker process loads its own copy of the model
+ANALYSIS_MAX_WORKERS = max(1, int(os.getenv("CLASSYCAM_ANALYSIS_MAX_WORKERS", str(os.cpu_count() or 1))))
+MAX_BATCH_SIZE = 64
+TRACKER_MAX_DISTANCE = float(os.getenv("CLASSYCAM_TRACKER_MAX_DISTANCE", "150"))
+
+_analysis_job_manager_instance = None # To hold the singleton instance
+
+class _FrameReader:
+    """Decodes a video on its own thread, keeping up to `prefetch` frames ready for the detector."""
+
+    def __init__(self, path, frame_step=1, prefetch=64):
+        self._cap = cv2.VideoCapture(path)
+        if not self._cap.isOpened():
+            raise IOError(f"Cannot open video file: {path}")
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self._frame_step = max(1, int(frame_step))
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._read_loop, name="offline-reader", daemon=True)
+        self._thread.start()
+
+    def _read_loop(self):
+        try:
+            for index in itertools.count():
+                if self._stopped:
+                    break
+                if index % self._frame_step:
+                    if not self._cap.grab(): # Skipped frames are demuxed but not converted to BGR
+                        break
+                    continue
+                ret, frame = self._cap.read()
+                if not ret:
+                    break
+                self._queue.put((index, index / self.fps, frame))
+        finally:
+            self._queue.put(None) # End of video
+            self._cap.release()
+
+    def batches(self, batch_size):
+        """Yields lists of (frame_index, seconds, frame) of up to batch_size frames."""
+        batch = []
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self):
+        self._stopped = True
+        while self._thread.is_alive():
+            try:
+                self._queue.get_nowait() # Unblock a reader waiting on a full queue
+            except queue.Empty:
+                self._thread.join(timeout=0.1)
+
+
+def output_name(video_path):
+    """Output folder name of a video: its name plus a hash of its full path, so a/lesson.mp4 and b/lesson.mp4 don't collide."""
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    digest = hashlib.sha1(os.path.abspath(video_path).encode()).hexdigest()[:8]
+    return f"{name}-{digest}"
+
+
+def resolve_media_path(path, media_root=MEDIA_ROOT):
+    """
+    Resolves a video path given to the API against media_root.
+    Raises:
+        ValueError: If the path (after resolving symlinks and '..') is outside media_root.
+    """
+    root = os.path.realpath(media_root)
+    resolved = os.path.realpath(os.path.join(root, path)) # An absolute path replaces root
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Video path outside the media folder ({media_root}): {path}")
+    return resolved
+
+
+def analyze_video(video_path, output_dir=DEFAULT_OUTPUT_DIR, model_path=DEFAULT_MODEL_PATH, backend='pytorch',
+                  int8=False, batch_size=DEFAULT_BATCH_SIZE, imgsz=None, frame_step=1, min_confidence=0.0, zones=None):
+    """
+    Analyzes one video file and writes tracks/events/summary to output_dir/<output_name(video_path)>/.
+    Args:
+        batch_size (int): Frames per model call.
+        imgsz (int): Inference resolution (None = model default).
+        frame_step (int): Analyze every Nth frame (the tracker copes with the larger steps).
+        zones (dict): Zone config (see core.zones), e.g. the camera's live config; None = default zones.
+    Returns:
+        dict: The summary that was written to summary.json.
+    """
+    detector = get_object_detector(model_path=model_path, backend=backend, int8=int8)
+    person_class_id = detector.person_class_id
+    tracker = PersonTracker(max_disappeared=50, max_distance=TRACKER_MAX_DISTANCE)
+    zones = ZoneMonitor(name=os.path.basename(video_path), config=zones)
+
+    target_dir = os.path.join(output_dir, output_name(video_path))
+    os.makedirs(target_dir, exist_ok=True)
+
+    reader = _FrameReader(video_path, frame_step=frame_step, prefetch=max(2 * batch_size, 32))
+    started = time.perf_counter()
+    frames_analyzed, occupancy_total, peak_occupancy = 0, 0, 0
+    person_ids, event_counts = set(), {}
+    try:
+        with open(os.path.join(target_dir, "tracks.jsonl"), "w") as tracks_file, \
+             open(os.path.join(target_dir, "events.jsonl"), "w") as events_file:
+            for batch in reader.batches(batch_size):
+                results = detector.detect_batch([frame for _, _, frame in batch], classes=[person_class_id],
+                                                min_confidence=min_confidence, imgsz=imgsz)
+                for (frame_index, seconds, frame), detections in zip(batch, results):
+                    tracked = tracker.update(detections)
+                    height, width = frame.shape[:2]
+                    for event in zones.check(tracked, width, height, timestamp=seconds):
+                        event_counts[event['type']] = event_counts.get(event['type'], 0) + 1
+                        # The whole event ('zone' entered / 'line' crossed included) as the EventStore keeps it; 't' replaces 'timestamp'
+                        fields = {k: v for k, v in event.items() if k != 'timestamp'}
+                        events_file.write(json.dumps({"frame": frame_index, "t": round(seconds, 3), **fields}) + "\n")
+                    tracks_file.write(json.dumps({
+                        "frame": frame_index,
+                        "t": round(seconds, 3),
+                        "tracks": dict(zip(tracked.ids.tolist(), tracked.bboxes.tolist())),
+                    }, separators=(',', ':')) + "\n")
+                    frames_analyzed += 1
+                    occupancy_total += len(tracked)
+                    peak_occupancy = max(peak_occupancy, len(tracked))
+                    person_ids.update(tracked.keys())
+    finally:
+        reader.close()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "video": os.path.abspath(video_path),
+        "fps": reader.fps,
+        "duration_seconds": round(reader.frame_count / reader.fps, 2) if reader.frame_count else None,
+        "frames_analyzed": frames_analyzed,
+        "frame_step": frame_step,
+        "unique_persons": len(person_ids),
+        "peak_occupancy": peak_occupancy,
+        "average_occupancy": round(occupancy_total / frames_analyzed, 2) if frames_analyzed else 0.0,
+        "events": event_counts,
+        "processing_seconds": round(elapsed, 2),
+        "analysis_fps": round(frames_analyzed / elapsed, 2) if elapsed > 0 else 0.0,
+        "output_dir": os.path.abspath(target_dir),
+    }
+    with open(os.path.join(target_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    logger.info(f"Analyzed {video_path}: {frames_analyzed} frame(s) at {summary['analysis_fps']} fps.")
+    return summary
+
+
+def analyze_files(video_paths, output_dir=DEFAULT_OUTPUT_DIR, workers=1, on_result=None, isolate=False, **options):
+    """
+    Analyzes several videos. With workers > 1 each file runs in its own process (each loads the
+    model once); with workers == 1 they run here, sharing this process' detector.
+    Args:
+        isolate (bool): Always use worker processes, even for one worker/file; set by the API so the
+                        analysis never shares (and locks) the live streams' detector.
+        on_result (callable): Called as on_result(path, summary_or_None, error_or_None) after each file.
+        options: Passed to analyze_video (model_path, backend, int8, batch_size, imgsz, frame_step, ...).
+    Returns:
+        dict: {video_path: summary or {'error': message}}
+    """
+    results = {}
+
+    def finish(path, summary, error):
+        results[path] = summary if error is None else {"error": error}
+        if error is not None:
+            logger.error(f"Offline analysis of {path} failed: {error}")
+        if on_result is not None:
+            on_result(path, summary, error)
+
+    if not isolate and (workers <= 1 or len(video_paths) <= 1):
+        for path in video_paths:
+            try:
+                finish(path, analyze_video(path, output_dir, **options), None)
+            except Exception as e:
+                finish(path, None, str(e))
+        return results
+
+    # 'spawn' so workers don't inherit the parent's model/CUDA/thread state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(video_paths))), mp_context=context) as pool:
+        futures = {pool.submit(analyze_video, path, output_dir, **options): path for path in video_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                finish(path, future.result(), None)
+            except Exception as e:
+                finish(path, None, str(e))
+    return results
+
+
+class AnalysisJobManager:
+    """
+    Runs offline analysis jobs for the API one at a time in the background and keeps their status for
+    polling. Jobs always run in worker processes with their own model, so their batched forward passes
+    never hold the live streams' detector; each job writes to its own <output_dir>/<job_id>/ folder.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._jobs = {} # {job_id: status dict}
+
+    def submit(self, video_paths, output_dir=DEFAULT_OUTPUT_DIR, workers=1, **options):
+        """
+        Queues a job. Returns its job_id. Duplicate paths are analyzed once; workers is capped at ANALYSIS_MAX_WORKERS.
+        Raises:
+            ValueError: If a path is outside MEDIA_ROOT.
+            FileNotFoundError: If a file doesn't exist.
+        """
+        video_paths = list(dict.fromkeys(resolve_media_path(path) for path in video_paths)) # Same file = same output folder
+        workers = min(workers, ANALYSIS_MAX_WORKERS)
+        missing = [path for path in video_paths if not os.path.isfile(path)]
+        if missing:
+            raise FileNotFoundError(f"Video file(s) not found: {', '.join(missing)}")
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "files": list(video_paths),
+                "files_done": 0,
+                "output_dir": os.path.abspath(os.path.join(output_dir, job_id)),
+                "results": {},
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+        self._executor.submit(self._run, job_id, list(video_paths), os.path.join(output_dir, job_id), workers, options)
+        return job_id
+
+    def _run(self, job_id, video_paths, output_dir, workers, options):
+        self._update(job_id, status="running", started_at=time.time())
+
+        def on_result(path, summary, error):
+            with self._lock:
+                job = self._jobs[job_id]
+                job["files_done"] += 1
+                job["results"][path] = summary if error is None else {"error": error}
+
+        try:
+            results = analyze_files(video_paths, output_dir, workers=workers, on_result=on_result, isolate=True, **options)
+            failed = any("error" in r for r in results.values())
+            self._update(job_id, status="failed" if failed else "completed", finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Analysis job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None # Deep copy
+
+    def list_jobs(self):
+        with self._lock:
+            return [{k: v for k, v in job.items() if k != "results"} for job in self._jobs.values()]
+
+
+# Helper to get the singleton instance
+def get_analysis_job_manager():
+    global _analysis_job_manager_instance
+    if _analysis_job_manager_instance is None:
+        _analysis_job_manager_instance = AnalysisJobManager()
+    return _analysis_job_manager_instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+", help="Video files to analyze")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_DIR, help="Output folder (one subfolder per video)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes; each loads its own copy of the model")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--imgsz", type=int, default=None)
+    parser.add_argument("--frame-step", type=int, default=1, help="Analyze every Nth frame")
+    parser.add_argument("--min-confidence", type=float, default=0.0)
+    parser.add_argument("--zones", help="Zone config JSON file (e.g. config/zones/<stream_id>.json)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = analyze_files(args.videos, args.output, workers=args.workers, model_path=args.model,
+                            backend=args.backend, int8=args.int8, batch_size=args.batch_size, imgsz=args.imgsz,
+                            frame_step=args.frame_step, min_confidence=args.min_confidence,
+                            zones=load_zone_config(path=args.zones) if args.zones else None)
+    for path, summary in results.items():
+        if "error" in summary:
+            print(f"{path}: FAILED ({summary['error']})")
+        else:
+            print(f"{path}: {summary['frames_analyzed']} frames at {summary['analysis_fps']} fps, "
+                  f"{summary['unique_persons']} person(s), events {summary['events']}")
+
+
+if __name__ == "__main__":
+    main()
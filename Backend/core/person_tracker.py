@@ -1,134 +1,314 @@
 # src/core/person_tracker.py
-import math
 import logging
+from collections.abc import Mapping
+import numpy as np
+from core.matching import (bbox_centroids, centroid_distance_matrix, iou_matrix,
+                           linear_assignment, greedy_assignment)
 
 logger = logging.getLogger(__name__)
 
+INITIAL_CAPACITY = 64 # Track slots preallocated per tracker; doubled when a crowd needs more
+
+class TrackSnapshot(Mapping):
+    """
+    Read-only {person_id: {'centroid': (x, y), 'bbox': [x1, y1, x2, y2], 'class', 'confidence'}}
+    view of the tracks after one update()/predict(), backed by compact array copies (in ID order).
+    The per-person dicts are only built when somebody indexes it; per-frame consumers use the
+    arrays (ids, centroids, bboxes, confidences, missed) directly.
+    """
+    __slots__ = ('ids', 'centroids', 'bboxes', 'confidences', 'missed', '_rows')
+
+    def __init__(self, ids, centroids, bboxes, confidences, missed=None):
+        self.ids = ids # (N,) int64
+        self.centroids = centroids # (N, 2) int64
+        self.bboxes = bboxes # (N, 4) int64
+        self.confidences = confidences # (N,) float32
+        self.missed = missed if missed is not None else np.zeros(len(ids), np.int32) # (N,) updates without a detection
+        self._rows = None # {person_id: row}, built on first lookup
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.int64), np.empty((0, 2), np.int64), np.empty((0, 4), np.int64), np.empty(0, np.float32))
+
+    def _row_of(self):
+        if self._rows is None:
+            self._rows = dict(zip(self.ids.tolist(), range(len(self.ids))))
+        return self._rows
+
+    def _record(self, row):
+        return {'centroid': tuple(self.centroids[row].tolist()), 'bbox': self.bboxes[row].tolist(),
+                'class': 'person', 'confidence': round(float(self.confidences[row]), 2)}
+
+    def __getitem__(self, person_id):
+        return self._record(self._row_of()[person_id])
+
+    def __contains__(self, person_id):
+        return person_id in self._row_of()
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def items(self):
+        return [(person_id, self._record(row)) for row, person_id in enumerate(self.ids.tolist())]
+
+    def copy(self):
+        return self # Immutable
+
+
+def track_arrays(tracked_persons):
+    """
+    (ids, centroids, bboxes) arrays of a TrackSnapshot, or of a plain {id: {'centroid', 'bbox'}}
+    dict (e.g. tracks received from a worker process).
+    """
+    if isinstance(tracked_persons, TrackSnapshot):
+        return tracked_persons.ids, tracked_persons.centroids, tracked_persons.bboxes
+    ids = np.fromiter(tracked_persons.keys(), dtype=np.int64, count=len(tracked_persons))
+    centroids = np.array([p['centroid'] for p in tracked_persons.values()], dtype=np.int64).reshape(-1, 2)
+    bboxes = np.array([p['bbox'] for p in tracked_persons.values()], dtype=np.int64).reshape(-1, 4)
+    return ids, centroids, bboxes
+
 class PersonTracker:
-    def __init__(self, max_disappeared=50):
+    """
+    Centroid/IoU tracker with a constant-velocity motion model. Track state lives in preallocated
+    NumPy slot arrays that are updated in place, so memory depends on the largest crowd seen, not
+    on how long the tracker has been running; freed slots are reused by new tracks.
+    """
+
+    def __init__(self, max_disappeared=50, max_distance=None, match_metric='centroid', min_iou=0.1, matcher='hungarian',
+                 velocity_smoothing=0.5, max_prediction_frames=15):
         """
         Initializes the PersonTracker.
         Args:
             max_disappeared (int): The maximum number of consecutive frames a person can be
                                    "disappeared" for before their ID is deregistered.
+            max_distance (float): Gating threshold in pixels for the 'centroid' metric. A track and a
+                                  detection further apart than this are never matched (None = no gate).
+            match_metric (str): 'centroid' (Euclidean centroid distance) or 'iou' (1 - box IoU).
+            min_iou (float): Gating threshold for the 'iou' metric; pairs overlapping less are never matched.
+            matcher (str): 'hungarian' for optimal assignment, 'greedy' for cheapest-pair-first.
+            velocity_smoothing (float): Weight of the newest measurement in the per-track velocity estimate.
+            max_prediction_frames (int): predict() stops extrapolating a track after this many frames
+                                         without a detection.
         """
+        if match_metric not in ('centroid', 'iou'):
+            raise ValueError(f"Unknown match_metric '{match_metric}' (expected 'centroid' or 'iou').")
+        if matcher not in ('hungarian', 'greedy'):
+            raise ValueError(f"Unknown matcher '{matcher}' (expected 'hungarian' or 'greedy').")
         self.next_object_id = 0
-        self.objects = {}  # Stores {object_id: centroid (x, y)}
-        self.disappeared = {}  # Stores {object_id: num_disappeared_frames}
         self.max_disappeared = max_disappeared
-        self.tracked_persons_data = {} # Stores {object_id: {'bbox': [x1,y1,x2,y2], 'class': 'person', 'confidence': 0.9}}
-        logger.info("PersonTracker initialized.")
-
-    def _register(self, centroid, bbox_info):
-        """Registers a new object."""
-        self.objects[self.next_object_id] = centroid
-        self.disappeared[self.next_object_id] = 0
-        self.tracked_persons_data[self.next_object_id] = bbox_info # Store initial bbox info
-        new_id = self.next_object_id
-        self.next_object_id += 1
-        logger.debug(f"Registered new object ID: {new_id}")
-        return new_id
-
-    def _deregister(self, object_id):
-        """Deregisters a disappeared object."""
-        logger.debug(f"Deregistering object ID: {object_id}")
-        del self.objects[object_id]
-        del self.disappeared[object_id]
-        del self.tracked_persons_data[object_id]
+        self.max_distance = max_distance
+        self.match_metric = match_metric
+        self.min_iou = min_iou
+        self.matcher = matcher
+
+        # Constant-velocity motion model used by predict() on frames where the detector is skipped
+        self.velocity_smoothing = velocity_smoothing
+        self.max_prediction_frames = max_prediction_frames
+        self._frame_index = 0 # Advanced by both update() and predict()
+
+        self._allocate(INITIAL_CAPACITY)
+        self.detection_ids = np.empty(0, dtype=np.int64) # Track ID given to each detection of the last update()
+        logger.info(f"PersonTracker initialized (metric={match_metric}, matcher={matcher}).")
+
+    def _allocate(self, capacity):
+        """(Re)allocates the slot arrays, keeping existing tracks in their slots."""
+        old = getattr(self, '_active', None)
+        count = 0 if old is None else len(old)
+
+        def grow(name, shape, dtype, fill=0):
+            array = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old is not None:
+                array[:count] = getattr(self, name)
+            setattr(self, name, array)
+
+        grow('_active', (), bool, False)
+        grow('_ids', (), np.int64, -1)
+        grow('_centroids', (2,), np.int64) # Current (measured or predicted) centroid
+        grow('_bboxes', (4,), np.int64) # Current box
+        grow('_confidences', (), np.float32)
+        grow('_disappeared', (), np.int32) # Consecutive updates without a matching detection
+        grow('_velocities', (2,), np.float64) # Pixels per frame
+        grow('_last_frame', (), np.int64) # Frame index of the last real detection ...
+        grow('_last_centroids', (2,), np.int64) # ... and its centroid/box, the base for predict()
+        grow('_last_bboxes', (4,), np.int64)
+
+    def _active_slots(self):
+        """Slots of the live tracks, in ID (= registration) order."""
+        slots = np.flatnonzero(self._active)
+        return slots[np.argsort(self._ids[slots], kind='stable')]
+
+    def _register(self, centroids, bboxes, confidences):
+        """Registers new objects; returns their IDs."""
+        count = len(centroids)
+        free = np.flatnonzero(~self._active)
+        if len(free) < count:
+            self._allocate(max(2 * len(self._active), len(self._active) + count))
+            free = np.flatnonzero(~self._active)
+        slots = free[:count]
+        new_ids = np.arange(self.next_object_id, self.next_object_id + count, dtype=np.int64)
+        self.next_object_id += count
+        self._active[slots] = True
+        self._ids[slots] = new_ids
+        self._centroids[slots] = centroids
+        self._bboxes[slots] = bboxes
+        self._confidences[slots] = confidences
+        self._disappeared[slots] = 0
+        self._velocities[slots] = 0.0
+        self._last_frame[slots] = self._frame_index
+        self._last_centroids[slots] = centroids
+        self._last_bboxes[slots] = bboxes
+        logger.debug(f"Registered new object IDs: {new_ids.tolist()}")
+        return new_ids
+
+    def _mark_disappeared(self, slots):
+        """Ages unmatched tracks and frees the slots of those gone for more than max_disappeared updates."""
+        self._disappeared[slots] += 1
+        expired = slots[self._disappeared[slots] > self.max_disappeared]
+        if len(expired):
+            logger.debug(f"Deregistering object IDs: {self._ids[expired].tolist()}")
+            self._active[expired] = False
+            self._ids[expired] = -1
+
+    def deregister(self, object_ids):
+        """Ends the given tracks right away (e.g. re-identified under another ID); unknown IDs are ignored."""
+        slots = np.flatnonzero(self._active & np.isin(self._ids, object_ids))
+        if len(slots):
+            logger.debug(f"Deregistering object IDs: {self._ids[slots].tolist()}")
+            self._active[slots] = False
+            self._ids[slots] = -1
+
+    def _cost_matrix(self, slots, input_centroids, input_bboxes):
+        """
+        Builds the (tracks x detections) cost matrix and the gate above which a pair may not match.
+        Returns:
+            tuple: (cost matrix, gate) where gate may be np.inf.
+        """
+        if self.match_metric == 'iou':
+            return 1.0 - iou_matrix(self._bboxes[slots].astype(np.float64), input_bboxes), 1.0 - self.min_iou
+        gate = np.inf if self.max_distance is None else float(self.max_distance)
+        return centroid_distance_matrix(self._centroids[slots].astype(np.float64), input_centroids), gate
 
     def update(self, detected_persons_info):
         """
         Updates the tracker with new detections.
         Args:
-            detected_persons_info (list): List of detected person objects from ObjectDetector.
-                                          Each item: {'class': 'person', 'confidence': ..., 'bbox': [x1, y1, x2, y2]}
+            detected_persons_info (np.ndarray | list): Person detections, either ObjectDetector's
+                                          DETECTION_DTYPE array or a list of dicts
+                                          {'class': 'person', 'confidence': ..., 'bbox': [x1, y1, x2, y2]}
         Returns:
-            dict: Current state of tracked persons {object_id: {'centroid': (x,y), 'bbox': [x1,y1,x2,y2], 'class': 'person', 'confidence': 0.9}}
+            TrackSnapshot: Current state of tracked persons {object_id: {'centroid': (x,y), 'bbox': [x1,y1,x2,y2], 'class': 'person', 'confidence': 0.9}}
         """
+        self._frame_index += 1
+        slots = self._active_slots()
         if len(detected_persons_info) == 0:
             # No objects detected, mark all existing objects as disappeared
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self._deregister(object_id)
-            return {id: {**self.tracked_persons_data[id], 'centroid': self.objects[id]} for id in self.objects}
-
-        # Compute centroids for current detections
-        input_centroids = []
-        for p_info in detected_persons_info:
-            x1, y1, x2, y2 = p_info['bbox']
-            cX = int((x1 + x2) / 2.0)
-            cY = int((y1 + y2) / 2.0)
-            input_centroids.append((cX, cY))
+            self._mark_disappeared(slots)
+            self.detection_ids = np.empty(0, dtype=np.int64)
+            return self._snapshot()
+
+        # Compute centroids for current detections (vectorized)
+        if isinstance(detected_persons_info, np.ndarray):
+            input_bboxes = detected_persons_info['bbox'].astype(np.float64)
+            input_confidences = detected_persons_info['confidence']
+        else:
+            input_bboxes = np.array([p_info['bbox'] for p_info in detected_persons_info], dtype=np.float64)
+            input_confidences = np.array([p_info.get('confidence', 0.0) for p_info in detected_persons_info], dtype=np.float32)
+        input_centroids = bbox_centroids(input_bboxes).astype(np.int64)
+        num_detections = len(input_centroids)
+        self.detection_ids = np.full(num_detections, -1, dtype=np.int64)
 
         # If no objects currently being tracked, register all new detections
-        if len(self.objects) == 0:
-            for i, centroid in enumerate(input_centroids):
-                self._register(centroid, detected_persons_info[i])
+        if len(slots) == 0:
+            self.detection_ids[:] = self._register(input_centroids, input_bboxes, input_confidences)
+            return self._snapshot()
+
+        # Match new detections to existing objects with one vectorized cost matrix
+        cost, gate = self._cost_matrix(slots, input_centroids, input_bboxes)
+
+        assign = linear_assignment if self.matcher == 'hungarian' else greedy_assignment
+        num_tracks = len(slots)
+        if np.isfinite(gate):
+            # Pairs beyond the gate must never be matched. Give each track a private "stay unmatched"
+            # column costing exactly the gate, so the solver never has to force a far-apart pair
+            # (and shuffle its neighbours' IDs) just to produce a full assignment.
+            prohibitive = max(float(cost.max(initial=0.0)), gate) * 10.0 + 1e6
+            augmented = np.full((num_tracks, num_detections + num_tracks), prohibitive)
+            augmented[:, :num_detections] = np.where(cost > gate, prohibitive, cost)
+            augmented[np.arange(num_tracks), num_detections + np.arange(num_tracks)] = gate
+            rows, cols = assign(augmented)
+            valid = cols < num_detections
+            rows, cols = rows[valid], cols[valid]
         else:
-            # Match new detections to existing objects
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-
-            # Calculate Euclidean distances between existing object centroids and new detection centroids
-            # This is a simple approach, more robust methods use Hungarian algorithm or IOU for matching
-            D = []
-            for i in range(len(object_centroids)):
-                row = []
-                for j in range(len(input_centroids)):
-                    dist = math.dist(object_centroids[i], input_centroids[j])
-                    row.append(dist)
-                D.append(row)
-
-            # Simple greedy matching (could be improved with Hungarian algorithm for optimal matching)
-            # Find the smallest distance matches
-            used_rows = set() # Existing object IDs used
-            used_cols = set() # New detection IDs used
-
-            for _ in range(min(len(D), len(D[0]) if D else 0)): # Iterate up to the number of possible matches
-                min_dist = float('inf')
-                min_row, min_col = -1, -1
-                for r in range(len(D)):
-                    if r in used_rows:
-                        continue
-                    for c in range(len(D[r])):
-                        if c in used_cols:
-                            continue
-                        if D[r][c] < min_dist:
-                            min_dist = D[r][c]
-                            min_row, min_col = r, c
-                
-                if min_row != -1: # If a match was found
-                    object_id = object_ids[min_row]
-                    self.objects[object_id] = input_centroids[min_col]
-                    self.disappeared[object_id] = 0 # Reset disappeared count
-                    self.tracked_persons_data[object_id] = detected_persons_info[min_col] # Update bbox info
-                    used_rows.add(min_row)
-                    used_cols.add(min_col)
-                else:
-                    break # No more good matches
-
-            # Mark disappeared existing objects
-            for r in range(len(D)):
-                if r not in used_rows:
-                    object_id = object_ids[r]
-                    self.disappeared[object_id] += 1
-                    if self.disappeared[object_id] > self.max_disappeared:
-                        self._deregister(object_id)
-
-            # Register any new detections that weren't matched
-            for c in range(len(input_centroids)):
-                if c not in used_cols:
-                    self._register(input_centroids[c], detected_persons_info[c])
-        
-        # Prepare the output with all tracked persons' updated data
-        current_tracked_persons = {}
-        for object_id, centroid in self.objects.items():
-            current_tracked_persons[object_id] = {
-                'centroid': centroid,
-                'bbox': self.tracked_persons_data[object_id]['bbox'],
-                'class': self.tracked_persons_data[object_id]['class'],
-                'confidence': self.tracked_persons_data[object_id]['confidence']
-            }
-        
-        return current_tracked_persons
\ No newline at end of file
+            rows, cols = assign(cost)
+
+        # Matched tracks: blend the displacement since their last real detection into the velocity, then
+        # overwrite their slots in place
+        matched = slots[rows]
+        elapsed = np.maximum(1, self._frame_index - self._last_frame[matched])[:, None]
+        measured = (input_centroids[cols] - self._last_centroids[matched]) / elapsed
+        alpha = self.velocity_smoothing
+        self._velocities[matched] = alpha * measured + (1 - alpha) * self._velocities[matched]
+        self._centroids[matched] = self._last_centroids[matched] = input_centroids[cols]
+        self._bboxes[matched] = self._last_bboxes[matched] = input_bboxes[cols]
+        self._confidences[matched] = input_confidences[cols]
+        self._last_frame[matched] = self._frame_index
+        self._disappeared[matched] = 0 # Reset disappeared count
+        self.detection_ids[cols] = self._ids[matched]
+
+        # Mark disappeared existing objects
+        matched_rows = np.zeros(num_tracks, dtype=bool)
+        matched_rows[rows] = True
+        self._mark_disappeared(slots[~matched_rows])
+
+        # Register any new detections that weren't matched
+        unmatched = np.flatnonzero(self.detection_ids < 0)
+        if len(unmatched):
+            self.detection_ids[unmatched] = self._register(input_centroids[unmatched], input_bboxes[unmatched],
+                                                           input_confidences[unmatched])
+        return self._snapshot()
+
+    def predict(self):
+        """
+        Advances every currently visible track one frame along its estimated velocity, without
+        a detection. Used on frames where the detector is skipped. Tracks are not marked as
+        disappeared, so IDs stay stable until the next real update().
+        Returns:
+            TrackSnapshot: Same format as update(), with predicted centroids and bboxes.
+        """
+        self._frame_index += 1
+        slots = self._active_slots()
+        visible = slots[self._disappeared[slots] == 0] # Lost tracks stay where they were last seen
+        steps = np.minimum(self._frame_index - self._last_frame[visible], self.max_prediction_frames)[:, None]
+        offsets = np.round(self._velocities[visible] * steps).astype(np.int64)
+        self._centroids[visible] = self._last_centroids[visible] + offsets
+        self._bboxes[visible] = self._last_bboxes[visible] + np.tile(offsets, 2)
+        return self._snapshot()
+
+    def _snapshot(self):
+        """Prepare the output with all tracked persons' updated data (fancy indexing copies the slots)."""
+        slots = self._active_slots()
+        return TrackSnapshot(self._ids[slots], self._centroids[slots], self._bboxes[slots], self._confidences[slots],
+                             self._disappeared[slots])
+
+    # Dict views for debugging/tests; built on demand, never on the per-frame path
+    @property
+    def objects(self):
+        slots = self._active_slots()
+        return {object_id: tuple(c) for object_id, c in zip(self._ids[slots].tolist(), self._centroids[slots].tolist())}
+
+    @property
+    def disappeared(self):
+        slots = self._active_slots()
+        return dict(zip(self._ids[slots].tolist(), self._disappeared[slots].tolist()))
+
+    @property
+    def velocities(self):
+        slots = self._active_slots()
+        return {object_id: tuple(v) for object_id, v in zip(self._ids[slots].tolist(), self._velocities[slots].tolist())}
+
+    @property
+    def tracked_persons_data(self):
+        return dict(self._snapshot())
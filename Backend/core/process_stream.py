@@ -0,0 +1,391 @@
+# src/core/process_stream.py
+import os
+import json
+import queue
+import random
+import threading
+import time
+import logging
+import multiprocessing
+from core.shared_ring import SharedRing
+from core.video_stream import VideoStream
+from core.reid import ReIdentifier
+from core.event_recorder import EventRecorder
+from core.frame_broadcaster import FrameBroadcaster
+from core.track_event_hub import TrackEventHub
+from core.thread_priority import lower_thread_priority, lower_process_priority
+
+logger = logging.getLogger(__name__)
+
+# Shared memory sizing per stream: annotated JPEGs (latest wins) and per-frame JSON results (read in order)
+WORKER_FRAME_SLOTS = 4
+WORKER_FRAME_SLOT_MB = float(os.getenv("CLASSYCAM_WORKER_FRAME_SLOT_MB", "4"))
+WORKER_RESULT_SLOTS = 256
+WORKER_RESULT_SLOT_BYTES = 256 * 1024
+# Supervision
+WORKER_START_TIMEOUT = float(os.getenv("CLASSYCAM_WORKER_START_TIMEOUT", "120")) # Includes loading the model
+WORKER_STALL_TIMEOUT = float(os.getenv("CLASSYCAM_WORKER_STALL_TIMEOUT", "20")) # No frame for this long -> restart
+WORKER_MAX_BACKOFF = 30.0
+POLL_INTERVAL = 0.005 # How often the parent checks the rings for new frames/results
+STATUS_INTERVAL = 1.0 # How often a worker sends its status/profile
+
+
+def _stream_worker_main(stream_id, stream_source, settings, reid_state, model_options, frame_ring_name, result_ring_name,
+                        control_queue, ready_event, heartbeat):
+    """
+    Worker process entry point: runs one complete VideoStream pipeline (capture, detection,
+    tracking, zones, drawing, JPEG encoding) with its own model and GIL, and forwards the JPEG
+    and a JSON result for every processed frame through shared memory. reid_state (ReIdentifier
+    export_state() or None) is the gallery to start from; the worker's own goes back with the
+    status messages and once more after it stopped.
+    """
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - %(levelname)s - [worker {stream_id}] %(message)s')
+    from core.object_detector import get_object_detector # Imported here: the model is loaded per worker
+    frame_ring = SharedRing(frame_ring_name)
+    result_ring = SharedRing(result_ring_name)
+    detector = get_object_detector(**model_options)
+    reidentifier = ReIdentifier(stream_id)
+    if reid_state:
+        reidentifier.load_state(reid_state) # People seen before a restart (or in the last session) keep their IDs
+    stream = VideoStream(stream_id, detector, reidentifier=reidentifier) # No scheduler: this process only serves one stream
+    stream.update_settings(**settings)
+
+    last_status = [0.0]
+
+    def forward(jpeg, tracked_persons, events, detections):
+        now = time.time()
+        heartbeat.value = now
+        if jpeg is not None:
+            frame_ring.write(jpeg, now)
+        in_room_ids = stream._zone_monitor.in_room_ids()
+        message = {
+            "tracks": {str(person_id): {"centroid": centroid, "bbox": bbox, "confidence": round(confidence, 2)}
+                       for person_id, centroid, bbox, confidence in zip(
+                           tracked_persons.ids.tolist(), tracked_persons.centroids.tolist(),
+                           tracked_persons.bboxes.tolist(), tracked_persons.confidences.tolist())},
+            "events": events,
+            "detections": detector.to_dicts(detections),
+            "in_room": list(in_room_ids),
+            "relinked": stream._relinked_ids,
+            "time": now,
+        }
+        if now - last_status[0] >= STATUS_INTERVAL:
+            last_status[0] = now
+            message["status"] = stream.get_status()
+            message["stages"] = stream.get_profile()["stages"]
+            if stream._reid_active: # The parent keeps the latest one for the next worker
+                message["reid_state"] = reidentifier.export_state(now, in_room_ids)
+        result_ring.write(json.dumps(message, separators=(',', ':')).encode(), now)
+
+    stream.add_frame_listener(forward)
+    if not stream.start(stream_source):
+        os._exit(2) # Parent sees the exit code and reports the failure
+
+    heartbeat.value = time.time()
+    ready_event.set()
+    exit_code = 0
+    try:
+        while True:
+            try:
+                command, payload = control_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not stream.is_running():
+                    exit_code = 3 # Source ended or disconnected; the supervisor decides whether to restart
+                    break
+                continue
+            if command == "stop":
+                break
+            if command == "settings":
+                stream.update_settings(**payload)
+            elif command == "zones":
+                stream.set_zones(payload)
+    finally:
+        stream.stop()
+        if stream._reid_active: # stop() moved the last tracks to the gallery
+            now = time.time()
+            result_ring.write(json.dumps({"reid_state": reidentifier.export_state(now)}, separators=(',', ':')).encode(), now)
+        frame_ring.close()
+        result_ring.close()
+    os._exit(exit_code)
+
+
+class ProcessVideoStream(VideoStream):
+    """
+    VideoStream whose pipeline runs in a supervised worker process (see _stream_worker_main).
+
+    The FastAPI process only keeps the cheap parts: a reader thread copies JPEGs out of the shared
+    frame ring into the usual FrameBroadcaster (so /video_feed is unchanged) and applies the JSON
+    results to the TrackEventHub, EventStore and EventRecorder. If the worker crashes or stops
+    producing frames it is restarted with exponential backoff; when a video file ends the session
+    ends, as it does for a threaded VideoStream.
+    """
+
+    def __init__(self, stream_id, model_options, event_store=None, recording_writer=None, occupancy=None,
+                 reidentifier=None):
+        super().__init__(stream_id, object_detector=None, event_store=event_store, occupancy=occupancy,
+                         reidentifier=reidentifier) # Only holds the workers' ReID gallery between them
+        self._model_options = model_options
+        self._event_recorder = EventRecorder(stream_id, recording_writer) if recording_writer is not None else None
+        self._context = multiprocessing.get_context("spawn") # Don't fork the parent's threads/model state
+        self._process = None
+        self._control_queue = None
+        self._ready_event = None
+        self._heartbeat = None
+        self._frame_ring = None
+        self._result_ring = None
+        self._reader_thread = None
+        self._result_seq = 0 # Last result message applied
+        self._stop_event = None # Set by stop() (or the end of the source); wakes the supervisor's waits
+        self._session = 0 # Bumped by every start(); a supervisor only restarts workers of its own session
+        self._detections = []
+        self._worker_status = {}
+        self._worker_stages = {}
+        self.restarts = 0
+        self.results_lost = 0
+
+    def _settings(self):
+        return {"target_fps": self.target_fps, "adaptive_inference": self.adaptive_inference,
+                "inference_imgsz": self.inference_imgsz, "roi_crop": self.roi_crop,
+                "capture_backend": self.capture_backend, "decode_threads": self.decode_threads,
+                "decode_skip": self.decode_skip, "decode_width": self.decode_width or 0,
+                "substream_url": self.substream_url or "", "idle_keyframes": self.idle_keyframes, "reid": self.reid}
+
+    def _spawn_worker(self, stop_event):
+        """Starts a worker process and waits until it is streaming (or stop_event is set). Returns True on success."""
+        self._control_queue = self._context.Queue()
+        self._ready_event = self._context.Event()
+        self._heartbeat = self._context.Value('d', 0.0, lock=False)
+        self._control_queue.put(("zones", self.get_zones())) # Runtime zone changes survive restarts
+        reid_state = self._reidentifier.export_state(time.time()) if self.reid else None
+        self._process = self._context.Process(
+            target=_stream_worker_main, name=f"worker-{self.stream_id}", daemon=True,
+            args=(self.stream_id, self.stream_source, self._settings(), reid_state, self._model_options,
+                  self._frame_ring.name, self._result_ring.name, self._control_queue, self._ready_event, self._heartbeat),
+        )
+        self._process.start()
+        lower_process_priority(self._process.pid) # The whole pipeline runs there; the API's event loop goes first
+        deadline = time.time() + WORKER_START_TIMEOUT
+        while time.time() < deadline and not stop_event.is_set():
+            if self._ready_event.wait(timeout=0.2):
+                logger.info(f"[{self.stream_id}] Worker process {self._process.pid} is streaming.")
+                return True
+            if not self._process.is_alive():
+                break
+        if stop_event.is_set():
+            logger.info(f"[{self.stream_id}] Stream stopped while its worker was starting.")
+            self._kill_worker()
+            return False
+        logger.error(f"[{self.stream_id}] Worker process failed to start (exit code {self._process.exitcode}).")
+        self._kill_worker()
+        return False
+
+    def _kill_worker(self, graceful=False):
+        process = self._process
+        if process is None:
+            return
+        if graceful and process.is_alive():
+            self._control_queue.put(("stop", None))
+            process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        self._process = None
+
+    def start(self, stream_source):
+        with self._lifecycle_lock:
+            if self._running:
+                logger.warning(f"Stream '{self.stream_id}' is already running. Please stop it first.")
+                return False
+            if not isinstance(stream_source, str):
+                logger.error(f"[{self.stream_id}] Worker processes need a URL/path/index source, not {stream_source!r}.")
+                return False
+            self.stream_source = stream_source
+            self._frame_ring = SharedRing(slots=WORKER_FRAME_SLOTS, slot_bytes=int(WORKER_FRAME_SLOT_MB * 1024 * 1024),
+                                          create=True)
+            self._result_ring = SharedRing(slots=WORKER_RESULT_SLOTS, slot_bytes=WORKER_RESULT_SLOT_BYTES, create=True)
+            self._session += 1
+            self._result_seq = 0
+            self._stop_event = threading.Event()
+            if not self._spawn_worker(self._stop_event):
+                self._release_resources()
+                return False
+            self._broadcaster = FrameBroadcaster(name=self.stream_id) # Fresh fan-out for this session
+            self._track_hub = TrackEventHub(self.stream_id)
+            self._running = True
+            self._reader_thread = threading.Thread(target=self._supervise, args=(self._session, self._stop_event),
+                                                   name=f"worker-reader-{self.stream_id}", daemon=True)
+            self._reader_thread.start()
+            return True
+
+    def stop(self):
+        with self._lifecycle_lock:
+            if not self._running:
+                logger.info(f"[{self.stream_id}] No active stream to stop.")
+                return False
+            self._stop_event.set() # Wakes a supervisor in its backoff or waiting for a worker to start
+            self._reader_thread.join() # Nothing may still spawn a worker or touch the rings below
+            self._end_session()
+            return True
+
+    def _end_session(self):
+        """Stops the worker and releases the session's resources. Caller holds the lifecycle lock."""
+        self._running = False
+        self._broadcaster.close()
+        self._track_hub.close()
+        self._kill_worker(graceful=True)
+        self._collect_reid_state()
+        if self._event_recorder is not None:
+            self._event_recorder.flush()
+        self._release_resources()
+        logger.info(f"[{self.stream_id}] Worker stopped and shared memory released.")
+
+    def _collect_reid_state(self):
+        """Applies the ReID gallery a worker sent after it stopped (the reader thread is gone by then)."""
+        messages, _ = self._result_ring.read_since(self._result_seq)
+        for seq, _, payload in messages:
+            self._result_seq = seq
+            message = json.loads(payload)
+            if "reid_state" in message:
+                self._reidentifier.load_state(message["reid_state"])
+
+    def _release_resources(self):
+        for ring in (self._frame_ring, self._result_ring):
+            if ring is not None:
+                ring.close()
+                ring.unlink()
+        self._frame_ring = self._result_ring = None
+        self._running = False
+        self._tracked_persons_data = {}
+        self._detections = []
+        self._occupancy.reset_tracks()
+
+    def _supervise(self, session, stop_event):
+        """Thread target: drains the rings and restarts the worker when it crashes or stalls."""
+        lower_thread_priority()
+        last_frame_seq = 0
+        backoff = 1.0
+        live = not os.path.isfile(self.stream_source) # Files end; cameras get reconnected
+        while not stop_event.is_set():
+            process = self._process # Exited before this pass's drain if it is not alive below
+            exited = process is None or not process.is_alive()
+            latest = self._frame_ring.read_latest(after_seq=last_frame_seq)
+            if latest is not None:
+                last_frame_seq, _, jpeg = latest
+                self._broadcaster.publish_jpeg(jpeg)
+                if self._event_recorder is not None:
+                    self._event_recorder.add_frame(jpeg)
+                self._processed_frames += 1
+                backoff = 1.0
+
+            messages, lost = self._result_ring.read_since(self._result_seq)
+            self.results_lost += lost
+            for seq, _, payload in messages:
+                self._result_seq = seq
+                self._apply_result(json.loads(payload))
+
+            if exited and process is not None and process.exitcode == 3 and not live:
+                logger.info(f"[{self.stream_id}] Source ended; ending the session.")
+                self._end_session_from_supervisor(stop_event)
+                return
+            stalled = (self._heartbeat.value and time.time() - self._heartbeat.value > WORKER_STALL_TIMEOUT)
+            if exited or stalled:
+                reason = "stalled" if stalled else f"exited with code {process.exitcode if process else None}"
+                logger.warning(f"[{self.stream_id}] Worker {reason}; restarting in {backoff:.1f}s.")
+                self._kill_worker()
+                if stop_event.wait(backoff * random.uniform(0.8, 1.2)):
+                    break
+                backoff = min(backoff * 2, WORKER_MAX_BACKOFF)
+                if session != self._session: # Belongs to a stopped session (belt and braces: its stop_event is set)
+                    break
+                self.restarts += 1
+                self._occupancy.reset_tracks() # The new worker's tracker numbers its IDs from scratch
+                if self._spawn_worker(stop_event):
+                    backoff = 1.0
+                continue
+
+            if latest is None and not messages:
+                time.sleep(POLL_INTERVAL)
+
+    def _end_session_from_supervisor(self, stop_event):
+        """Ends the session after its source finished, unless stop() (which holds the lock while joining us) is already doing it."""
+        while not stop_event.is_set():
+            if self._lifecycle_lock.acquire(timeout=0.1):
+                try:
+                    if not stop_event.is_set():
+                        stop_event.set()
+                        self._end_session()
+                finally:
+                    self._lifecycle_lock.release()
+                return
+
+    def _apply_result(self, message):
+        if "reid_state" in message:
+            self._reidentifier.load_state(message["reid_state"])
+        if "tracks" not in message:
+            return # A stopped worker's last message: only its ReID gallery
+        tracked = {int(person_id): p for person_id, p in message["tracks"].items()}
+        events = message["events"]
+        with self._frame_lock:
+            self._tracked_persons_data = tracked
+            self._detections = message["detections"]
+        if events:
+            for event in events:
+                logger.info(f"[{self.stream_id}] Event detected: {event}")
+            if self._event_recorder is not None:
+                self._event_recorder.trigger(events)
+            if self._event_store is not None:
+                self._event_store.record(self.stream_id, events)
+        self._track_hub.publish(tracked, events)
+        for person_id in message.get("relinked", ()):
+            self._occupancy.resume(person_id)
+        self._occupancy.update(message["time"], tracked, set(message["in_room"]))
+        if "status" in message:
+            self._worker_status = message["status"]
+            self._worker_stages = message["stages"]
+
+    def update_settings(self, **settings):
+        super().update_settings(**settings) # Validates and keeps the parent's copy for restarts
+        if self._process is not None and self._process.is_alive():
+            self._control_queue.put(("settings", self._settings()))
+
+    def set_zones(self, config):
+        config = super().set_zones(config) # Validates; the parent's copy feeds get_zones() and restarts
+        if self._process is not None and self._process.is_alive():
+            self._control_queue.put(("zones", config))
+        return config
+
+    def is_running(self):
+        return bool(self._running and self._process is not None and self._process.is_alive())
+
+    def get_detected_objects(self):
+        with self._frame_lock:
+            return list(self._detections)
+
+    def get_status(self):
+        status = dict(self._worker_status) # Worker's own counters (capture fps, drops, motion gate, ...)
+        status.update({
+            "stream_id": self.stream_id,
+            "source": self.stream_source,
+            "running": self.is_running(),
+            "mode": "process",
+            "worker_pid": self._process.pid if self._process is not None else None,
+            "worker_restarts": self.restarts,
+            "results_lost": self.results_lost,
+            "frames_encoded": self._broadcaster.frames_encoded,
+            "viewers": self._broadcaster.subscriber_count,
+            "event_subscribers": self._track_hub.subscriber_count,
+        })
+        status.setdefault("processing_fps", 0.0)
+        status.setdefault("processed_frames", self._processed_frames)
+        for key, value in self._settings().items():
+            status[key] = value
+        status.update(decode_width=self.decode_width, substream_url=self.substream_url) # Not the worker's 0/"" = cleared
+        return status
+
+    def get_profile(self):
+        profile = super().get_profile()
+        profile["stages"] = {**self._worker_stages, **profile["stages"]} # Worker pipeline + local client_send
+        return profile
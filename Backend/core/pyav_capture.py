@@ -0,0 +1,142 @@
+# src/core/pyav_capture.py
+import collections
+import logging
+import cv2
+
+try:
+    import av
+except ImportError: # PyAV is optional; only needed for capture_backend='pyav'
+    av = None
+
+logger = logging.getLogger(__name__)
+
+
+def pyav_available():
+    return av is not None
+
+
+class PyAVCapture:
+    """
+    Minimal cv2.VideoCapture look-alike (read/grab/retrieve/isOpened/get/release) on top of PyAV,
+    for sources where decoding costs more than it has to:
+      - decoder threads are configurable per stream;
+      - grab() decodes without converting to BGR, retrieve() converts (and downscales) only the
+        frames that are actually used;
+      - keyframes_only skips every non-key packet before it reaches the decoder, so an idle camera
+        costs one decode per GOP instead of one per frame.
+    """
+
+    def __init__(self, source, threads=0, width=None, open_timeout=5.0, read_timeout=10.0):
+        """
+        Args:
+            source (str): RTSP/HTTP URL or file path.
+            threads (int): Decoder threads; 0 lets FFmpeg decide.
+            width (int): Convert frames to this width (aspect kept); None = native size.
+        Raises:
+            RuntimeError: If PyAV is not installed.
+            av.error.FFmpegError: If the source cannot be opened.
+        """
+        if av is None:
+            raise RuntimeError("capture_backend 'pyav' needs PyAV (pip install av)")
+        options = {"rtsp_transport": "tcp"} if source.startswith("rtsp") else {}
+        self._container = av.open(source, options=options, timeout=(open_timeout, read_timeout))
+        self._stream = self._container.streams.video[0]
+        codec_context = self._stream.codec_context
+        codec_context.thread_type = "AUTO" # Frame + slice threading
+        if threads:
+            codec_context.thread_count = threads
+        self._packets = self._container.demux(self._stream)
+        self._decoded = collections.deque() # A packet can yield several frames (threaded decoding flushes)
+        self._pending = None # Last grabbed av.VideoFrame, converted on retrieve()
+        self._opened = True
+        self._eof = False
+        self._keyframes_only = False
+        self._resync = False # Decoder missed references; wait for the next keyframe
+        self.packets_skipped = 0
+
+        self._size = None
+        if width and width < codec_context.width:
+            height = int(round(codec_context.height * width / codec_context.width / 2)) * 2 # Even, for the scaler
+            self._size = (int(width), height)
+
+    @property
+    def keyframes_only(self):
+        return self._keyframes_only
+
+    @keyframes_only.setter
+    def keyframes_only(self, value):
+        if self._keyframes_only and not value:
+            self._resync = True # Frames after the skipped ones would decode with artifacts
+        self._keyframes_only = bool(value)
+
+    def isOpened(self):
+        return self._opened
+
+    def _next_frame(self):
+        while not self._decoded:
+            try:
+                packet = next(self._packets)
+            except StopIteration: # End of file: drain the frames still inside the threaded decoder
+                if self._eof:
+                    return None
+                self._eof = True
+                self._decoded.extend(self._stream.codec_context.decode(None))
+                continue
+            except av.error.FFmpegError as e:
+                logger.warning(f"PyAV read failed: {e}")
+                return None
+            if packet.size == 0: # Demuxer flush packet
+                continue
+            if (self._keyframes_only or self._resync) and not packet.is_keyframe:
+                self.packets_skipped += 1
+                continue
+            self._resync = False
+            codec_context = self._stream.codec_context
+            try:
+                self._decoded.extend(packet.decode())
+                if self._keyframes_only:
+                    # Drain right away: with B-frame reordering the keyframe would otherwise only come out
+                    # when the next one goes in, a whole GOP late. Draining ends the decoder's stream, so reset it.
+                    self._decoded.extend(codec_context.decode(None))
+                    codec_context.flush_buffers()
+            except av.error.FFmpegError as e: # Corrupt packet: drop it, keep reading
+                logger.debug(f"PyAV decode error: {e}")
+        return self._decoded.popleft()
+
+    def grab(self):
+        if not self._opened:
+            return False
+        self._pending = self._next_frame()
+        return self._pending is not None
+
+    def retrieve(self):
+        if self._pending is None:
+            return False, None
+        frame, self._pending = self._pending, None
+        if self._size is not None:
+            return True, frame.to_ndarray(format="bgr24", width=self._size[0], height=self._size[1])
+        return True, frame.to_ndarray(format="bgr24")
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._stream.average_rate or 0.0)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._size[0] if self._size else self._stream.codec_context.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._size[1] if self._size else self._stream.codec_context.height)
+        return 0.0
+
+    def set(self, prop, value):
+        return False # Options are fixed at open time
+
+    def release(self):
+        if self._opened:
+            self._opened = False
+            self._decoded.clear()
+            self._pending = None
+            self._container.close()
@@ -0,0 +1,339 @@
+# src/core/reid.py
+import os
+import time
+import logging
+import cv2
+import numpy as np
+from core.matching import iou_matrix, greedy_assignment
+from core.person_tracker import TrackSnapshot
+
+logger = logging.getLogger(__name__)
+
+# A lost track can be re-linked for this many seconds (occlusion, detector misses, camera restart)
+REID_WINDOW = float(os.getenv("CLASSYCAM_REID_WINDOW", "30"))
+# Minimum appearance similarity (cosine, 0..1) to re-link, and how clearly the best candidate must beat the next one
+REID_THRESHOLD = float(os.getenv("CLASSYCAM_REID_THRESHOLD", "0.85"))
+REID_MARGIN = float(os.getenv("CLASSYCAM_REID_MARGIN", "0.05"))
+# Time per frame spent computing embeddings; whatever doesn't fit waits for the next frame
+REID_BUDGET_MS = float(os.getenv("CLASSYCAM_REID_BUDGET_MS", "4"))
+REID_GALLERY_SIZE = 256 # Lost tracks kept for re-linking; the one lost longest ago is overwritten
+REID_STATE_MAX_ENTRIES = 128 # Most recently lost entries in an export_state() snapshot (< 1 KB of JSON each)
+REID_REFRESH_INTERVAL = 2.0 # Seconds between embedding updates of a visible track (spare budget only)
+REID_MIN_MISSED = 5 # Tracker updates a still-listed track must have missed before a new track may take over its ID
+REID_MAX_PENDING = 5 # Measured frames a new track may wait for its embedding before it just gets a new ID
+REID_EMBEDDING_SMOOTHING = 0.3 # Weight of a new embedding in a track's cached one
+REID_MAX_OVERLAP = 0.2 # IoU with another track above which a crop is not embedded (it shows two people)
+
+# Appearance embedding: crops resized to EMBED_CROP, HSV histograms of the torso and leg rows
+EMBED_CROP = (32, 64) # (width, height)
+EMBED_PARTS = ((8, 34), (34, 60)) # Row ranges in the resized crop; head and feet are mostly hair/background
+EMBED_BINS = (8, 3, 3) # Hue x saturation x value
+EMBED_MIN_SIZE = (8, 16) # Smaller boxes are not embedded
+EMBEDDING_DIM = len(EMBED_PARTS) * int(np.prod(EMBED_BINS))
+
+def appearance_embedding(frame, bbox):
+    """
+    Colour-histogram embedding of one person box: per body part an HSV histogram, square-rooted
+    (Hellinger) and L2-normalized, so the dot product of two embeddings is the mean Bhattacharyya
+    coefficient of the parts (1.0 = same colour distribution).
+    Args:
+        frame (np.ndarray): BGR frame.
+        bbox: [x1, y1, x2, y2] in frame pixels.
+    Returns:
+        np.ndarray: (EMBEDDING_DIM,) float32, or None if the box is too small.
+    """
+    frame_height, frame_width = frame.shape[:2]
+    x1, y1 = max(int(bbox[0]), 0), max(int(bbox[1]), 0)
+    x2, y2 = min(int(bbox[2]), frame_width), min(int(bbox[3]), frame_height)
+    if x2 - x1 < EMBED_MIN_SIZE[0] or y2 - y1 < EMBED_MIN_SIZE[1]:
+        return None
+    crop = cv2.resize(frame[y1:y2, x1:x2], EMBED_CROP, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+    parts = []
+    for top, bottom in EMBED_PARTS:
+        histogram = cv2.calcHist([hsv[top:bottom]], [0, 1, 2], None, list(EMBED_BINS), [0, 180, 0, 256, 0, 256]).ravel()
+        parts.append(np.sqrt(histogram / max(float(histogram.sum()), 1.0)))
+    embedding = np.concatenate(parts)
+    return (embedding / np.sqrt(len(EMBED_PARTS))).astype(np.float32) # Each part already has unit norm
+
+class ReIdentifier:
+    """
+    Gives tracks stable person IDs across occlusions and restarts. PersonTracker matches on position
+    only, so somebody hidden for a while (or a camera that was restarted) comes back as a new track;
+    this keeps an appearance embedding per track and, when a new track shows up, searches the
+    recently lost ones with one matrix product and hands the old ID back if the appearance matches.
+
+    Embeddings are only computed for new tracks (while lost tracks are waiting to be re-linked), for
+    tracks that don't have one yet and, with the budget left over, to refresh old ones; a crop that
+    overlaps another track is ambiguous and not embedded until it is clear. New tracks are held back
+    (not reported) until they are either re-linked or given a new ID, at most REID_MAX_PENDING
+    measured frames.
+    Fresh IDs follow the tracker's numbering while it is ahead, so without re-links the IDs are
+    the tracker's own. One instance per stream; the manager keeps it across stop/start (a worker
+    process gets a copy with export_state/load_state and sends its own back).
+    """
+
+    def __init__(self, name, window=REID_WINDOW, threshold=REID_THRESHOLD, margin=REID_MARGIN, budget_ms=REID_BUDGET_MS,
+                 gallery_size=REID_GALLERY_SIZE, refresh_interval=REID_REFRESH_INTERVAL, min_missed=REID_MIN_MISSED,
+                 max_pending=REID_MAX_PENDING):
+        self.name = name # Used in log messages (the stream ID)
+        self.window = window
+        self.threshold = threshold
+        self.margin = margin
+        self.budget = budget_ms / 1000.0
+        self.refresh_interval = refresh_interval
+        self.min_missed = min_missed
+        self.max_pending = max_pending
+        self._next_id = 0
+        self._tracks = {} # {tracker ID: [stable ID, embedding or None, embedded_at]}
+        self._pending = {} # {tracker ID: measured frames waited} of new tracks not decided yet
+        # Lost tracks in fixed arrays; empty/used slots have lost_at = -inf
+        self._gallery_ids = np.full(gallery_size, -1, dtype=np.int64)
+        self._gallery_embeddings = np.zeros((gallery_size, EMBEDDING_DIM), dtype=np.float32)
+        self._gallery_lost_at = np.full(gallery_size, -np.inf)
+        self._gallery_in_room = np.zeros(gallery_size, dtype=bool)
+        self.relinked = [] # (stable ID, was in the room when lost) re-linked by the last apply()
+        self.relinks = 0
+        self.embeddings = 0
+        self.embedding_seconds = 0.0
+        self.deferred = 0 # Embeddings postponed to a later frame by the budget
+        self._gallery_live = 0 # Gallery entries inside the window at the last apply()
+
+    def apply(self, tracker, tracked, frame, timestamp, in_room_ids=(), measured=True):
+        """
+        Maps one frame's tracker output to stable IDs.
+        Args:
+            tracker (PersonTracker): Produced tracked; a still-listed track whose ID is taken over is ended in it.
+            tracked (TrackSnapshot): update()/predict() output.
+            frame (np.ndarray): The frame the boxes belong to, before anything is drawn on it.
+            in_room_ids (set): Stable IDs the ZoneMonitor counts as in the room (remembered for lost tracks).
+            measured (bool): False on predict() frames; their boxes are extrapolated, so nothing is embedded.
+        Returns:
+            TrackSnapshot: tracked with stable IDs (in ID order), without the new tracks still pending.
+        """
+        self.relinked = []
+        raw_ids = tracked.ids.tolist()
+        present = set(raw_ids)
+        for raw_id in [r for r in self._tracks if r not in present]:
+            self._lose(self._tracks.pop(raw_id), timestamp, in_room_ids)
+        for raw_id in [r for r in self._pending if r not in present]:
+            del self._pending[raw_id] # Gone again before it was decided
+        for raw_id in raw_ids:
+            if raw_id not in self._tracks and raw_id not in self._pending:
+                self._pending[raw_id] = 0
+
+        deadline = time.perf_counter() + self.budget
+        crowded = None
+        if measured and len(raw_ids) > 1:
+            overlap = iou_matrix(tracked.bboxes, tracked.bboxes)
+            np.fill_diagonal(overlap, 0.0)
+            crowded = (overlap.max(axis=1) > REID_MAX_OVERLAP).tolist() # Crops with a second person in them
+        elif measured:
+            crowded = [False] * len(raw_ids)
+        if self._pending:
+            self._resolve_pending(tracker, tracked, raw_ids, frame, timestamp, crowded, deadline)
+        if measured:
+            self._refresh(tracked, raw_ids, frame, timestamp, crowded, deadline)
+
+        rows = [row for row, raw_id in enumerate(raw_ids) if raw_id in self._tracks]
+        if len(rows) == len(raw_ids) and not self.relinked:
+            stable_ids = np.array([self._tracks[raw_id][0] for raw_id in raw_ids], dtype=np.int64)
+            if np.array_equal(stable_ids, tracked.ids):
+                return tracked # Nothing renamed or held back (the common case)
+        rows = np.array(rows, dtype=np.int64)
+        stable_ids = np.array([self._tracks[raw_ids[row]][0] for row in rows.tolist()], dtype=np.int64)
+        order = np.argsort(stable_ids, kind='stable')
+        rows = rows[order]
+        return TrackSnapshot(stable_ids[order], tracked.centroids[rows], tracked.bboxes[rows],
+                             tracked.confidences[rows], tracked.missed[rows])
+
+    def stable_id(self, tracker_id):
+        """Stable ID shown for a tracker ID, or None while it is pending (or unknown)."""
+        entry = self._tracks.get(tracker_id)
+        return entry[0] if entry is not None else None
+
+    def end_session(self, timestamp, in_room_ids=()):
+        """Moves every track to the lost gallery (the stream stops; the next tracker numbers its IDs anew)."""
+        for entry in self._tracks.values():
+            self._lose(entry, timestamp, in_room_ids)
+        self._tracks = {}
+        self._pending = {}
+
+    def export_state(self, timestamp, in_room_ids=(), max_entries=REID_STATE_MAX_ENTRIES):
+        """
+        JSON-ready snapshot for a ReIdentifier in another process (see load_state): the gallery entries
+        still inside the window plus the current tracks as if they were lost at timestamp, most recent first.
+        """
+        entries = [(int(stable_id), embedding, timestamp, stable_id in in_room_ids)
+                   for stable_id, embedding, _ in self._tracks.values() if embedding is not None]
+        live = np.flatnonzero(self._gallery_lost_at >= timestamp - self.window)
+        live = live[np.argsort(-self._gallery_lost_at[live], kind='stable')]
+        entries += [(int(self._gallery_ids[slot]), self._gallery_embeddings[slot], float(self._gallery_lost_at[slot]),
+                     bool(self._gallery_in_room[slot])) for slot in live.tolist()]
+        entries = entries[:max_entries]
+        return {
+            "next_id": self._next_id,
+            "ids": [stable_id for stable_id, _, _, _ in entries],
+            "embeddings": [np.round(embedding.astype(np.float64), 3).tolist() for _, embedding, _, _ in entries],
+            "lost_at": [lost_at for _, _, lost_at, _ in entries],
+            "in_room": [in_room for _, _, _, in_room in entries],
+        }
+
+    def load_state(self, state):
+        """Replaces the gallery with an export_state() snapshot; IDs handed out later continue after its next_id."""
+        count = min(len(state["ids"]), len(self._gallery_ids))
+        self._gallery_ids[:] = -1
+        self._gallery_lost_at[:] = -np.inf
+        self._gallery_in_room[:] = False
+        if count:
+            self._gallery_ids[:count] = state["ids"][:count]
+            self._gallery_embeddings[:count] = np.asarray(state["embeddings"][:count], dtype=np.float32)
+            self._gallery_lost_at[:count] = state["lost_at"][:count]
+            self._gallery_in_room[:count] = state["in_room"][:count]
+        self._next_id = max(self._next_id, int(state["next_id"]))
+
+    def _lose(self, entry, timestamp, in_room_ids):
+        stable_id, embedding, _ = entry
+        if embedding is None:
+            return # Never embedded: can't be recognized
+        slot = int(np.argmin(self._gallery_lost_at)) # Empty, or lost longest ago
+        self._gallery_ids[slot] = stable_id
+        self._gallery_embeddings[slot] = embedding
+        self._gallery_lost_at[slot] = timestamp
+        self._gallery_in_room[slot] = stable_id in in_room_ids
+
+    def _assign_new(self, raw_id, embedding, timestamp):
+        """Gives a pending track a new stable ID."""
+        stable_id = max(self._next_id, raw_id) # Same as the tracker's ID unless that one is already taken
+        self._next_id = stable_id + 1
+        self._tracks[raw_id] = [stable_id, embedding, timestamp if embedding is not None else None]
+        del self._pending[raw_id]
+
+    def _embed(self, frame, bbox):
+        start = time.perf_counter()
+        embedding = appearance_embedding(frame, bbox)
+        self.embedding_seconds += time.perf_counter() - start
+        self.embeddings += 1
+        return embedding
+
+    def _candidates(self, tracked, raw_ids, timestamp):
+        """
+        Stable IDs a new track may take: gallery entries lost within the window, and listed tracks
+        the tracker hasn't matched for min_missed updates (somebody who reappeared too far away).
+        Returns:
+            tuple: (embeddings (K, D), stable IDs, tracker IDs (-1 = gallery), gallery slots (-1 = listed), was in room)
+        """
+        live = np.flatnonzero(self._gallery_lost_at >= timestamp - self.window)
+        self._gallery_live = len(live)
+        missed_rows = np.flatnonzero(tracked.missed >= self.min_missed).tolist()
+        listed = [(raw_ids[row], self._tracks[raw_ids[row]]) for row in missed_rows
+                  if raw_ids[row] in self._tracks and self._tracks[raw_ids[row]][1] is not None]
+        embeddings = self._gallery_embeddings[live]
+        if listed:
+            embeddings = np.vstack([embeddings, np.stack([entry[1] for _, entry in listed])])
+        stable_ids = np.concatenate([self._gallery_ids[live], np.array([entry[0] for _, entry in listed], dtype=np.int64)])
+        raw_sources = np.concatenate([np.full(len(live), -1, dtype=np.int64), np.array([r for r, _ in listed], dtype=np.int64)])
+        slots = np.concatenate([live, np.full(len(listed), -1, dtype=np.int64)])
+        in_room = np.concatenate([self._gallery_in_room[live], np.zeros(len(listed), dtype=bool)])
+        return embeddings, stable_ids, raw_sources, slots, in_room
+
+    def _resolve_pending(self, tracker, tracked, raw_ids, frame, timestamp, crowded, deadline):
+        """
+        Re-links or numbers the pending tracks; those without an embedding yet may wait for a later frame.
+        crowded is None on predict() frames (nothing is embedded), else per row whether the crop is ambiguous.
+        """
+        embeddings, stable_ids, raw_sources, slots, in_room = self._candidates(tracked, raw_ids, timestamp)
+        if not len(stable_ids):
+            for raw_id in list(self._pending):
+                self._assign_new(raw_id, None, timestamp) # Nobody to re-link: no need to wait for an embedding
+            return
+        if crowded is None:
+            return
+
+        row_of = {raw_id: row for row, raw_id in enumerate(raw_ids)}
+        new_ids, new_embeddings = [], []
+        for raw_id in list(self._pending):
+            row = row_of[raw_id]
+            embedding = None
+            if tracked.missed[row] == 0 and not crowded[row] and time.perf_counter() < deadline:
+                embedding = self._embed(frame, tracked.bboxes[row])
+                if embedding is None: # Too small to tell: a new person as far as we know
+                    self._assign_new(raw_id, None, timestamp)
+                    continue
+            if embedding is None: # Out of budget, or not clearly visible on its own this frame
+                self.deferred += 1
+                self._pending[raw_id] += 1
+                if self._pending[raw_id] >= self.max_pending:
+                    self._assign_new(raw_id, None, timestamp)
+                continue
+            new_ids.append(raw_id)
+            new_embeddings.append(embedding)
+        if not new_ids:
+            return
+
+        queries = np.stack(new_embeddings)
+        similarity = queries @ embeddings.T # (new tracks, candidates) cosine similarities
+        # A re-link must clear the threshold and beat the runner-up for that track by the margin
+        runner_up = np.sort(similarity, axis=1)[:, -2] if similarity.shape[1] > 1 else np.zeros(len(new_ids))
+        confident = (similarity >= self.threshold) & (similarity >= runner_up[:, None] + self.margin)
+        rows, cols = greedy_assignment(np.where(confident, 1.0 - similarity, np.inf))
+        linked = set()
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            if not confident[row, col]:
+                continue
+            raw_id, stable_id = new_ids[row], int(stable_ids[col])
+            if raw_sources[col] >= 0: # Take the ID over from a track the tracker still lists as missing
+                tracker.deregister([int(raw_sources[col])])
+                self._tracks.pop(int(raw_sources[col]), None)
+                gap = "a few frames"
+            else:
+                gap = f"{timestamp - self._gallery_lost_at[slots[col]]:.1f}s"
+                self._gallery_lost_at[slots[col]] = -np.inf # Free the slot
+                self._gallery_live -= 1
+            blended = (1 - REID_EMBEDDING_SMOOTHING) * embeddings[col] + REID_EMBEDDING_SMOOTHING * queries[row]
+            self._tracks[raw_id] = [stable_id, blended / max(float(np.linalg.norm(blended)), 1e-9), timestamp]
+            del self._pending[raw_id]
+            linked.add(raw_id)
+            self.relinked.append((stable_id, bool(in_room[col])))
+            self.relinks += 1
+            logger.info(f"[{self.name}] Person ID {stable_id} re-identified (tracker ID {raw_id}) after {gap}, "
+                        f"similarity {similarity[row, col]:.2f}.")
+        for raw_id, embedding in zip(new_ids, new_embeddings):
+            if raw_id not in linked:
+                self._assign_new(raw_id, embedding, timestamp)
+
+    def _refresh(self, tracked, raw_ids, frame, timestamp, crowded, deadline):
+        """Spends the rest of the budget on tracks without an embedding, then on the stalest ones."""
+        due = []
+        for row, raw_id in enumerate(raw_ids):
+            entry = self._tracks.get(raw_id)
+            if entry is not None and tracked.missed[row] == 0 and \
+                    (entry[2] is None or timestamp - entry[2] >= self.refresh_interval):
+                due.append((-np.inf if entry[2] is None else entry[2], row))
+        if not due:
+            return
+        due.sort()
+        for position, (_, row) in enumerate(due):
+            if time.perf_counter() >= deadline:
+                self.deferred += len(due) - position
+                return
+            if crowded[row]:
+                continue
+            embedding = self._embed(frame, tracked.bboxes[row])
+            if embedding is None:
+                continue
+            entry = self._tracks[raw_ids[row]]
+            if entry[1] is not None:
+                blended = (1 - REID_EMBEDDING_SMOOTHING) * entry[1] + REID_EMBEDDING_SMOOTHING * embedding
+                embedding = blended / max(float(np.linalg.norm(blended)), 1e-9)
+            entry[1], entry[2] = embedding, timestamp
+
+    def get_stats(self):
+        return {
+            "reid_relinks": self.relinks,
+            "reid_embeddings": self.embeddings,
+            "reid_embedding_ms": round(1000.0 * self.embedding_seconds / self.embeddings, 3) if self.embeddings else 0.0,
+            "reid_deferred": self.deferred,
+            "reid_pending": len(self._pending),
+            "reid_gallery": self._gallery_live,
+        }
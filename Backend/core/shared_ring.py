@@ -0,0 +1,128 @@
+# src/core/shared_ring.py
+import time
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+_HEADER_BYTES = 16 # int64 latest sequence number + int64 slot count
+_SLOT_HEADER_BYTES = 24 # int64 sequence, int64 length, float64 timestamp
+
+class SharedRing:
+    """
+    Single-writer ring buffer of byte payloads (JPEGs, JSON) in multiprocessing.shared_memory.
+
+    Each slot carries its own sequence number, used as a seqlock: the writer invalidates the slot,
+    copies the payload, then publishes the sequence; a reader copies the payload out and keeps it
+    only if the slot's sequence is unchanged afterwards. Nothing is pickled and the writer never
+    waits for readers; a reader that falls more than `slots` messages behind loses the oldest ones.
+    """
+
+    def __init__(self, name=None, slots=8, slot_bytes=2 * 1024 * 1024, create=False):
+        """
+        Args:
+            name (str): Shared memory name; generated when creating, required when attaching.
+            create (bool): True in the owning process (which must also call unlink()).
+        """
+        if create:
+            size = _HEADER_BYTES + slots * (_SLOT_HEADER_BYTES + slot_bytes)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+            header[0] = 0
+            header[1] = slots
+        else:
+            # Spawned workers share the creator's resource tracker, so attaching doesn't hand them ownership
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._owner = create
+        self.name = self._shm.name
+
+        header = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf)
+        self.slots = int(header[1])
+        self.slot_bytes = (self._shm.size - _HEADER_BYTES) // self.slots - _SLOT_HEADER_BYTES
+        self._latest = header[0:1]
+        stride = _SLOT_HEADER_BYTES + self.slot_bytes
+        self._slot_seq, self._slot_len, self._slot_time, self._slot_data = [], [], [], []
+        for index in range(self.slots):
+            offset = _HEADER_BYTES + index * stride
+            ints = np.ndarray((2,), dtype=np.int64, buffer=self._shm.buf, offset=offset)
+            self._slot_seq.append(ints[0:1])
+            self._slot_len.append(ints[1:2])
+            self._slot_time.append(np.ndarray((1,), dtype=np.float64, buffer=self._shm.buf, offset=offset + 16))
+            self._slot_data.append(self._shm.buf[offset + _SLOT_HEADER_BYTES: offset + stride])
+        self.dropped_oversize = 0
+
+    def write(self, payload, timestamp=None):
+        """Publishes one payload. Returns its sequence number, or None if it doesn't fit in a slot."""
+        length = len(payload)
+        if length > self.slot_bytes:
+            self.dropped_oversize += 1
+            return None
+        seq = int(self._latest[0]) + 1
+        index = seq % self.slots
+        self._slot_seq[index][0] = -1 # Invalidate while copying
+        self._slot_data[index][:length] = payload
+        self._slot_len[index][0] = length
+        self._slot_time[index][0] = time.time() if timestamp is None else timestamp
+        self._slot_seq[index][0] = seq
+        self._latest[0] = seq
+        return seq
+
+    @property
+    def latest_seq(self):
+        return int(self._latest[0])
+
+    def _read_slot(self, seq):
+        index = seq % self.slots
+        if int(self._slot_seq[index][0]) != seq:
+            return None
+        length = int(self._slot_len[index][0])
+        timestamp = float(self._slot_time[index][0])
+        payload = bytes(self._slot_data[index][:length])
+        if int(self._slot_seq[index][0]) != seq: # Overwritten while we copied
+            return None
+        return timestamp, payload
+
+    def read_latest(self, after_seq=0):
+        """Returns (seq, timestamp, payload) of the newest message if newer than after_seq, else None."""
+        for _ in range(3): # The writer may lap us mid-copy; just retry with the new latest
+            seq = self.latest_seq
+            if seq <= after_seq:
+                return None
+            slot = self._read_slot(seq)
+            if slot is not None:
+                return (seq,) + slot
+        return None
+
+    def read_since(self, after_seq):
+        """
+        Returns ([(seq, timestamp, payload), ...], lost) for every message after after_seq that is
+        still in the ring; lost counts messages that were already overwritten.
+        """
+        latest = self.latest_seq
+        first = max(after_seq + 1, latest - self.slots + 1)
+        lost = first - (after_seq + 1)
+        messages = []
+        for seq in range(first, latest + 1):
+            slot = self._read_slot(seq)
+            if slot is None:
+                lost += 1
+                continue
+            messages.append((seq,) + slot)
+        return messages, lost
+
+    def close(self):
+        # Drop our numpy/memoryview references first, or SharedMemory.close() raises BufferError
+        self._latest = None
+        self._slot_seq = self._slot_len = self._slot_time = []
+        for view in self._slot_data:
+            view.release()
+        self._slot_data = []
+        self._shm.close()
+
+    def unlink(self):
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,138 @@
+# src/core/stream_jobs.py
+import itertools
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from core.thread_priority import lower_thread_priority
+
+logger = logging.getLogger(__name__)
+
+
+class StreamJobQueue:
+    """
+    Runs stream starts/stops as background jobs on a small thread pool and keeps their status for
+    polling, so API handlers never wait for a camera to open or a grabber thread to join.
+
+    Jobs of one stream run in the order they were submitted (a stop queued behind a start is only
+    handed to the pool once the start finished, so waiting never holds a worker); jobs of different
+    streams run concurrently, at most max_workers at a time. Repeating the
+    request of a job that is still queued or running returns that job instead of queuing another.
+    """
+
+    def __init__(self, max_workers=4, history=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stream-lifecycle",
+                                            initializer=lower_thread_priority)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict() # {job_id: status dict}, oldest first
+        self._futures = {} # {job_id: concurrent Future}, for callers that want to await a job
+        self._calls = {} # {job_id: (action, args, kwargs)}, to recognize a repeated request
+        self._tails = {} # {stream_id: job_id of its most recently submitted job}
+        self._history = history
+        self._order = itertools.count() # Submission order, shown as 'seq'
+
+    def submit(self, stream_id, action, fn, args=(), kwargs=None, source=None):
+        """
+        Queues fn(*args, **kwargs) as the next job of stream_id.
+        Args:
+            action (str): 'start' or 'stop'; with the same arguments as the pending job, the requests are merged.
+            source (str): Stream source, for the job status only.
+        Returns:
+            str: job_id.
+        """
+        args, kwargs = tuple(args), dict(kwargs or {})
+        with self._lock:
+            previous = self._jobs.get(self._tails.get(stream_id))
+            if previous is not None and previous["status"] in ("queued", "running") \
+                    and self._calls.get(previous["job_id"]) == (action, args, kwargs):
+                return previous["job_id"] # Same request already pending (e.g. a double click)
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "seq": next(self._order),
+                "stream_id": stream_id,
+                "action": action,
+                "source": source,
+                "status": "queued",
+                "success": None,
+                "error": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            waits_for = self._futures.get(self._tails.get(stream_id))
+            future = Future()
+            self._tails[stream_id] = job_id
+            self._calls[job_id] = (action, args, kwargs)
+            self._futures[job_id] = future
+            self._prune()
+        # Chained on the stream's previous job (called right away if that one is done or gone)
+        dispatch = lambda _: self._dispatch(job_id, future, fn, args, kwargs)
+        if waits_for is not None:
+            waits_for.add_done_callback(dispatch)
+        else:
+            dispatch(None)
+        return job_id
+
+    def _dispatch(self, job_id, future, fn, args, kwargs):
+        """Hands a job whose predecessor finished to the pool."""
+        try:
+            task = self._executor.submit(self._run, job_id, future, fn, args, kwargs)
+        except RuntimeError: # Shut down: the job (and those chained on it) will never run
+            future.cancel()
+            return
+        task.add_done_callback(lambda task: future.cancel() if task.cancelled() else None)
+
+    def _run(self, job_id, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            success = bool(fn(*args, **kwargs))
+            self._update(job_id, status="completed" if success else "failed", success=success, finished_at=time.time())
+        except Exception as e:
+            job = self.get_job(job_id)
+            logger.error(f"[{job['stream_id']}] Stream {job['action']} job {job_id} failed: {e}")
+            self._update(job_id, status="failed", success=False, error=str(e), finished_at=time.time())
+            success = False
+        future.set_result(success) # Starts the stream's next job, if one is chained
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        """Drops the oldest finished jobs beyond the history size. Caller holds the lock."""
+        excess = len(self._jobs) - self._history
+        for job_id in [j for j, job in self._jobs.items() if job["finished_at"] is not None][:max(excess, 0)]:
+            stream_id = self._jobs.pop(job_id)["stream_id"]
+            self._futures.pop(job_id, None)
+            self._calls.pop(job_id, None)
+            if self._tails.get(stream_id) == job_id: # Finished: nothing left to chain on for this stream
+                del self._tails[stream_id]
+
+    def future(self, job_id):
+        """The job's concurrent Future (result: True if it succeeded), or None if unknown."""
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def get_job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self, stream_id=None):
+        """Newest-first status of the jobs still kept, optionally of one stream only."""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values()) if stream_id is None or job["stream_id"] == stream_id]
+
+    def pending(self):
+        """Number of jobs queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+
+    def shutdown(self):
+        """Cancels jobs that haven't started; running ones finish on their own."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,54 @@
+# src/core/thread_priority.py
+import os
+import sys
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Niceness added to the pipeline threads (capture, grabber, inference, JPEG encoding, writers, stream
+# start/stop jobs) and stream worker processes so the API's event loop gets the CPU first when it wakes
+# up on a busy machine; 0 = same priority as the event loop. 10 gives the loop about 10x their CPU share
+# (5: about 3x, not enough on one core). Per-thread niceness is Linux-only; elsewhere this is a no-op.
+PIPELINE_NICE = int(os.getenv("CLASSYCAM_PIPELINE_NICE", "10"))
+# How long a thread may hold the GIL while another one waits (Python's default: 5 ms). Niceness can't
+# help the event loop while a pipeline thread holds the GIL, so the API process shortens this.
+GIL_SWITCH_INTERVAL_MS = float(os.getenv("CLASSYCAM_GIL_SWITCH_INTERVAL_MS", "0.2"))
+
+def lower_thread_priority(nice=PIPELINE_NICE):
+    """
+    Sets the calling thread to nice levels below the process's main thread (call it first thing in a
+    thread target or as an executor initializer). Relative to the main thread, so calling it from a
+    thread that was already lowered (or inherited a lowered priority) doesn't add up.
+    """
+    if nice <= 0 or not sys.platform.startswith("linux"): # Elsewhere the ID would be taken as a process ID
+        return
+    thread_id = threading.get_native_id() # On Linux PRIO_PROCESS with a thread ID targets just that thread
+    try:
+        base = os.getpriority(os.PRIO_PROCESS, os.getpid()) # The main thread's ID is the process ID
+        os.setpriority(os.PRIO_PROCESS, thread_id, min(19, base + nice))
+    except OSError as e:
+        logger.debug(f"Could not lower priority of thread {threading.current_thread().name}: {e}")
+
+def lower_process_priority(pid, nice=PIPELINE_NICE):
+    """
+    Lowers a child process (a stream worker) like lower_thread_priority lowers a pipeline thread;
+    threads it starts afterwards inherit the priority. Linux-only, like the per-thread variant.
+    """
+    if nice <= 0 or not sys.platform.startswith("linux"):
+        return
+    try:
+        base = os.getpriority(os.PRIO_PROCESS, os.getpid())
+        os.setpriority(os.PRIO_PROCESS, pid, min(19, base + nice))
+    except OSError as e:
+        logger.debug(f"Could not lower priority of process {pid}: {e}")
+
+def shorten_gil_switch_interval(milliseconds=GIL_SWITCH_INTERVAL_MS):
+    """
+    Makes GIL-holding threads hand over after `milliseconds` instead of Python's 5 ms, so the event
+    loop waits less for the GIL every time it wakes up to serve a request. 0 = keep the default.
+    """
+    if milliseconds <= 0:
+        return
+    sys.setswitchinterval(milliseconds / 1000.0)
+    logger.info(f"GIL switch interval set to {milliseconds:g} ms.")
@@ -0,0 +1,160 @@
+# src/core/track_event_hub.py
+import asyncio
+import itertools
+import threading
+import time
+import logging
+from collections import deque
+from core.person_tracker import track_arrays
+
+logger = logging.getLogger(__name__)
+
+# Zone events kept per subscriber while it is busy; older ones are dropped (and counted) beyond this
+MAX_PENDING_EVENTS = 256
+# How often an idle subscriber gets a status message, so proxies keep the connection open
+KEEPALIVE_SECONDS = 5.0
+
+class _TrackSubscriber:
+    """Pending (not yet sent) state of one WebSocket/SSE client."""
+    __slots__ = ('client_id', 'loop', 'event', 'tracks', 'removed', 'events', 'events_dropped', 'seq')
+
+    def __init__(self, client_id, loop, event):
+        self.client_id = client_id
+        self.loop = loop
+        self.event = event
+        self.tracks = {} # {person_id: compact track}; newer updates overwrite older ones
+        self.removed = set()
+        self.events = deque(maxlen=MAX_PENDING_EVENTS)
+        self.events_dropped = 0
+        self.seq = 0
+
+class TrackEventHub:
+    """
+    Pushes tracked-person changes and zone events of one stream to WebSocket/SSE clients.
+
+    The frame grabber thread calls publish() once per processed frame. Only tracks whose box
+    changed (plus removed IDs) are forwarded. Each subscriber has coalescing pending state instead
+    of an unbounded queue: while a slow client is still sending, several deltas merge into one
+    (the newest box per ID wins) and zone events are buffered up to MAX_PENDING_EVENTS.
+    """
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self._lock = threading.Lock() # Guards the snapshot and the subscriber set
+        self._seq = 0
+        self._tracks = {} # Last published compact tracks, {person_id: {'centroid': [...], 'bbox': [...]}}
+        self._subscribers = set() # {_TrackSubscriber}
+        self._client_ids = itertools.count(1)
+        self._closed = False
+        self.messages_published = 0
+
+    def publish(self, tracked_persons, events=()):
+        """
+        Diffs tracked_persons (TrackSnapshot or {id: {'centroid', 'bbox', ...}}) against the previous
+        frame and hands the changes plus any zone events to every subscriber. Called from the grabber thread.
+        """
+        updated = {}
+        current = {}
+        previous = self._tracks
+        ids, centroids, bboxes = track_arrays(tracked_persons)
+        for person_id, centroid, bbox in zip(ids.tolist(), centroids.tolist(), bboxes.tolist()):
+            track = {'centroid': centroid, 'bbox': bbox}
+            current[person_id] = track
+            if previous.get(person_id) != track:
+                updated[person_id] = track
+        removed = [person_id for person_id in previous if person_id not in current]
+        if not updated and not removed and not events:
+            self._tracks = current
+            return
+
+        with self._lock:
+            self._seq += 1
+            self._tracks = current
+            subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                for person_id in removed:
+                    subscriber.tracks.pop(person_id, None)
+                    subscriber.removed.add(person_id)
+                for person_id, track in updated.items():
+                    subscriber.removed.discard(person_id) # Re-appeared before the client saw the removal
+                    subscriber.tracks[person_id] = track
+                for event in events:
+                    if len(subscriber.events) == subscriber.events.maxlen:
+                        subscriber.events_dropped += 1
+                    subscriber.events.append(event)
+                subscriber.seq = self._seq
+            self.messages_published += 1
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.event.set)
+            except RuntimeError:
+                pass # Subscriber's event loop is already closed; it will be unregistered on exit
+
+    def close(self):
+        """Wakes every subscriber so their generators can finish (stream stopped)."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.event.set)
+            except RuntimeError:
+                pass
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _status_message(self):
+        return {"type": "status", "stream_id": self.stream_id, "running": not self._closed, "timestamp": time.time()}
+
+    async def subscribe(self):
+        """
+        Async generator of JSON-friendly messages for one client:
+        a 'snapshot' with every current track, then 'delta' messages
+        ({'updated': {id: track}, 'removed': [ids], 'events': [...], 'events_dropped': n}),
+        'status' keep-alives while nothing changes, and a final 'status' with running=False.
+        """
+        event = asyncio.Event()
+        subscriber = _TrackSubscriber(next(self._client_ids), asyncio.get_running_loop(), event)
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._subscribers.add(subscriber)
+            snapshot = {"type": "snapshot", "stream_id": self.stream_id, "seq": self._seq,
+                        "timestamp": time.time(), "tracks": dict(self._tracks)}
+        if closed:
+            yield self._status_message()
+            return
+        try:
+            yield snapshot
+            while True:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield self._status_message()
+                    continue
+                event.clear()
+                with self._lock:
+                    closed = self._closed
+                    tracks, subscriber.tracks = subscriber.tracks, {}
+                    removed, subscriber.removed = subscriber.removed, set()
+                    events = list(subscriber.events)
+                    subscriber.events.clear()
+                    events_dropped, subscriber.events_dropped = subscriber.events_dropped, 0
+                    seq = subscriber.seq
+                if tracks or removed or events:
+                    message = {"type": "delta", "stream_id": self.stream_id, "seq": seq, "timestamp": time.time(),
+                               "updated": tracks, "removed": sorted(removed), "events": events}
+                    if events_dropped:
+                        message["events_dropped"] = events_dropped
+                    yield message
+                if closed:
+                    yield self._status_message()
+                    break
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+            logger.debug(f"[{self.stream_id}] Track subscriber {subscriber.client_id} left.")
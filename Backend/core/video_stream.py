@@ -0,0 +1,690 @@
+# src/core/video_stream.py
+import cv2
+import os
+import threading
+import time
+import logging
+from core.person_tracker import PersonTracker, TrackSnapshot
+from core.object_detector import empty_detections
+from core.frame_capture import LatestFrameCapture
+from core.pyav_capture import PyAVCapture
+from core.frame_broadcaster import FrameBroadcaster
+from core.track_event_hub import TrackEventHub
+from core.event_recorder import EventRecorder
+from core.motion_gate import MotionGate
+from core.zone_monitor import ZoneMonitor
+from core.zones import load_zone_config
+from core.occupancy import OccupancyTracker
+from core.reid import ReIdentifier
+from core.metrics import StageProfiler, get_metrics_registry
+from core.thread_priority import lower_thread_priority
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How many frames per second the detection/tracking stage aims for; the capture thread runs at camera speed
+DEFAULT_TARGET_FPS = float(os.getenv("CLASSYCAM_TARGET_FPS", "15"))
+
+# Tracks and detections further apart than this (pixels) are never matched by the PersonTracker
+TRACKER_MAX_DISTANCE = float(os.getenv("CLASSYCAM_TRACKER_MAX_DISTANCE", "150"))
+
+# Adaptive inference: skip YOLO on still frames and let the tracker predict positions instead
+ADAPTIVE_INFERENCE = os.getenv("CLASSYCAM_ADAPTIVE_INFERENCE", "1") == "1"
+ADAPTIVE_MAX_INTERVAL = int(os.getenv("CLASSYCAM_ADAPTIVE_MAX_INTERVAL", "6"))
+ADAPTIVE_MOTION_THRESHOLD = float(os.getenv("CLASSYCAM_ADAPTIVE_MOTION_THRESHOLD", "4.0"))
+
+# Inference resolution (longest side) and whether to crop frames to the monitored zones before inference
+DEFAULT_INFERENCE_IMGSZ = int(os.getenv("CLASSYCAM_INFERENCE_IMGSZ", "640"))
+DEFAULT_ROI_CROP = os.getenv("CLASSYCAM_ROI_CROP", "0") == "1"
+ROI_MARGIN = 0.05 # Extra border around the zones, as a fraction of the frame size, so people at the edge are still whole
+
+# Opening a source gives up after OPEN_TIMEOUT; a live source without frames for STALL_TIMEOUT is reconnected
+OPEN_TIMEOUT = float(os.getenv("CLASSYCAM_OPEN_TIMEOUT", "5"))
+STALL_TIMEOUT = float(os.getenv("CLASSYCAM_STALL_TIMEOUT", "10"))
+
+# Decoding (defaults for every stream; per-stream via update_settings, applied when the source is (re)opened)
+CAPTURE_BACKENDS = ('opencv', 'pyav')
+CAPTURE_BACKEND = os.getenv("CLASSYCAM_CAPTURE_BACKEND", "opencv") # 'pyav' needs PyAV installed
+DECODE_THREADS = int(os.getenv("CLASSYCAM_DECODE_THREADS", "0")) # FFmpeg decoder threads per stream; 0 = backend default
+DECODE_SKIP = os.getenv("CLASSYCAM_DECODE_SKIP", "0") == "1" # Only convert the frames the inference stage can use
+DECODE_SKIP_HEADROOM = 1.25 # Convert a bit faster than target_fps so the grabber never waits a whole frame
+# With the pyav backend: decode keyframes only after this many seconds without a tracked person
+IDLE_KEYFRAMES = os.getenv("CLASSYCAM_IDLE_KEYFRAMES", "0") == "1"
+IDLE_KEYFRAMES_AFTER = float(os.getenv("CLASSYCAM_IDLE_KEYFRAMES_AFTER", "10"))
+
+# Appearance re-identification of lost tracks (see core.reid; per stream via update_settings, applied at the next start)
+REID_ENABLED = os.getenv("CLASSYCAM_REID", "0") == "1"
+
+# Placeholder sent to a /video_feed client of a stopped stream; encoded once, not on the event loop per request
+_BLANK_JPEG = cv2.imencode('.jpg', np.zeros((480, 640, 3), dtype=np.uint8))[1].tobytes()
+
+class VideoStream:
+    """
+    A single camera pipeline: one VideoCapture read by a LatestFrameCapture thread, one frame
+    grabber (inference) thread that always processes the newest frame, and one PersonTracker.
+    Many VideoStream instances can run side by side; they all share the ObjectDetector passed in
+    by the VideoStreamManager, so the YOLO weights are only loaded once per process.
+    When an InferenceScheduler is given, frames are submitted to it so they can be batched
+    together with frames from the other streams.
+    """
+
+    def __init__(self, stream_id: str, object_detector, inference_scheduler=None, event_store=None, recording_writer=None,
+                 occupancy=None, reidentifier=None, target_fps=DEFAULT_TARGET_FPS,
+                 adaptive_inference=ADAPTIVE_INFERENCE, inference_imgsz=DEFAULT_INFERENCE_IMGSZ, roi_crop=DEFAULT_ROI_CROP):
+        self.stream_id = stream_id
+        self.stream_source = None # The RTSP URL / webcam index this stream was opened with
+        self.target_fps = target_fps # Pace of the inference stage; None/0 means "as fast as possible"
+        self.adaptive_inference = adaptive_inference # Run YOLO only when MotionGate asks for it
+        self.inference_imgsz = inference_imgsz # YOLO input size; a 4K camera costs the same as a 640px one
+        self.roi_crop = roi_crop # Only send the union of the monitored zones to YOLO
+        self._roi_cache = (None, None) # ((frame_height, frame_width, zones version), (x1, y1, x2, y2))
+        # Decoding options (see CAPTURE_BACKEND etc.); changing them takes effect on the next (re)open,
+        # except decode_skip and idle_keyframes which apply immediately
+        self.capture_backend = CAPTURE_BACKEND
+        self.decode_threads = DECODE_THREADS
+        self.decode_skip = DECODE_SKIP
+        self.decode_width = None # Decode/convert at this width (webcams and the pyav backend); None = native
+        self.substream_url = None # Lower-resolution stream of the same camera, decoded instead of stream_source
+        self.idle_keyframes = IDLE_KEYFRAMES
+        self._decoding_source = None # What was actually opened (substream, or the main source as fallback)
+        self._last_person_at = 0.0
+        self.reid = REID_ENABLED
+        self._reid_active = False # self.reid as of the last start
+        self._relinked_ids = [] # Stable IDs re-identified on the last processed frame
+
+        self._cap = None  # OpenCV VideoCapture object
+        self._running = False # Flag to control frame grabbing thread
+        self._lifecycle_lock = threading.Lock() # Serializes start/stop for this stream only
+        self._frame_lock = threading.Lock() # Lock for safely accessing _current_frame
+        self._current_frame = None # Stores the latest processed frame
+        self._frame_grabber_thread = None # Thread that runs detection/tracking on the latest frame
+        self._capture = None # LatestFrameCapture that owns the reading of _cap
+        self._processed_frames = 0
+        self._processing_fps = 0.0
+        self._detected_objects_info = empty_detections() # DETECTION_DTYPE array from ObjectDetector
+        self._tracked_persons_data = TrackSnapshot.empty() # Latest tracking results from PersonTracker
+        self._broadcaster = FrameBroadcaster(name=stream_id) # Encodes each annotated frame once for all viewers
+        self._track_hub = TrackEventHub(stream_id) # Pushes track deltas and zone events to WebSocket/SSE clients
+
+        # For zone monitoring
+        self._zone_monitor = ZoneMonitor(name=stream_id, config=load_zone_config(stream_id)) # Zones from <CLASSYCAM_ZONES_DIR>/<stream_id>.json
+        # Occupancy/dwell time series; the manager passes one in so the history outlives stop/start
+        self._occupancy = occupancy if occupancy is not None else OccupancyTracker(stream_id)
+
+        # Shared ObjectDetector (owned by the VideoStreamManager)
+        self._object_detector = object_detector
+        self._inference_scheduler = inference_scheduler
+        self._event_store = event_store # Persists zone events (EventStore); None keeps them in memory only
+        # Pre-roll buffer + post-roll capture around events; written to disk by the shared RecordingWriter
+        self._event_recorder = EventRecorder(stream_id, recording_writer) if recording_writer is not None else None
+
+        # Each camera gets its own tracker so IDs never leak between classrooms
+        self._person_tracker = PersonTracker(max_disappeared=50, max_distance=TRACKER_MAX_DISTANCE) # Adjust max_disappeared as needed
+        self._motion_gate = MotionGate(max_interval=ADAPTIVE_MAX_INTERVAL, motion_threshold=ADAPTIVE_MOTION_THRESHOLD)
+        # Stable IDs across occlusions; the manager passes one in so lost tracks outlive stop/start
+        self._reidentifier = reidentifier if reidentifier is not None else ReIdentifier(stream_id)
+
+        # Per-stage timing histograms, exported at /metrics
+        self._profiler = StageProfiler(get_metrics_registry(), stream_id)
+        self._frame_listeners = [] # Called in the grabber thread as listener(jpeg, tracked_persons, events, detections)
+
+        logger.info(f"VideoStream '{stream_id}' initialized.")
+
+    def start(self, stream_source):
+        """
+        Attempts to open a video stream.
+        stream_source is an RTSP URL, file path or webcam index, or an already opened capture object
+        (anything with read()/isOpened()/release(), e.g. the synthetic source used by the benchmarks).
+        """
+        with self._lifecycle_lock: # Ensure only one start/stop happens at a time for this stream
+            if self.is_running():
+                logger.warning(f"Stream '{self.stream_id}' is already running. Please stop it first.")
+                return False
+            if self._running:
+                self._stop_pipeline() # The previous source ended; clean up its threads first
+
+            self._release_resources() # Release any lingering resources before starting a new one
+
+            logger.info(f"[{self.stream_id}] Attempting to connect to stream: {stream_source}")
+
+            if not isinstance(stream_source, str):
+                self._cap = stream_source
+                ret, test_frame = self._cap.read() if self._cap.isOpened() else (False, None)
+                if not ret:
+                    logger.error(f"[{self.stream_id}] Capture object {stream_source} did not deliver a first frame.")
+                    self._cap = None
+                    return False
+                self._start_pipeline(stream_source, test_frame, pace_fps=None) # The object paces itself
+                logger.info(f"[{self.stream_id}] Stream opened from capture object and frame grabber started.")
+                return True
+
+            cap, test_frame = self._open_source(stream_source)
+            if cap is None:
+                logger.error(f"[{self.stream_id}] Failed to open stream: {stream_source} after trying all backends.")
+                return False
+            self._cap = cap
+            live = not os.path.isfile(stream_source) # Files end; cameras get reconnected
+            self._start_pipeline(stream_source, test_frame, pace_fps=self._file_source_fps(stream_source),
+                                 reopen=(lambda: self._open_source(stream_source)) if live else None)
+            logger.info(f"[{self.stream_id}] Stream opened successfully and frame grabber started.")
+            return True
+
+    def _open_source(self, stream_source):
+        """
+        Opens the configured substream if there is one (falling back to stream_source), using the
+        configured capture backend. Also used by the capture thread to reconnect, so it only logs
+        and never touches stream state.
+        Returns:
+            tuple: (cap, first_frame), or (None, None) if nothing delivered a frame.
+        """
+        substream_url = self.substream_url
+        if substream_url:
+            cap, first_frame = self._open_capture(substream_url)
+            if cap is not None:
+                self._decoding_source = substream_url
+                return cap, first_frame
+            logger.warning(f"[{self.stream_id}] Substream {substream_url} failed; decoding the main stream instead.")
+        cap, first_frame = self._open_capture(stream_source)
+        if cap is not None:
+            self._decoding_source = stream_source
+        return cap, first_frame
+
+    def _open_capture(self, source):
+        """
+        Opens an RTSP URL, file path or webcam index with PyAV (capture_backend 'pyav') or by trying
+        the common OpenCV backends (FFMPEG first).
+        Returns:
+            tuple: (cap, first_frame), or (None, None) if no backend delivered a frame.
+        """
+        if self.capture_backend == 'pyav' and not source.isdigit(): # Webcams always go through OpenCV
+            cap = None
+            try:
+                logger.info(f"[{self.stream_id}] Trying to open stream with PyAV")
+                cap = PyAVCapture(source, threads=self.decode_threads, width=self.decode_width,
+                                  open_timeout=OPEN_TIMEOUT, read_timeout=STALL_TIMEOUT)
+                ret, first_frame = cap.read()
+                if ret:
+                    return cap, first_frame
+                logger.warning(f"[{self.stream_id}] PyAV opened but failed to read first frame from {source}.")
+            except Exception as e: # Not installed, or FFmpeg couldn't open the source
+                logger.warning(f"[{self.stream_id}] PyAV could not open {source} ({e}); falling back to OpenCV.")
+            if cap is not None:
+                cap.release()
+
+        # Convert to int if it's a webcam index, otherwise keep as string
+        source_for_cv = int(source) if source.isdigit() else source
+        # Timeouts only take effect when passed to the constructor; a hung read then fails instead of blocking forever
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(OPEN_TIMEOUT * 1000)]
+        if hasattr(cv2, "CAP_PROP_READ_TIMEOUT_MSEC"): # OpenCV >= 4.6
+            params += [cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(STALL_TIMEOUT * 1000)]
+        if self.decode_threads and hasattr(cv2, "CAP_PROP_N_THREADS"): # OpenCV >= 4.7, FFMPEG backend
+            params += [cv2.CAP_PROP_N_THREADS, int(self.decode_threads)]
+
+        for backend in (cv2.CAP_FFMPEG, cv2.CAP_ANY):
+            cap = None
+            try:
+                logger.info(f"[{self.stream_id}] Trying to open stream with backend: {backend}")
+                cap = cv2.VideoCapture(source_for_cv, backend, params)
+                if cap.isOpened():
+                    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) # Reduce buffer for real-time
+                    if self.decode_width and isinstance(source_for_cv, int):
+                        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.decode_width) # The camera picks the nearest mode
+                    # Read the first frame to confirm it's truly open and receiving data
+                    ret, first_frame = cap.read()
+                    if ret:
+                        return cap, first_frame
+                    logger.warning(f"[{self.stream_id}] Backend {backend} opened but failed to read first frame from {source}.")
+                else:
+                    logger.warning(f"[{self.stream_id}] Backend {backend} failed to open stream for {source}.")
+            except Exception as e:
+                logger.error(f"[{self.stream_id}] Error trying backend {backend} with source {source}: {e}")
+            if cap is not None:
+                cap.release()
+        return None, None
+
+    def add_frame_listener(self, listener):
+        """Registers a callback run after every processed frame (e.g. to forward results to another process)."""
+        self._frame_listeners.append(listener)
+
+    def _start_pipeline(self, stream_source, first_frame, pace_fps, reopen=None):
+        """
+        Starts the capture and frame grabber threads on the opened self._cap. Caller holds the lifecycle lock.
+        reopen (see LatestFrameCapture) makes the capture reconnect a live source that stalls.
+        """
+        self.stream_source = stream_source if isinstance(stream_source, str) else repr(stream_source)
+        self._broadcaster = FrameBroadcaster(name=self.stream_id) # Fresh fan-out for this session
+        self._track_hub = TrackEventHub(self.stream_id)
+        self._running = True
+        self._reid_active = self.reid
+        # Start the capture thread (newest frame wins) ...
+        self._capture = LatestFrameCapture(self._cap, name=self.stream_id, pace_fps=pace_fps, profiler=self._profiler,
+                                           reopen=reopen, stall_timeout=STALL_TIMEOUT, retrieve_fps=self._retrieve_fps())
+        self._last_person_at = time.time()
+        self._capture.start(first_frame=first_frame)
+        # ... and the frame grabbing thread that runs inference on it
+        self._frame_grabber_thread = threading.Thread(
+            target=self._grab_frames, name=f"grabber-{self.stream_id}", daemon=True
+        )
+        self._frame_grabber_thread.start()
+
+    def _retrieve_fps(self):
+        """Conversion rate for decode_skip: a little above target_fps; None converts every frame."""
+        return self.target_fps * DECODE_SKIP_HEADROOM if self.decode_skip and self.target_fps else None
+
+    def _update_idle_decoding(self, capture, now):
+        """Switches the capture to keyframes only once nobody was tracked for IDLE_KEYFRAMES_AFTER, and back."""
+        if self._tracked_persons_data:
+            self._last_person_at = now
+        idle = self.idle_keyframes and now - self._last_person_at >= IDLE_KEYFRAMES_AFTER
+        if idle != capture.keyframes_only:
+            capture.set_keyframes_only(idle) # No-op (False) for captures that can't skip
+
+    def stop(self):
+        """Signals the stream to stop and releases resources."""
+        with self._lifecycle_lock:
+            if self._running:
+                self._stop_pipeline()
+                return True
+            else:
+                logger.info(f"[{self.stream_id}] No active stream to stop.")
+                return False
+
+    def _stop_pipeline(self):
+        """Stops the capture and grabber threads and releases the source. Caller holds the lifecycle lock."""
+        self._running = False # Signal the frame grabbing loop to exit
+        logger.info(f"[{self.stream_id}] Signaled stream to stop. Waiting for frame grabber to finish...")
+        if self._capture:
+            self._capture.stop() # Stop reading (and reconnecting) before the VideoCapture is released
+        self._broadcaster.close() # Let every /video_feed client finish
+        self._track_hub.close() # ... and every track/event subscriber
+        if self._frame_grabber_thread and self._frame_grabber_thread.is_alive():
+            self._frame_grabber_thread.join(timeout=5) # Wait for thread to finish
+            if self._frame_grabber_thread.is_alive():
+                logger.warning(f"[{self.stream_id}] Frame grabber thread did not terminate gracefully.")
+        if self._event_recorder is not None:
+            self._event_recorder.flush() # Save a recording that was still collecting post-roll
+        self._release_resources()
+        logger.info(f"[{self.stream_id}] Stream stopped and resources released.")
+
+    def _release_resources(self):
+        """Internal method to release video capture resources."""
+        if self._capture is not None:
+            self._cap = self._capture.cap # May have been replaced by a reconnection
+        if self._cap and self._cap.isOpened():
+            self._cap.release()
+            logger.info(f"[{self.stream_id}] VideoCapture resources released.")
+        self._cap = None
+        self._capture = None
+        self._running = False
+        self._current_frame = None # Clear the last frame
+        self._detected_objects_info = empty_detections() # Clear detections
+        self._tracked_persons_data = TrackSnapshot.empty() # Clear tracked data
+        if self._reid_active: # Keep this session's people recognizable (with their in-room status) after a restart
+            self._reidentifier.end_session(time.time(), self._zone_monitor.in_room_ids())
+        self._zone_monitor.reset() # Clear zone tracking data and status
+        self._occupancy.reset_tracks() # Close the dwell records of this session's tracks
+        self._motion_gate.reset() # First frame of the next session always runs the detector
+
+    def _file_source_fps(self, stream_source):
+        """Returns the native FPS for local video files (so they play in real time), None for live sources."""
+        if not os.path.isfile(stream_source):
+            return None
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        return fps if fps and fps > 0 else 25.0
+
+    def _grab_frames(self):
+        """Thread target: takes the latest captured frame, performs detection/tracking, and updates _current_frame."""
+        lower_thread_priority()
+        logger.info(f"[{self.stream_id}] Frame grabbing thread started.")
+        capture = self._capture
+        profiler = self._profiler
+        last_seq = 0
+        next_deadline = time.perf_counter()
+        fps_window_start, fps_window_frames = time.perf_counter(), 0
+        while self._running and capture.is_running():
+            # Pace the inference stage to target_fps instead of sleeping a fixed amount after every frame
+            if self.target_fps:
+                delay = next_deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_deadline = max(next_deadline + 1.0 / self.target_fps, time.perf_counter())
+
+            profiler.begin()
+            last_seq, frame, captured_at = capture.read_latest(after_seq=last_seq, timeout=1.0)
+            if frame is None:
+                continue # No new frame yet (or capture stopped); the loop condition decides
+            profiler.mark('capture_wait')
+
+            # Perform object detection (every frame, or only when the motion gate asks for it)
+            # The captured frame belongs to this thread now, so we annotate it in place - no copy.
+            annotated_frame = frame
+            detected_objects = empty_detections()
+            run_detector = (not self.adaptive_inference or
+                            self._motion_gate.should_detect(frame, tracked_count=len(self._tracked_persons_data)))
+            profiler.mark('motion_gate')
+
+            if run_detector and self._object_detector.model is not None:
+                detected_objects = self._run_detection(frame)
+                profiler.mark('inference')
+
+            if run_detector:
+                # Filter for persons (vectorized mask) and update tracker
+                person_detections = detected_objects[detected_objects['class_id'] == self._object_detector.person_class_id]
+                tracked = self._person_tracker.update(person_detections)
+            else:
+                # Skipped frame: move tracks forward with their velocity
+                with self._frame_lock:
+                    detected_objects = self._detected_objects_info # Keep the last real detections for the API
+                tracked = self._person_tracker.predict()
+            profiler.mark('tracking')
+            if self._reid_active:
+                # Before anything is drawn: the embeddings are computed from the frame's pixels
+                tracked = self._reidentifier.apply(self._person_tracker, tracked, frame, captured_at,
+                                                   self._zone_monitor.in_room_ids(), measured=run_detector)
+                self._relinked_ids = [person_id for person_id, _ in self._reidentifier.relinked]
+                for person_id, was_in_room in self._reidentifier.relinked:
+                    if was_in_room:
+                        self._zone_monitor.readmit(person_id) # "Person Returned" instead of a new entry
+                    self._occupancy.resume(person_id) # One dwell record across the gap
+                profiler.mark('reid')
+            self._tracked_persons_data = tracked
+
+            if run_detector:
+                self._object_detector.draw_detections(annotated_frame, detected_objects)
+            else:
+                for x1, y1, x2, y2 in tracked.bboxes.tolist():
+                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 200, 0), 1) # Thin green box = predicted
+
+            # Draw tracked IDs and centroids on the frame
+            tracks = self._tracked_persons_data
+            for object_id, (cX, cY) in zip(tracks.ids.tolist(), tracks.centroids.tolist()):
+                # Draw ID near the centroid
+                cv2.putText(annotated_frame, f"ID: {object_id}", (cX - 20, cY - 20),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2) # Magenta color
+                cv2.circle(annotated_frame, (cX, cY), 4, (0, 0, 255), -1) # Red dot for centroid
+            profiler.mark('drawing')
+
+            # Check for zone-based events and draw zones
+            frame_height, frame_width = frame.shape[:2] # Use original frame dimensions for zones
+            self._update_idle_decoding(capture, captured_at)
+            current_events, zone_layout = self._check_zones_and_events(frame_width, frame_height)
+            profiler.mark('zones')
+            self._occupancy.update(captured_at, self._tracked_persons_data, self._zone_monitor.in_room_ids())
+            profiler.mark('occupancy')
+
+            # Draw the zone polygons and doorway lines
+            zone_layout.draw(annotated_frame)
+            profiler.mark('drawing')
+
+            # For now, print events to console. Later we'll send to frontend/log file.
+            if current_events:
+                for event in current_events:
+                    logger.info(f"[{self.stream_id}] Event detected: {event}")
+                if self._event_recorder is not None:
+                    self._event_recorder.trigger(current_events) # Tags each event with its recording_id
+                if self._event_store is not None:
+                    self._event_store.record(self.stream_id, current_events) # Queued; written by the store's thread
+
+            with self._frame_lock:
+                self._current_frame = annotated_frame # Store the annotated frame
+                self._detected_objects_info = detected_objects # Store detection results
+                # You might also want to store current_events if the frontend needs them specifically
+            # Push what changed to WebSocket/SSE subscribers (only tracks whose box moved)
+            self._track_hub.publish(self._tracked_persons_data, current_events)
+            profiler.mark('store')
+
+            # JPEG-encode once here (off the event loop) and fan the bytes out to every viewer
+            self._broadcaster.publish(annotated_frame)
+            profiler.mark('encode')
+            profiler.observe('capture_to_jpeg', time.time() - captured_at) # End-to-end latency incl. queueing
+            if self._event_recorder is not None:
+                _, jpeg = self._broadcaster.latest()
+                if jpeg is not None:
+                    self._event_recorder.add_frame(jpeg) # Keeps the pre-roll; no extra encoding
+                profiler.mark('recording')
+            if self._frame_listeners:
+                _, jpeg = self._broadcaster.latest()
+                for listener in self._frame_listeners:
+                    try:
+                        listener(jpeg, self._tracked_persons_data, current_events, detected_objects)
+                    except Exception as e:
+                        logger.error(f"[{self.stream_id}] Frame listener failed: {e}")
+                profiler.mark('listeners')
+            profiler.end()
+
+            self._processed_frames += 1
+            fps_window_frames += 1
+            elapsed = time.perf_counter() - fps_window_start
+            if elapsed >= 1.0:
+                self._processing_fps = fps_window_frames / elapsed
+                fps_window_start, fps_window_frames = time.perf_counter(), 0
+        logger.info(f"[{self.stream_id}] Frame grabbing thread stopped.")
+        # The _release_resources is handled by stop() or if the loop exits naturally due to _cap failure
+        # Do not call _cap.release() directly here as it can lead to race conditions if stop() is also called.
+
+    def _run_detection(self, frame):
+        """
+        Runs detection through the shared batching scheduler, or directly if there is none.
+        With roi_crop enabled only the zone region (a zero-copy view) is sent to YOLO and the boxes
+        are shifted back to full-frame coordinates for tracking and drawing.
+        """
+        x1, y1 = 0, 0
+        inference_input = frame
+        if self.roi_crop:
+            x1, y1, x2, y2 = self._inference_roi(frame.shape[1], frame.shape[0])
+            inference_input = frame[y1:y2, x1:x2]
+
+        if self._inference_scheduler is None:
+            detections = self._object_detector.detect(inference_input, imgsz=self.inference_imgsz)
+        else:
+            future = self._inference_scheduler.submit(self.stream_id, inference_input, imgsz=self.inference_imgsz)
+            try:
+                detections = future.result(timeout=5)
+            except Exception as e:
+                future.cancel()
+                logger.error(f"[{self.stream_id}] Inference failed: {e}")
+                return empty_detections()
+
+        if (x1 or y1) and len(detections):
+            detections['bbox'] += np.array([x1, y1, x1, y1], dtype=np.int32)
+        return detections
+
+    def _inference_roi(self, frame_width, frame_height):
+        """Bounding box of all monitored zones plus a margin, cached per frame size."""
+        key = (frame_height, frame_width, self._zone_monitor.version) # Zones may be replaced at runtime
+        cached_key, roi = self._roi_cache
+        if cached_key == key:
+            return roi
+        x1, y1, x2, y2 = self._zone_monitor.layout(frame_width, frame_height).bounds
+        margin_x, margin_y = int(frame_width * ROI_MARGIN), int(frame_height * ROI_MARGIN)
+        roi = (max(0, x1 - margin_x), max(0, y1 - margin_y),
+               min(frame_width, x2 + margin_x), min(frame_height, y2 + margin_y))
+        self._roi_cache = (key, roi)
+        logger.info(f"[{self.stream_id}] Inference ROI for {frame_width}x{frame_height}: {roi}")
+        return roi
+
+    def _check_zones_and_events(self, frame_width, frame_height):
+        """
+        Checks tracked persons against the zones for entry/exit events.
+        """
+        events = self._zone_monitor.check(self._tracked_persons_data, frame_width, frame_height)
+        return events, self._zone_monitor.layout(frame_width, frame_height) # Return events and zone layout for drawing
+
+    def get_zones(self):
+        """Returns the active zone config (see core.zones)."""
+        return self._zone_monitor.get_config()
+
+    def set_zones(self, config):
+        """
+        Replaces the zones/doorway lines; takes effect on the next processed frame.
+        Raises:
+            ValueError: If the config is invalid.
+        """
+        return self._zone_monitor.configure(config)
+
+    def is_running(self):
+        """Check if the stream is currently active."""
+        # Still True while a live source is reconnecting (see connection_state in get_status)
+        return bool(self._running and self._capture is not None and self._capture.is_running())
+
+    def get_detected_objects(self):
+        """Returns the raw object detection results for the current frame (as dicts, for the API)."""
+        with self._frame_lock:
+            detections = self._detected_objects_info
+        return self._object_detector.to_dicts(detections)
+
+    def get_tracked_persons(self):
+        """Returns the data for currently tracked persons (with IDs, centroids, etc.)."""
+        with self._frame_lock:
+            tracked = self._tracked_persons_data
+        return dict(tracked) # Per-person dicts are only built here, for the API
+
+    def update_settings(self, target_fps=None, adaptive_inference=None, inference_imgsz=None, roi_crop=None,
+                        capture_backend=None, decode_threads=None, decode_skip=None, decode_width=None,
+                        substream_url=None, idle_keyframes=None, reid=None):
+        """
+        Changes per-stream processing settings; they apply from the next processed frame.
+        Decoding options (capture_backend, decode_threads, decode_width, substream_url) apply from the
+        next time the source is opened; pass decode_width=0 / substream_url="" to clear them.
+        reid (re-identification) applies from the next start, so running tracks are never renumbered.
+        """
+        if target_fps is not None:
+            self.target_fps = target_fps
+        if adaptive_inference is not None:
+            self.adaptive_inference = adaptive_inference
+        if inference_imgsz is not None:
+            self.inference_imgsz = inference_imgsz
+        if roi_crop is not None:
+            self.roi_crop = roi_crop
+        if capture_backend is not None:
+            if capture_backend not in CAPTURE_BACKENDS:
+                raise ValueError(f"capture_backend must be one of {CAPTURE_BACKENDS}")
+            self.capture_backend = capture_backend
+        if decode_threads is not None:
+            self.decode_threads = decode_threads
+        if decode_skip is not None:
+            self.decode_skip = decode_skip
+        if decode_width is not None:
+            self.decode_width = decode_width or None
+        if substream_url is not None:
+            self.substream_url = substream_url or None
+        if idle_keyframes is not None:
+            self.idle_keyframes = idle_keyframes
+        if reid is not None:
+            self.reid = reid
+        capture = self._capture
+        if capture is not None:
+            capture.retrieve_fps = self._retrieve_fps()
+        logger.info(f"[{self.stream_id}] Settings updated: target_fps={self.target_fps}, adaptive_inference={self.adaptive_inference}, "
+                    f"inference_imgsz={self.inference_imgsz}, roi_crop={self.roi_crop}, capture_backend={self.capture_backend}, "
+                    f"decode_threads={self.decode_threads}, decode_skip={self.decode_skip}, decode_width={self.decode_width}, "
+                    f"substream_url={self.substream_url}, idle_keyframes={self.idle_keyframes}, reid={self.reid}")
+
+    def get_status(self):
+        """Returns a small JSON-friendly summary of this stream."""
+        status = {
+            "stream_id": self.stream_id,
+            "source": self.stream_source,
+            "running": self.is_running(),
+            "target_fps": self.target_fps,
+            "processed_frames": self._processed_frames,
+            "processing_fps": round(self._processing_fps, 2),
+            "frames_encoded": self._broadcaster.frames_encoded,
+            "viewers": self._broadcaster.subscriber_count,
+            "event_subscribers": self._track_hub.subscriber_count,
+            "adaptive_inference": self.adaptive_inference,
+            "inference_imgsz": self.inference_imgsz,
+            "roi_crop": self.roi_crop,
+            "capture_backend": self.capture_backend,
+            "decode_threads": self.decode_threads,
+            "decode_skip": self.decode_skip,
+            "decode_width": self.decode_width,
+            "substream_url": self.substream_url,
+            "idle_keyframes": self.idle_keyframes,
+            "decoding_source": self._decoding_source if self._running else None,
+            "reid": self.reid,
+        }
+        if self.adaptive_inference:
+            status.update(self._motion_gate.get_stats())
+        if self._reid_active:
+            status.update(self._reidentifier.get_stats())
+        capture = self._capture
+        if capture is not None:
+            status.update(capture.get_stats())
+        return status
+
+    def get_profile(self):
+        """Per-stage latency percentiles (ms) and per-viewer send rates for this stream."""
+        return {
+            "stream_id": self.stream_id,
+            "stages": self._profiler.summary(),
+            "clients": self._broadcaster.get_client_stats(),
+        }
+
+    def get_metric_samples(self):
+        """Yields (name, type, help, labels, value) gauges/counters for the /metrics collector."""
+        labels = {"stream": self.stream_id}
+        status = self.get_status()
+        yield "classycam_stream_running", "gauge", "1 if the stream is capturing.", labels, int(status["running"])
+        yield "classycam_capture_fps", "gauge", "Frames decoded per second.", labels, status.get("capture_fps", 0.0)
+        yield "classycam_processing_fps", "gauge", "Frames run through detection/tracking per second.", labels, status["processing_fps"]
+        yield "classycam_frames_processed_total", "counter", "Frames run through detection/tracking.", labels, status["processed_frames"]
+        yield "classycam_frames_encoded_total", "counter", "Annotated frames JPEG-encoded.", labels, status["frames_encoded"]
+        yield "classycam_frames_captured_total", "counter", "Frames decoded from the source.", labels, status.get("frames_captured", 0)
+        yield "classycam_frames_dropped_total", "counter", "Decoded frames replaced before processing.", labels, status.get("frames_dropped", 0)
+        yield "classycam_capture_read_failures_total", "counter", "Failed reads from the source.", labels, status.get("read_failures", 0)
+        yield "classycam_decode_cpu_seconds_total", "counter", "CPU time of the capture thread spent reading/decoding frames.", labels, status.get("decode_cpu_seconds", 0.0)
+        yield "classycam_frames_grab_only_total", "counter", "Frames decoded but not converted (decode_skip).", labels, status.get("frames_grab_only", 0)
+        yield "classycam_keyframes_only", "gauge", "1 while an idle stream decodes keyframes only.", labels, int(bool(status.get("keyframes_only")))
+        yield "classycam_stream_connected", "gauge", "1 while the source delivers frames (0 while reconnecting).", labels, int(status.get("connection_state") == "connected")
+        yield "classycam_stream_reconnects_total", "counter", "Successful reconnections to the source.", labels, status.get("reconnects", 0)
+        visible, in_room = self._occupancy.current()
+        yield "classycam_occupancy_persons", "gauge", "Persons currently tracked.", labels, visible
+        yield "classycam_occupancy_in_room", "gauge", "Persons currently counted as in the room.", labels, in_room
+        yield "classycam_viewers", "gauge", "Connected /video_feed clients.", labels, status["viewers"]
+        if "reid_relinks" in status:
+            yield "classycam_reid_relinks_total", "counter", "Lost tracks re-identified under their old ID.", labels, status["reid_relinks"]
+            yield "classycam_reid_embeddings_total", "counter", "Appearance embeddings computed for re-identification.", labels, status["reid_embeddings"]
+            yield "classycam_reid_deferred_total", "counter", "Embeddings postponed to a later frame by the per-frame budget.", labels, status["reid_deferred"]
+        if self.adaptive_inference:
+            yield "classycam_detection_rate", "gauge", "Fraction of processed frames that ran the detector.", labels, status.get("detection_rate", 0.0)
+        for client in self._broadcaster.get_client_stats():
+            client_labels = {"stream": self.stream_id, "client": client["client_id"]}
+            yield "classycam_client_send_fps", "gauge", "Frames per second sent to each viewer.", client_labels, client["send_fps"]
+            yield "classycam_client_frames_skipped_total", "counter", "Frames a viewer skipped because it was still sending.", client_labels, client["frames_skipped"]
+            yield "classycam_client_send_kbps", "gauge", "Bandwidth used by each viewer.", client_labels, client["send_kbps"]
+            yield "classycam_client_jpeg_quality", "gauge", "JPEG quality currently sent to each viewer.", client_labels, client["quality"]
+        yield "classycam_profile_encodes_total", "counter", "Extra encodings for viewers asking for a smaller width or lower quality.", labels, self._broadcaster.profile_encodes
+
+    async def subscribe_updates(self):
+        """Async generator of track snapshot/delta/status messages (see TrackEventHub.subscribe)."""
+        async for message in self._track_hub.subscribe():
+            yield message
+
+    async def generate_frames(self, max_width=None, quality=None, max_fps=None, adaptive=False):
+        """
+        Generator function to yield processed video frames.
+        The arguments pick this viewer's profile (see FrameBroadcaster.subscribe); by default every
+        viewer gets the shared full-size encoding.
+        """
+        if not self.is_running():
+            logger.warning(f"[{self.stream_id}] Attempted to generate frames but stream is not open or running.")
+            # Return a blank frame if no stream is active, or stop the loop immediately
+            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + _BLANK_JPEG + b'\r\n')
+            return
+
+        logger.info(f"[{self.stream_id}] Starting frame generation loop.")
+        try:
+            # Every client shares the same encoded bytes; slow clients skip to the newest frame
+            async for _, frame_bytes in self._broadcaster.subscribe(max_width=max_width, quality=quality,
+                                                                    max_fps=max_fps, adaptive=adaptive):
+                if not self._running:
+                    break
+                send_start = time.perf_counter()
+                yield (b'--frame\r\n'
+                      b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                self._profiler.observe('client_send', time.perf_counter() - send_start)
+        except Exception as e:
+            logger.error(f"[{self.stream_id}] Error during frame generation: {e}")
+        finally:
+            logger.info(f"[{self.stream_id}] Frame generation loop exiting.")
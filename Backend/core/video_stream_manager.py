@@ -1,21 +1,57 @@
 # src/core/video_stream_manager.py
-import cv2
-import threading
+import os
 import time
+import threading
 import logging
-from core.object_detector import get_object_detector # New import
-from core.person_tracker import PersonTracker # New import for tracking
-import numpy as np
-import asyncio # Keep for the async generator, but use time.sleep for the grabber thread
-from core.person_tracker import PersonTracker # New import
+from core.object_detector import ObjectDetector
+from core.inference_scheduler import InferenceScheduler
+from core.video_stream import VideoStream, DEFAULT_INFERENCE_IMGSZ
+from core.process_stream import ProcessVideoStream
+from core.metrics import get_metrics_registry
+from core.occupancy import OccupancyTracker
+from core.reid import ReIdentifier
+from core.stream_jobs import StreamJobQueue
+from core.zones import load_zone_config, save_zone_config, validate_zone_config
+from core.event_store import get_event_store
+from core.event_recorder import get_recording_writer, RECORDING_ENABLED
 
 logger = logging.getLogger(__name__)
 
-# To ensure only one stream runs at a time globally (for the entire application)
-stream_lock = threading.Lock()
+# Stream ID used by the legacy single-camera routes (/video_feed, /api/detected_objects, ...)
+DEFAULT_STREAM_ID = "default"
+
+# Cross-stream batching of YOLO calls (see InferenceScheduler); override via environment variables
+INFERENCE_BATCH_SIZE = int(os.getenv("CLASSYCAM_INFERENCE_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("CLASSYCAM_INFERENCE_MAX_WAIT_MS", "10"))
+
+# Which runtime executes YOLO: 'pytorch', 'onnx' (ONNX Runtime) or 'openvino'; INT8 applies to the exported ones
+DETECTOR_BACKEND = os.getenv("CLASSYCAM_DETECTOR_BACKEND", "pytorch")
+DETECTOR_INT8 = os.getenv("CLASSYCAM_DETECTOR_INT8", "0") == "1"
+
+# 'thread': every stream runs in this process (shared model, cross-stream batching)
+# 'process': every stream runs in its own supervised worker process with its own model (no GIL contention)
+WORKER_MODE = os.getenv("CLASSYCAM_WORKER_MODE", "thread")
+MODEL_PATH = 'models/yolov8n.pt'
+
+# When the shared model is loaded: 'background' (on a thread right after startup, default), 'lazy'
+# (on the first stream start) or 'eager' (while the manager is created, blocking startup)
+MODEL_LOADING = os.getenv("CLASSYCAM_MODEL_LOADING", "background")
+MODEL_WARMUP = os.getenv("CLASSYCAM_MODEL_WARMUP", "1") == "1" # One dummy inference before reporting ready
+MODEL_LOAD_TIMEOUT = float(os.getenv("CLASSYCAM_MODEL_LOAD_TIMEOUT", "300")) # How long a stream start waits for it
+
+# Stream starts/stops run as jobs on this many threads (opening a camera can block for seconds),
+# so a burst of requests can't exhaust the API's thread pool
+LIFECYCLE_WORKERS = int(os.getenv("CLASSYCAM_LIFECYCLE_WORKERS", "4"))
+LIFECYCLE_JOB_HISTORY = 200 # Finished start/stop jobs kept for polling
+
 _current_video_stream_instance = None # To hold the singleton instance
 
 class VideoStreamManager:
+    """
+    Registry of VideoStream pipelines keyed by stream ID.
+    Each classroom camera gets its own VideoStream (capture + grabber thread + tracker),
+    while the YOLO ObjectDetector is loaded once here and shared by all of them.
+    """
     _instance = None
     _lock = threading.Lock() # Lock for the singleton instance creation itself
 
@@ -32,305 +68,298 @@ class VideoStreamManager:
         if self._initialized:
             return
 
-        self._cap = None  # OpenCV VideoCapture object
-        self._running = False # Flag to control frame grabbing thread
-        self._frame_lock = threading.Lock() # Lock for safely accessing _current_frame
-        self._current_frame = None # Stores the latest processed frame
-        self._frame_grabber_thread = None # Thread that grabs frames
-        self._detected_objects_info = [] # Store detection results from ObjectDetector
-        self._tracked_persons_data = {} # Store tracking results from PersonTracker
+        self._streams = {} # {stream_id: VideoStream}
+        self._occupancy = {} # {stream_id: OccupancyTracker}; kept when a stream stops so its history can still be queried
+        self._reidentifiers = {} # {stream_id: ReIdentifier}; kept so people are recognized after a restart
+        self._registry_lock = threading.Lock() # Guards _streams only; each stream has its own lifecycle lock
+        self._lifecycle_jobs = StreamJobQueue(max_workers=LIFECYCLE_WORKERS, history=LIFECYCLE_JOB_HISTORY)
 
-        # For zone monitoring
-        self._prev_person_centroids = {} # To store centroids from the previous frame for tracking movement
-        self._person_in_room_status = {} # {person_id: True/False} status for zone logic
-
-        # Initialize ObjectDetector
+        # Create the shared ObjectDetector; the weights are loaded later (see start_model_loading)
         # IMPORTANT: Use your specific model_path here if you placed it locally, e.g., 'models/yolov8.pt'
         # If 'yolov8n.pt' is not in 'models/' folder, this will try to download it.
-        self._object_detector = get_object_detector(model_path='models/yolov8n.pt')
-        
-        # Initialize PersonTracker
-        self._person_tracker = PersonTracker(max_disappeared=50) # Adjust max_disappeared as needed
+        # In process mode each worker loads its own copy, so the API process doesn't need one
+        self._model_options = {"model_path": MODEL_PATH, "backend": DETECTOR_BACKEND, "int8": DETECTOR_INT8}
+        self._object_detector = ObjectDetector(**self._model_options) if WORKER_MODE != "process" else None
+        self._model_lock = threading.Lock()
+        self._model_ready = threading.Event() # Set when loading finished, successfully or not
+        self._model_status = {"state": "not_loaded", "error": None, "load_seconds": None, "warmup_seconds": None,
+                              "ready_at": None}
+        if self._object_detector is None:
+            self._model_status.update(state="ready", ready_at=time.time()) # Nothing to load here
+            self._model_ready.set()
+
+        # One scheduler batches frames from every stream into shared model calls
+        self._inference_scheduler = InferenceScheduler(
+            self._object_detector,
+            max_batch_size=INFERENCE_BATCH_SIZE,
+            max_wait_ms=INFERENCE_MAX_WAIT_MS,
+        )
+        self._inference_scheduler.start()
+
+        # Zone events of every stream go to one SQLite store, written in batches off the grab threads
+        self._event_store = get_event_store()
+        # Snapshots/clips around events are written by one shared worker pool
+        self._recording_writer = get_recording_writer() if RECORDING_ENABLED else None
+
+        # Gauges/counters are read from the pipelines only when /metrics is scraped
+        self._metrics_registry = get_metrics_registry()
+        self._metrics_registry.register_collector(self._collect_metrics)
 
         logger.info("VideoStreamManager initialized.")
         self._initialized = True
+        if MODEL_LOADING == "eager":
+            self._load_model()
+
+    def start_model_loading(self):
+        """Starts loading (and warming up) the shared model on a background thread, unless it is loading or loaded."""
+        with self._model_lock:
+            if self._model_status["state"] in ("loading", "ready"):
+                return
+            self._model_status.update(state="loading", error=None) # Also retries after a failure
+            self._model_ready.clear()
+        threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+
+    def _load_model(self):
+        """Loads the model and runs the warm-up inference, recording how long each took."""
+        self._model_status["state"] = "loading"
+        try:
+            self._object_detector.load_model()
+            warmup_seconds = self._object_detector.warm_up(imgsz=DEFAULT_INFERENCE_IMGSZ) if MODEL_WARMUP else None
+            self._model_status.update(state="ready", load_seconds=round(self._object_detector.load_seconds, 3),
+                                      warmup_seconds=None if warmup_seconds is None else round(warmup_seconds, 3),
+                                      ready_at=time.time())
+        except Exception as e:
+            self._model_status.update(state="failed", error=str(e))
+            logger.error(f"Shared model could not be loaded: {e}")
+        finally:
+            self._model_ready.set()
+
+    def ensure_model_loaded(self, timeout=MODEL_LOAD_TIMEOUT):
+        """Starts loading the model if needed and waits for it. Returns True if it is ready."""
+        self.start_model_loading()
+        self._model_ready.wait(timeout)
+        return self._model_status["state"] == "ready"
+
+    def get_model_status(self):
+        """Model readiness for /ready: state ('not_loaded', 'loading', 'ready', 'failed'), error and timings."""
+        status = dict(self._model_status)
+        status.update(loading_mode=MODEL_LOADING, worker_mode=WORKER_MODE)
+        return status
+
+    def is_ready(self):
+        return self._model_status["state"] == "ready"
 
     # The __init__ method for singletons should typically just call _initialize if not already
     def __init__(self):
         if not hasattr(self, '_initialized') or not self._initialized:
             self._initialize()
 
-    def start_stream(self, stream_source: str):
-        """Attempts to open a video stream."""
-        with stream_lock: # Ensure only one stream operation happens at a time globally
-            if self._running:
-                logger.warning("Stream is already running. Please stop it first.")
-                return False
-
-            self._release_resources() # Release any lingering resources before starting a new one
-
-            logger.info(f"Attempting to connect to stream: {stream_source}")
-
-            # Try common backends, preferring FFMPEG for RTSP
-            # We already tried CAP_PROP_OPEN_TIMEOUT_MSEC in previous iterations, keep it here.
-            backends_to_try = [cv2.CAP_FFMPEG, cv2.CAP_ANY] 
-            
-            self._cap = None # Ensure we work with _cap consistently
-            for backend in backends_to_try:
-                try:
-                    logger.info(f"Trying to open stream with backend: {backend}")
-                    # Convert to int if it's a webcam index, otherwise keep as string
-                    source_for_cv = int(stream_source) if stream_source.isdigit() else stream_source
-                    self._cap = cv2.VideoCapture(source_for_cv, backend)
-                    
-                    # Set properties for network streams, these should be set before checking isOpened
-                    # Set a longer timeout for opening the stream (e.g., 5 seconds)
-                    self._cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000) 
-                    self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1) # Reduce buffer for real-time
-
-                    # Give it a moment to establish connection if it's a network stream
-                    # Although CAP_PROP_OPEN_TIMEOUT_MSEC should handle this, a small sleep might help
-                    time.sleep(0.5) 
-                    
-                    if self._cap.isOpened():
-                        # Try to read the first frame to confirm it's truly open and receiving data
-                        ret, test_frame = self._cap.read()
-                        if ret:
-                            self._running = True
-                            # Start the frame grabbing thread
-                            self._frame_grabber_thread = threading.Thread(target=self._grab_frames, daemon=True)
-                            self._frame_grabber_thread.start()
-                            logger.info(f"Stream opened successfully with backend {backend} and frame grabber started.")
-                            return True
-                        else:
-                            logger.warning(f"Backend {backend} opened but failed to read first frame from {stream_source}.")
-                            self._cap.release() # Release if first frame fails
-                    else:
-                        logger.warning(f"Backend {backend} failed to open stream for {stream_source}.")
-
-                except Exception as e:
-                    logger.error(f"Error trying backend {backend} with source {stream_source}: {e}")
-                    if self._cap:
-                        self._cap.release()
-                    self._cap = None # Reset _cap on error
-                    
-            logger.error(f"Failed to open stream: {stream_source} after trying all backends.")
-            return False
-
-    def stop_stream(self):
-        """Signals the stream to stop and releases resources."""
-        with stream_lock: # Ensure only one stream operation happens at a time globally
-            if self._running:
-                self._running = False # Signal the frame grabbing loop to exit
-                logger.info("Signaled stream to stop. Waiting for frame grabber to finish...")
-                if self._frame_grabber_thread and self._frame_grabber_thread.is_alive():
-                    self._frame_grabber_thread.join(timeout=5) # Wait for thread to finish
-                    if self._frame_grabber_thread.is_alive():
-                        logger.warning("Frame grabber thread did not terminate gracefully.")
-                self._release_resources()
-                logger.info("Stream stopped and resources released.")
-                return True
+    def _get_or_create_stream(self, stream_id: str):
+        """Returns the VideoStream registered under stream_id, creating it if needed."""
+        with self._registry_lock:
+            stream = self._streams.get(stream_id)
+            if stream is not None:
+                return stream
+            if stream_id not in self._occupancy: # Preallocates its rings; only build one for a new stream_id
+                self._occupancy[stream_id] = OccupancyTracker(stream_id)
+            occupancy = self._occupancy[stream_id]
+            if stream_id not in self._reidentifiers: # Same for its gallery arrays
+                self._reidentifiers[stream_id] = ReIdentifier(stream_id)
+            reidentifier = self._reidentifiers[stream_id]
+            if WORKER_MODE == "process":
+                stream = ProcessVideoStream(stream_id, self._model_options, self._event_store, self._recording_writer,
+                                            occupancy=occupancy, reidentifier=reidentifier)
             else:
-                logger.info("No active stream to stop.")
-                return False
-
-    def _release_resources(self):
-        """Internal method to release video capture resources."""
-        if self._cap and self._cap.isOpened():
-            self._cap.release()
-            logger.info("VideoCapture resources released.")
-        self._cap = None
-        self._running = False
-        self._current_frame = None # Clear the last frame
-        self._detected_objects_info = [] # Clear detections
-        self._tracked_persons_data = {} # Clear tracked data
-        self._prev_person_centroids = {} # Clear zone tracking data
-        self._person_in_room_status = {} # Clear zone status
-
-    def _grab_frames(self):
-        """Thread target: grabs frames, performs detection/tracking, and updates _current_frame."""
-        logger.info("Frame grabbing thread started.")
-        time.sleep(0.1) # Small delay to ensure stream is fully ready
-        while self._running and self._cap and self._cap.isOpened():
-            ret, frame = self._cap.read()
-            if not ret:
-                logger.warning("Failed to grab frame. Stream might be disconnected or ended. Attempting to re-read...")
-                time.sleep(0.05) # Small delay before retrying
-                continue
-
-            # Perform object detection
-            annotated_frame = frame.copy() # Start with a copy to draw on
-            detected_objects = []
-
-            if self._object_detector.model is not None:
-                # The detect method in ObjectDetector already draws on the frame and returns it
-                annotated_frame, detected_objects = self._object_detector.detect(frame)
-            
-            # Filter for persons and update tracker
-            person_detections = [obj for obj in detected_objects if obj['class'] == 'person']
-            self._tracked_persons_data = self._person_tracker.update(person_detections)
-
-            # Draw tracked IDs and centroids on the frame
-            for object_id, p_data in self._tracked_persons_data.items():
-                x1, y1, x2, y2 = p_data['bbox']
-                cX, cY = p_data['centroid']
-                # Draw ID near the centroid
-                cv2.putText(annotated_frame, f"ID: {object_id}", (cX - 20, cY - 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2) # Magenta color
-                cv2.circle(annotated_frame, (cX, cY), 4, (0, 0, 255), -1) # Red dot for centroid
-
-            # Check for zone-based events and draw zones
-            frame_height, frame_width = frame.shape[:2] # Use original frame dimensions for zones
-            current_events, doorway_line, classroom_zone = self._check_zones_and_events(frame_width, frame_height)
-
-            # Draw the doorway line
-            cv2.line(annotated_frame, doorway_line[0], doorway_line[1], (255, 0, 0), 2) # Blue line
-            cv2.putText(annotated_frame, "Doorway", (doorway_line[0][0] + 10, doorway_line[0][1] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-
-            # Draw the classroom zone rectangle
-            cv2.rectangle(annotated_frame, (classroom_zone[0], classroom_zone[1]),
-                          (classroom_zone[2], classroom_zone[3]), (0, 255, 255), 2) # Yellow rectangle
-            cv2.putText(annotated_frame, "Classroom Zone", (classroom_zone[0] + 10, classroom_zone[1] + 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-            # For now, print events to console. Later we'll send to frontend/log file.
-            if current_events:
-                for event in current_events:
-                    logger.info(f"Event detected: {event}")
-
-            with self._frame_lock:
-                self._current_frame = annotated_frame # Store the annotated frame
-                self._detected_objects_info = detected_objects # Store detection results
-                # You might also want to store current_events if the frontend needs them specifically
-            time.sleep(0.03) # Adjust based on desired FPS (e.g., 0.03 for ~30 FPS)
-        logger.info("Frame grabbing thread stopped.")
-        # The _release_resources is handled by stop_stream or if the loop exits naturally due to _cap failure
-        # Do not call _cap.release() directly here as it can lead to race conditions if stop_stream is also called.
-
-    def _check_zones_and_events(self, frame_width, frame_height):
+                stream = VideoStream(stream_id, self._object_detector, self._inference_scheduler,
+                                     self._event_store, self._recording_writer, occupancy=occupancy,
+                                     reidentifier=reidentifier)
+            self._streams[stream_id] = stream
+            return stream
+
+    def get_stream(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Returns the VideoStream for stream_id, or None if it was never started."""
+        with self._registry_lock:
+            return self._streams.get(stream_id)
+
+    def list_streams(self):
+        """Returns a status summary for every registered stream."""
+        with self._registry_lock:
+            streams = list(self._streams.values())
+        return [stream.get_status() for stream in streams]
+
+    def start_stream(self, stream_source: str, stream_id: str = DEFAULT_STREAM_ID, **settings):
         """
-        Defines zones and checks for entry/exit events.
-        (This is a placeholder; you'd define actual coordinates based on your classroom view)
+        Attempts to open a video stream under the given stream ID.
+        Extra keyword arguments are per-stream settings (see VideoStream.update_settings).
         """
-        # Example Zone 1: A "doorway" line
-        # This is just a horizontal line for simplicity. Adjust coordinates based on your camera view.
-        doorway_y = int(frame_height * 0.75) # 75% down the frame
-        doorway_line = [(0, doorway_y), (frame_width, doorway_y)]
-
-        # Example Zone 2: A "classroom" bounding box
-        # A rectangular area representing the main classroom space
-        classroom_zone = (int(frame_width * 0.1), int(frame_height * 0.1),
-                          int(frame_width * 0.9), int(frame_height * 0.9)) # x1, y1, x2, y2
-
-        events = []
-
-        # Store previous centroids for entry/exit logic
-        # These are now initialized in _initialize, so we don't need 'if not hasattr' checks here
-        current_centroids = {id: p_data['centroid'] for id, p_data in self._tracked_persons_data.items()}
-
-        # Handle deregistered persons if they were in the room
-        for prev_id in list(self._person_in_room_status.keys()):
-            if prev_id not in current_centroids and self._person_in_room_status[prev_id]: # Person no longer tracked, was in room
-                 events.append({"type": "Person Disappeared (Assumed Left)", "person_id": prev_id, "timestamp": time.time()})
-                 logger.info(f"Person ID {prev_id} disappeared from view (assumed left).")
-                 del self._person_in_room_status[prev_id]
-
-
-        for person_id, current_centroid in current_centroids.items():
-            prev_centroid = self._prev_person_centroids.get(person_id)
-            
-            x, y = current_centroid
-            # Check if person is inside the main classroom zone
-            is_in_classroom_now = (classroom_zone[0] < x < classroom_zone[2] and
-                                   classroom_zone[1] < y < classroom_zone[3])
-
-            # Logic for "Unauthorized Entry"
-            # If a person appears who wasn't in the "room" before and is now, or if they enter a specific restricted zone
-            # For simplicity, let's say "unauthorized entry" is a new person appearing in the classroom zone
-            if person_id not in self._person_in_room_status and is_in_classroom_now:
-                events.append({"type": "Unauthorized Entry", "person_id": person_id, "timestamp": time.time()})
-                logger.warning(f"ALERT: Unauthorized Entry detected for Person ID {person_id}!")
-                self._person_in_room_status[person_id] = True # Mark as in room
-
-            # Logic for "Leaving the Room"
-            # If person was in room and now is outside room and crossed doorway line
-            if prev_centroid and self._person_in_room_status.get(person_id, False):
-                prev_x, prev_y = prev_centroid
-                
-                # Check if crossed doorway line (from above to below, or vice-versa)
-                # This assumes doorway_line is horizontal
-                crossed_doorway = False
-                if prev_y <= doorway_y and y > doorway_y: # Crossed from top to bottom
-                    crossed_doorway = True
-                elif prev_y >= doorway_y and y < doorway_y: # Crossed from bottom to top
-                    crossed_doorway = True
-                
-                if crossed_doorway and not is_in_classroom_now: # If crossed doorway and now outside room
-                    events.append({"type": "Leaving Room", "person_id": person_id, "timestamp": time.time()})
-                    logger.warning(f"ALERT: Person ID {person_id} is leaving the room!")
-                    self._person_in_room_status[person_id] = False # Mark as left room
-
-
-        self._prev_person_centroids = current_centroids.copy() # Update previous centroids for next frame
-
-        return events, doorway_line, classroom_zone # Return events and zone info for drawing
-
-    def is_running(self):
-        """Check if the stream is currently active."""
-        return self._running and self._cap and self._cap.isOpened()
-
-    def get_detected_objects(self):
-        """Returns the raw object detection results for the current frame."""
-        with self._frame_lock:
-            return self._detected_objects_info.copy()
-
-    def get_tracked_persons(self):
-        """Returns the data for currently tracked persons (with IDs, centroids, etc.)."""
-        with self._frame_lock:
-            return self._tracked_persons_data.copy()
-
-    async def generate_frames(self):
-        """Generator function to yield processed video frames."""
-        if not self.is_running():
-            logger.warning("Attempted to generate frames but stream is not open or running.")
-            # Return a blank frame if no stream is active, or stop the loop immediately
-            blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            _, buffer = cv2.imencode('.jpg', blank_frame)
-            yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-            return
-
-        # Ensure only one generator loop is active per VideoStreamManager instance
-        # This prevents multiple /video_feed requests from trying to read from the same manager simultaneously
-        if hasattr(self, '_generator_active') and self._generator_active:
-            logger.warning("Another generator is already active. Only one video feed client supported per stream manager.")
-            return # Prevent multiple generators from running concurrently on the same manager
-
-        # Using a distinct flag for generator activity, initialized in _initialize
-        self._generator_active = True
-        logger.info(f"Starting frame generation loop.") # Removed self.rtsp_url as it's not always rtsp
-
-        try:
-            while self._running: # Use _running flag to control the loop
-                # Acquire lock to safely read the current frame
-                with self._frame_lock:
-                    frame = self._current_frame
-
-                if frame is None:
-                    await asyncio.sleep(0.05) # Wait if no frame is available yet
-                    continue
-
-                _, buffer = cv2.imencode('.jpg', frame) # Encode the annotated frame
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                      b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                await asyncio.sleep(0.01) # Use asyncio.sleep for non-blocking delay
+        if not self.ensure_model_loaded():
+            logger.error(f"Cannot start stream '{stream_id}': the model is {self._model_status['state']}.")
+            return False
+        stream = self._get_or_create_stream(stream_id)
+        stream.update_settings(**settings)
+        return stream.start(stream_source)
+
+    def submit_start(self, stream_source: str, stream_id: str = DEFAULT_STREAM_ID, **settings):
+        """Queues start_stream as a background job (see StreamJobQueue). Returns the job_id."""
+        return self._lifecycle_jobs.submit(stream_id, "start", self.start_stream, (stream_source, stream_id), settings,
+                                           source=stream_source)
+
+    def submit_stop(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Queues stop_stream as a background job; it runs after the stream's earlier jobs. Returns the job_id."""
+        return self._lifecycle_jobs.submit(stream_id, "stop", self.stop_stream, (stream_id,))
+
+    def get_stream_job(self, job_id):
+        """Status of a start/stop job ('queued', 'running', 'completed', 'failed'), or None if unknown."""
+        return self._lifecycle_jobs.get_job(job_id)
+
+    def stream_job_future(self, job_id):
+        """concurrent Future of a start/stop job (result: True on success), or None if unknown."""
+        return self._lifecycle_jobs.future(job_id)
+
+    def list_stream_jobs(self, stream_id=None):
+        """Newest-first start/stop jobs, optionally of one stream."""
+        return self._lifecycle_jobs.list_jobs(stream_id)
+
+    def update_stream_settings(self, stream_id: str, **settings):
+        """Changes settings of a registered stream. Returns its new status, or None if unknown."""
+        stream = self.get_stream(stream_id)
+        if stream is None:
+            return None
+        stream.update_settings(**settings)
+        return stream.get_status()
+
+    def stop_stream(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Signals one stream to stop, releases its resources and removes it from the registry."""
+        stream = self.get_stream(stream_id)
+        if stream is None:
+            logger.info(f"No stream registered with ID '{stream_id}'.")
+            return False
+        stopped = stream.stop()
+        with self._registry_lock:
+            if self._streams.get(stream_id) is stream and not stream.is_running():
+                del self._streams[stream_id]
+                self._metrics_registry.remove_labels(stream=stream_id) # Don't export stale series
+        return stopped
+
+    def stop_all_streams(self):
+        """Stops every registered stream (used on application shutdown)."""
+        with self._registry_lock:
+            stream_ids = list(self._streams.keys())
+        for stream_id in stream_ids:
+            self.stop_stream(stream_id)
+
+    def shutdown(self):
+        """Stops every stream and the shared inference worker."""
+        self._lifecycle_jobs.shutdown() # Queued starts would only be stopped again
+        self.stop_all_streams()
+        self._inference_scheduler.stop()
+        self._event_store.stop() # Flushes events still waiting for the writer
+        if self._recording_writer is not None:
+            self._recording_writer.shutdown() # Finish recordings that are being written
+
+    def get_stream_zones(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Returns the active zone config of a stream, or the saved one if it isn't registered."""
+        stream = self.get_stream(stream_id)
+        return stream.get_zones() if stream else load_zone_config(stream_id)
+
+    def set_stream_zones(self, stream_id: str, config, persist=True):
+        """
+        Validates a zone config, applies it to the stream if registered and saves it so it is
+        used again after a restart.
+        Raises:
+            ValueError: If the config is invalid.
+        """
+        stream = self.get_stream(stream_id)
+        config = stream.set_zones(config) if stream else validate_zone_config(config)
+        if persist:
+            save_zone_config(stream_id, config)
+        return config
 
-        except Exception as e:
-            logger.error(f"Error during frame generation: {e}")
-        finally:
-            logger.info("Frame generation loop exiting.")
-            self._generator_active = False # Mark generator as inactive
+    def get_occupancy(self, stream_id: str, since=None, until=None, resolution=None, limit=500):
+        """
+        Occupancy curve and dwell summary of a stream (running or stopped), or None if it never ran.
+        Raises:
+            ValueError: For an unknown resolution or since > until.
+        """
+        with self._registry_lock:
+            occupancy = self._occupancy.get(stream_id)
+        if occupancy is None:
+            return None
+        return {
+            "occupancy": occupancy.occupancy_curve(since=since, until=until, resolution=resolution),
+            "dwell": occupancy.dwell_summary(since=since, until=until, limit=limit),
+        }
+
+    def get_inference_stats(self):
+        """Returns batch latency/fill statistics from the shared InferenceScheduler."""
+        return self._inference_scheduler.get_stats()
+
+    def configure_inference(self, max_batch_size=None, max_wait_ms=None):
+        """Changes the batching parameters of the shared InferenceScheduler at runtime."""
+        self._inference_scheduler.configure(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        return self._inference_scheduler.get_stats()
+
+    def query_events(self, **filters):
+        """Returns one page of stored zone events (see EventStore.query)."""
+        return self._event_store.query(**filters)
+
+    def summarize_events(self, **filters):
+        """Returns stored zone event counts per stream/type (see EventStore.summary)."""
+        return self._event_store.summary(**filters)
+
+    def list_recordings(self, stream_id=None, limit=100):
+        """Newest-first metadata of saved event recordings."""
+        if self._recording_writer is None:
+            return []
+        return self._recording_writer.list_recordings(stream_id=stream_id, limit=limit)
+
+    def get_recording_file(self, stream_id, recording_id, filename):
+        """Path of a file (snapshot.jpg, frame_000.jpg, clip.avi, meta.json) of a recording, or None."""
+        if self._recording_writer is None:
+            return None
+        return self._recording_writer.file_path(stream_id, recording_id, filename)
+
+    def get_stream_profile(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Returns per-stage latency percentiles of a stream, or None if unknown."""
+        stream = self.get_stream(stream_id)
+        return stream.get_profile() if stream else None
+
+    def _collect_metrics(self):
+        """Metrics collector: per-stream and inference gauges/counters."""
+        with self._registry_lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            yield from stream.get_metric_samples()
+        yield from self._inference_scheduler.get_metric_samples()
+        yield "classycam_stream_jobs_pending", "gauge", "Stream start/stop jobs queued or running.", {}, self._lifecycle_jobs.pending()
+        yield "classycam_model_ready", "gauge", "1 once the shared model is loaded and warmed up.", {}, int(self.is_ready())
+        if self._model_status["load_seconds"] is not None:
+            yield "classycam_model_load_seconds", "gauge", "Time spent importing and loading the model.", {}, self._model_status["load_seconds"]
+
+    def render_metrics(self):
+        """Prometheus text exposition of every pipeline metric."""
+        return self._metrics_registry.render_prometheus()
+
+    def is_running(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Check if the given stream is currently active."""
+        stream = self.get_stream(stream_id)
+        return stream is not None and stream.is_running()
+
+    def any_running(self):
+        """Check if at least one stream is currently active."""
+        with self._registry_lock:
+            streams = list(self._streams.values())
+        return any(stream.is_running() for stream in streams)
+
+    def get_detected_objects(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Returns the raw object detection results for the current frame of a stream."""
+        stream = self.get_stream(stream_id)
+        return stream.get_detected_objects() if stream else []
+
+    def get_tracked_persons(self, stream_id: str = DEFAULT_STREAM_ID):
+        """Returns the data for currently tracked persons of a stream."""
+        stream = self.get_stream(stream_id)
+        return stream.get_tracked_persons() if stream else {}
 
 
 # Helper to get the singleton instance
@@ -340,4 +369,4 @@ def get_video_stream_manager():
         _current_video_stream_instance = VideoStreamManager()
         # _initialize is now called from __init__ which is called when VideoStreamManager() is created
         # No need to call set_detector here, as ObjectDetector is initialized directly in _initialize
-    return _current_video_stream_instance
\ No newline at end of file
+    return _current_video_stream_instance
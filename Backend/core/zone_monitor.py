@@ -0,0 +1,146 @@
+# src/core/zone_monitor.py
+import copy
+import time
+import logging
+import threading
+import numpy as np
+from core.zones import ZoneLayout, DEFAULT_ZONE_CONFIG, validate_zone_config
+from core.person_tracker import track_arrays
+
+logger = logging.getLogger(__name__)
+
+class ZoneMonitor:
+    """
+    Zone geometry and entry/exit event logic for one camera view. Shared by the live
+    VideoStream pipeline and offline video analysis so both produce the same events.
+    Zones are polygons and doorways are lines from a zone config (see core.zones), which can be
+    replaced at runtime; the pixel layout is rebuilt only when the config or frame size changes.
+    """
+
+    def __init__(self, name="zones", config=None):
+        """
+        Args:
+            config (dict): Zone config (see core.zones.validate_zone_config); None = DEFAULT_ZONE_CONFIG.
+        """
+        self.name = name # Used in log messages (the stream ID)
+        self._config = validate_zone_config(config if config is not None else DEFAULT_ZONE_CONFIG)
+        self._layout = None # ZoneLayout for the last frame size
+        self._config_lock = threading.Lock()
+        self.version = 0 # Bumped on every configure(); lets callers invalidate their own caches
+        # Centroids from the previous frame for tracking movement, sorted by ID for vectorized lookups
+        self._prev_ids = np.empty(0, dtype=np.int64)
+        self._prev_points = np.empty((0, 2), dtype=np.float64)
+        self._person_in_room_status = {} # {person_id: True/False} status for zone logic; only tracked IDs
+        self._returned = [] # Re-identified persons to report with the next check()
+
+    def reset(self):
+        """Forgets all per-person state (new session / new video)."""
+        self._prev_ids = np.empty(0, dtype=np.int64) # Clear zone tracking data
+        self._prev_points = np.empty((0, 2), dtype=np.float64)
+        self._person_in_room_status = {} # Clear zone status
+        self._returned = []
+
+    def readmit(self, person_id):
+        """
+        Puts a person who was in the room when their track was lost back in the room (they were
+        re-identified, see core.reid), so coming back into view is reported by the next check() as
+        "Person Returned" instead of a new "Unauthorized Entry".
+        """
+        if person_id not in self._person_in_room_status: # Otherwise the zones never lost them
+            self._person_in_room_status[person_id] = True
+            self._returned.append(person_id)
+
+    def configure(self, config):
+        """
+        Replaces the zones and lines. Per-person state is kept, so people already in the room
+        can still be seen leaving through the new doorways.
+        Raises:
+            ValueError: If the config is invalid (the current one stays active).
+        """
+        config = validate_zone_config(config)
+        with self._config_lock:
+            self._config = config
+            self._layout = None
+            self.version += 1
+        logger.info(f"[{self.name}] Zones updated: {len(config['zones'])} zone(s), {len(config['lines'])} line(s).")
+        return config
+
+    def in_room_ids(self):
+        """IDs of the persons currently counted as in the room."""
+        return {person_id for person_id, in_room in self._person_in_room_status.items() if in_room}
+
+    def get_config(self):
+        with self._config_lock:
+            return copy.deepcopy(self._config)
+
+    def layout(self, frame_width, frame_height):
+        """Returns the ZoneLayout for a frame size, building it (masks included) only when needed."""
+        with self._config_lock:
+            if self._layout is None or self._layout.size != (frame_width, frame_height):
+                self._layout = ZoneLayout(self._config, frame_width, frame_height)
+            return self._layout
+
+    def check(self, tracked_persons, frame_width, frame_height, timestamp=None):
+        """
+        Checks tracked persons against the zones for entry/exit events.
+        Args:
+            tracked_persons (TrackSnapshot | dict): From PersonTracker, or {person_id: {'centroid': (x, y), ...}}.
+            timestamp (float): Event time; defaults to now (offline analysis passes the video time).
+        Returns:
+            list: Event dicts {'type', 'person_id', 'timestamp'} plus the 'zone' entered or 'line' crossed.
+        """
+        layout = self.layout(frame_width, frame_height)
+
+        events = []
+        timestamp = time.time() if timestamp is None else timestamp
+
+        ids, centroids, _ = track_arrays(tracked_persons)
+        person_ids = ids.tolist()
+        current_ids = set(person_ids)
+
+        # Forget every person no longer tracked; those who were in the room are assumed to have left
+        for prev_id in [p for p in self._person_in_room_status if p not in current_ids]:
+            if self._person_in_room_status.pop(prev_id): # Person no longer tracked, was in room
+                events.append({"type": "Person Disappeared (Assumed Left)", "person_id": prev_id, "timestamp": timestamp})
+                logger.info(f"[{self.name}] Person ID {prev_id} disappeared from view (assumed left).")
+        for person_id in self._returned:
+            if person_id in current_ids:
+                events.append({"type": "Person Returned", "person_id": person_id, "timestamp": timestamp})
+                logger.info(f"[{self.name}] Person ID {person_id} is back in view (re-identified).")
+        self._returned = []
+
+        points = centroids.astype(np.float64)
+        if person_ids:
+            # Geometry for all tracks at once: zone membership from the mask, crossings against every segment
+            prev_points = points.copy() # No history = no movement
+            if len(self._prev_ids):
+                index = np.minimum(np.searchsorted(self._prev_ids, ids), len(self._prev_ids) - 1)
+                known = self._prev_ids[index] == ids
+                prev_points[known] = self._prev_points[index[known]]
+            zone_bits = layout.zones_at(points)
+            crossed = layout.crossings(prev_points, points)
+            crossed_any = crossed.any(axis=1).tolist() # Plain lists: per-element numpy access is slow
+
+            for row, (person_id, bits) in enumerate(zip(person_ids, zone_bits.tolist())):
+                is_in_classroom_now = bits != 0
+
+                # Logic for "Unauthorized Entry"
+                # For simplicity, "unauthorized entry" is a new person appearing in any monitored zone
+                if person_id not in self._person_in_room_status and is_in_classroom_now:
+                    zone = layout.first_zone(bits)
+                    events.append({"type": "Unauthorized Entry", "person_id": person_id, "timestamp": timestamp, "zone": zone})
+                    logger.warning(f"[{self.name}] ALERT: Unauthorized Entry detected for Person ID {person_id} in '{zone}'!")
+                    self._person_in_room_status[person_id] = True # Mark as in room
+
+                # Logic for "Leaving the Room"
+                # If person was in room, crossed a doorway line and is now outside every zone
+                if self._person_in_room_status.get(person_id, False) and not is_in_classroom_now and crossed_any[row]:
+                    line = layout.line_names[int(np.argmax(crossed[row]))]
+                    events.append({"type": "Leaving Room", "person_id": person_id, "timestamp": timestamp, "line": line})
+                    logger.warning(f"[{self.name}] ALERT: Person ID {person_id} is leaving the room through '{line}'!")
+                    self._person_in_room_status[person_id] = False # Mark as left room
+
+        order = np.argsort(ids) # Update previous centroids for next frame
+        self._prev_ids, self._prev_points = ids[order], points[order]
+
+        return events
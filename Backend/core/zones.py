@@ -0,0 +1,208 @@
+# src/core/zones.py
+import os
+import json
+import logging
+import cv2
+import numpy as np
+from core.event_recorder import safe_name
+
+logger = logging.getLogger(__name__)
+
+# Per-stream zone files: <CLASSYCAM_ZONES_DIR>/<stream_id>.json, written by PUT /streams/{stream_id}/zones
+ZONES_DIR = os.getenv("CLASSYCAM_ZONES_DIR", "config/zones")
+MAX_ZONES = 64 # One bit per zone in the lookup mask
+
+# Coordinates are fractions of the frame width/height, so one config fits every resolution of a camera.
+# 'zones' are polygons (the monitored room areas), 'lines' are polylines whose segments are doorways.
+DEFAULT_ZONE_CONFIG = {
+    "zones": [{"name": "Classroom Zone", "polygon": [[0.1, 0.1], [0.9, 0.1], [0.9, 0.9], [0.1, 0.9]]}],
+    "lines": [{"name": "Doorway", "points": [[0.0, 0.75], [1.0, 0.75]]}],
+}
+DEFAULT_ZONE_COLOR = (0, 255, 255) # Yellow
+DEFAULT_LINE_COLOR = (255, 0, 0) # Blue
+
+
+def _parse_points(value, minimum, what):
+    try:
+        points = [(float(x), float(y)) for x, y in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"{what}: expected a list of [x, y] pairs")
+    if len(points) < minimum:
+        raise ValueError(f"{what}: needs at least {minimum} points")
+    if any(not (0.0 <= v <= 1.0) for point in points for v in point):
+        raise ValueError(f"{what}: coordinates are fractions of the frame size and must be within [0, 1]")
+    return [list(point) for point in points]
+
+
+def _parse_color(value, default, what):
+    if value is None:
+        return list(default)
+    if not isinstance(value, (list, tuple)) or len(value) != 3 or any(not 0 <= int(c) <= 255 for c in value):
+        raise ValueError(f"{what}: color must be [b, g, r] with values 0-255")
+    return [int(c) for c in value]
+
+
+def validate_zone_config(config):
+    """
+    Checks a zone config and returns a normalized copy.
+    Raises:
+        ValueError: With a message suitable for API clients.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("Zone config must be an object with 'zones' and 'lines'")
+    zones, lines, names = [], [], set()
+    for index, zone in enumerate(config.get("zones") or []):
+        name = str(zone.get("name") or f"Zone {index + 1}")
+        if name in names:
+            raise ValueError(f"Duplicate zone/line name '{name}'")
+        names.add(name)
+        zones.append({"name": name,
+                      "polygon": _parse_points(zone.get("polygon"), 3, f"Zone '{name}'"),
+                      "color": _parse_color(zone.get("color"), DEFAULT_ZONE_COLOR, f"Zone '{name}'")})
+    for index, line in enumerate(config.get("lines") or []):
+        name = str(line.get("name") or f"Line {index + 1}")
+        if name in names:
+            raise ValueError(f"Duplicate zone/line name '{name}'")
+        names.add(name)
+        lines.append({"name": name,
+                      "points": _parse_points(line.get("points"), 2, f"Line '{name}'"),
+                      "color": _parse_color(line.get("color"), DEFAULT_LINE_COLOR, f"Line '{name}'")})
+    if len(zones) > MAX_ZONES:
+        raise ValueError(f"At most {MAX_ZONES} zones are supported")
+    return {"zones": zones, "lines": lines}
+
+
+def zone_config_path(stream_id):
+    return os.path.join(ZONES_DIR, f"{safe_name(stream_id)}.json")
+
+
+def load_zone_config(stream_id=None, path=None):
+    """
+    Returns the validated zone config of a stream (or from an explicit JSON file), falling back
+    to DEFAULT_ZONE_CONFIG when there is none or it is invalid.
+    """
+    path = path or (zone_config_path(stream_id) if stream_id is not None else None)
+    if path and os.path.exists(path):
+        try:
+            with open(path) as f:
+                return validate_zone_config(json.load(f))
+        except (OSError, ValueError) as e: # json.JSONDecodeError is a ValueError
+            logger.error(f"Invalid zone config {path}: {e}; using the default zones.")
+    return validate_zone_config(DEFAULT_ZONE_CONFIG)
+
+
+def save_zone_config(stream_id, config):
+    """Writes a (validated) config to the stream's zone file atomically."""
+    path = zone_config_path(stream_id)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ZoneLayout:
+    """
+    A zone config resolved to pixel coordinates for one frame size. Built once per (config, size):
+    a per-pixel bitmask of the zones answers point-in-polygon for all tracks with one fancy-index
+    lookup, and line segments are kept as arrays for vectorized crossing tests.
+    """
+
+    def __init__(self, config, frame_width, frame_height):
+        self.size = (frame_width, frame_height)
+        scale = np.array([frame_width, frame_height], dtype=np.float64)
+
+        self.zone_names = [zone["name"] for zone in config["zones"]]
+        self.zone_colors = [tuple(zone["color"]) for zone in config["zones"]]
+        self.zone_polygons = [np.round(np.array(zone["polygon"]) * scale).astype(np.int32) for zone in config["zones"]]
+
+        # Every polyline is split into segments; segment_line maps a segment back to its line
+        self.line_names = [line["name"] for line in config["lines"]]
+        self.line_colors = [tuple(line["color"]) for line in config["lines"]]
+        self.line_points = [np.round(np.array(line["points"]) * scale).astype(np.int32) for line in config["lines"]]
+        starts, ends, segment_line = [], [], []
+        for line_index, points in enumerate(self.line_points):
+            starts.extend(points[:-1])
+            ends.extend(points[1:])
+            segment_line.extend([line_index] * (len(points) - 1))
+        self._segment_a = np.array(starts, dtype=np.float64).reshape(-1, 2)
+        self._segment_b = np.array(ends, dtype=np.float64).reshape(-1, 2)
+        self._segment_line = np.array(segment_line, dtype=np.int64)
+
+        # Smallest unsigned type with a bit per zone
+        count = len(self.zone_polygons)
+        dtype = np.uint8 if count <= 8 else np.uint16 if count <= 16 else np.uint32 if count <= 32 else np.uint64
+        self.mask = np.zeros((frame_height, frame_width), dtype=dtype)
+        layer = np.zeros((frame_height, frame_width), dtype=np.uint8)
+        for bit, polygon in enumerate(self.zone_polygons):
+            layer[:] = 0
+            cv2.fillPoly(layer, [polygon], 1)
+            self.mask[layer.view(bool)] |= dtype(1 << bit)
+
+        all_points = self.zone_polygons + self.line_points
+        if all_points:
+            stacked = np.concatenate(all_points)
+            self.bounds = (int(stacked[:, 0].min()), int(stacked[:, 1].min()),
+                           int(stacked[:, 0].max()), int(stacked[:, 1].max())) # x1, y1, x2, y2
+        else:
+            self.bounds = (0, 0, frame_width, frame_height)
+
+    def zones_at(self, points):
+        """
+        Args:
+            points (np.ndarray): (N, 2) pixel coordinates.
+        Returns:
+            np.ndarray: (N,) zone bitfields (bit i set = inside zone i); 0 outside every zone or the frame.
+        """
+        points = np.asarray(points).reshape(-1, 2).astype(np.int64)
+        frame_width, frame_height = self.size
+        inside_frame = ((points[:, 0] >= 0) & (points[:, 0] < frame_width) &
+                        (points[:, 1] >= 0) & (points[:, 1] < frame_height))
+        bits = np.zeros(len(points), dtype=self.mask.dtype)
+        bits[inside_frame] = self.mask[points[inside_frame, 1], points[inside_frame, 0]]
+        return bits
+
+    def first_zone(self, bits):
+        """Name of the lowest zone set in a bitfield."""
+        bits = int(bits)
+        return self.zone_names[(bits & -bits).bit_length() - 1] if bits else None
+
+    def crossings(self, prev_points, points):
+        """
+        Tests every movement prev_points[i] -> points[i] against every line segment at once.
+        A movement that starts on a segment and leaves it counts as a crossing; one that ends on
+        it does not (it is counted on the next frame), so a person is never counted twice.
+        Returns:
+            np.ndarray: (N, number of lines) bool.
+        """
+        p0 = np.asarray(prev_points, dtype=np.float64).reshape(-1, 1, 2)
+        p1 = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        crossed_lines = np.zeros((p0.shape[0], len(self.line_names)), dtype=bool)
+        if not len(self._segment_a) or not p0.shape[0]:
+            return crossed_lines
+        a, b = self._segment_a[None], self._segment_b[None] # (1, S, 2)
+
+        def cross(u, v):
+            return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+        # Sides of the segment's line the movement starts/ends on, and sides of the movement the segment ends lie on
+        side_start, side_end = cross(b - a, p0 - a), cross(b - a, p1 - a)
+        side_a, side_b = cross(p1 - p0, a - p0), cross(p1 - p0, b - p0)
+        crossed = ((((side_start <= 0) & (side_end > 0)) | ((side_start >= 0) & (side_end < 0))) &
+                   (side_a * side_b <= 0)) # (N, S)
+        rows, segments = np.nonzero(crossed)
+        crossed_lines[rows, self._segment_line[segments]] = True
+        return crossed_lines
+
+    def draw(self, frame):
+        """Draws zone outlines and doorway lines with their names onto frame (in place)."""
+        for name, polygon, color in zip(self.zone_names, self.zone_polygons, self.zone_colors):
+            cv2.polylines(frame, [polygon], True, color, 2)
+            x, y = polygon.min(axis=0)
+            cv2.putText(frame, name, (int(x) + 10, int(y) + 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        for name, points, color in zip(self.line_names, self.line_points, self.line_colors):
+            cv2.polylines(frame, [points], False, color, 2)
+            cv2.putText(frame, name, (int(points[0][0]) + 10, int(points[0][1]) - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        return frame
@@ -0,0 +1,39 @@
+# routes/analysis_routes.py
+from typing import List
+from fastapi import APIRouter, Body
+from fastapi.responses import JSONResponse
+from core.offline_analyzer import get_analysis_job_manager, ANALYSIS_MAX_WORKERS, MAX_BATCH_SIZE
+from core.video_stream_manager import get_video_stream_manager, DETECTOR_BACKEND, DETECTOR_INT8
+
+router = APIRouter()
+
+# Queues faster-than-real-time analysis of recorded videos (files on the server, under the media root)
+# Plain def: checking the files and loading saved zones touch the disk, so it runs in the threadpool
+@router.post("/api/analysis_jobs")
+def create_analysis_job(
+    video_paths: List[str] = Body(..., embed=True, description="Video files inside CLASSYCAM_MEDIA_ROOT (relative to it)"),
+    workers: int = Body(1, embed=True, ge=1, le=ANALYSIS_MAX_WORKERS, description="Processes (each loads its own model)"),
+    batch_size: int = Body(16, embed=True, ge=1, le=MAX_BATCH_SIZE),
+    imgsz: int = Body(None, embed=True, ge=32),
+    frame_step: int = Body(1, embed=True, ge=1, description="Analyze every Nth frame"),
+    zones_stream_id: str = Body(None, embed=True, description="Use the zones of this camera stream (default zones if omitted)")
+):
+    zones = get_video_stream_manager().get_stream_zones(zones_stream_id) if zones_stream_id else None
+    try:
+        job_id = get_analysis_job_manager().submit(video_paths, workers=workers, batch_size=batch_size, imgsz=imgsz,
+                                                   frame_step=frame_step, backend=DETECTOR_BACKEND, int8=DETECTOR_INT8, zones=zones)
+    except (ValueError, FileNotFoundError) as e:
+        return JSONResponse(content={"success": False, "message": str(e)}, status_code=400)
+    return {"success": True, "job_id": job_id}
+
+@router.get("/api/analysis_jobs")
+def list_analysis_jobs():
+    return {"jobs": get_analysis_job_manager().list_jobs()}
+
+# Poll a job; 'results' holds each file's summary (see core/offline_analyzer.py) once it is done
+@router.get("/api/analysis_jobs/{job_id}")
+def get_analysis_job(job_id: str):
+    job = get_analysis_job_manager().get_job(job_id)
+    if job is None:
+        return JSONResponse(content={"success": False, "message": f"Unknown job '{job_id}'."}, status_code=404)
+    return {"success": True, "job": job}
@@ -0,0 +1,64 @@
+# routes/event_routes.py
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, FileResponse
+from core.video_stream_manager import get_video_stream_manager
+
+router = APIRouter()
+
+# Stored zone events, newest first; pass next_cursor back as cursor to get the following page
+@router.get("/api/events")
+def get_events(
+    stream_id: str = Query(None, description="Only events of this stream"),
+    event_type: str = Query(None, description="e.g. 'Unauthorized Entry', 'Leaving Room'"),
+    since: float = Query(None, description="Unix timestamp (inclusive)"),
+    until: float = Query(None, description="Unix timestamp (exclusive)"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = Query(None, description="next_cursor from the previous page")
+):
+    try:
+        page = get_video_stream_manager().query_events(stream_id=stream_id, event_type=event_type, since=since, until=until,
+                                                       limit=limit, cursor=cursor)
+    except ValueError:
+        return JSONResponse(content={"status": "error", "message": "Invalid cursor."}, status_code=400)
+    return {"status": "success", **page}
+
+# Event counts per stream and type, optionally per time bucket, for reports
+@router.get("/api/events/summary")
+def get_events_summary(
+    stream_id: str = Query(None),
+    since: float = Query(None),
+    until: float = Query(None),
+    bucket_seconds: int = Query(None, ge=1, description="Also group by time buckets of this size")
+):
+    counts = get_video_stream_manager().summarize_events(stream_id=stream_id, since=since, until=until, bucket_seconds=bucket_seconds)
+    return {"status": "success", "counts": counts}
+
+# Saved snapshot/clip recordings around events (each event carries its 'recording_id')
+@router.get("/api/recordings")
+def get_recordings(stream_id: str = Query(None), limit: int = Query(100, ge=1, le=1000)):
+    return {"status": "success", "recordings": get_video_stream_manager().list_recordings(stream_id=stream_id, limit=limit)}
+
+# e.g. /api/recordings/room1/1718000000000/snapshot.jpg for the alert thumbnail
+@router.get("/api/recordings/{stream_id}/{recording_id}/{filename}")
+def get_recording_file(stream_id: str, recording_id: str, filename: str):
+    path = get_video_stream_manager().get_recording_file(stream_id, recording_id, filename)
+    if path is None:
+        return JSONResponse(content={"status": "error", "message": "Recording file not found."}, status_code=404)
+    return FileResponse(path)
+
+# Occupancy curve and per-track dwell times of a stream over a class period, for attendance reports
+@router.get("/api/occupancy/{stream_id}")
+def get_occupancy(
+    stream_id: str,
+    since: float = Query(None, description="Unix timestamp; default: one hour before until"),
+    until: float = Query(None, description="Unix timestamp; default: now"),
+    resolution: int = Query(None, description="Bucket size in seconds (1, 60 or 3600); default: finest that fits"),
+    limit: int = Query(500, ge=0, le=20000, description="Max per-track dwell entries")
+):
+    try:
+        result = get_video_stream_manager().get_occupancy(stream_id, since=since, until=until, resolution=resolution, limit=limit)
+    except ValueError as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=400)
+    if result is None:
+        return JSONResponse(content={"status": "error", "message": f"No occupancy data for stream '{stream_id}'."}, status_code=404)
+    return {"status": "success", **result}
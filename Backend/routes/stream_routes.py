@@ -1,41 +1,193 @@
 # routes/stream_routes.py - This needs to be the content from my last answer!
-from fastapi import APIRouter, Query, Body
+import json
+import asyncio
+from fastapi import APIRouter, Query, Body, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse, JSONResponse
-from core.video_stream_manager import get_video_stream_manager # Import the manager
+from core.video_stream_manager import get_video_stream_manager, DEFAULT_STREAM_ID # Import the manager
 
 router = APIRouter()
 
-# Get the singleton manager instance
-stream_manager = get_video_stream_manager()
-
-# This endpoint STARTS the stream on the backend
+# This endpoint STARTS a stream on the backend
 @router.post("/start_stream")
 async def start_stream(
-    rtsp_url: str = Body(..., embed=True, description="RTSP URL or webcam index (e.g., '0' for built-in webcam)")
+    rtsp_url: str = Body(..., embed=True, description="RTSP URL or webcam index (e.g., '0' for built-in webcam)"),
+    stream_id: str = Body(DEFAULT_STREAM_ID, embed=True, description="ID of the classroom stream (one per camera)"),
+    target_fps: float = Body(None, embed=True, gt=0, description="Detection/tracking rate for this stream (defaults to CLASSYCAM_TARGET_FPS)"),
+    adaptive_inference: bool = Body(None, embed=True, description="Skip YOLO on still frames (defaults to CLASSYCAM_ADAPTIVE_INFERENCE)"),
+    inference_imgsz: int = Body(None, embed=True, ge=32, description="YOLO input size for this stream (defaults to CLASSYCAM_INFERENCE_IMGSZ)"),
+    roi_crop: bool = Body(None, embed=True, description="Crop frames to the monitored zones before inference"),
+    capture_backend: str = Body(None, embed=True, pattern="^(opencv|pyav)$", description="Decoder (defaults to CLASSYCAM_CAPTURE_BACKEND)"),
+    decode_threads: int = Body(None, embed=True, ge=0, le=32, description="FFmpeg decoder threads (0 = backend default)"),
+    decode_skip: bool = Body(None, embed=True, description="Only convert the frames the detection stage can use"),
+    decode_width: int = Body(None, embed=True, ge=0, description="Decode at this width (webcams / pyav; 0 = native)"),
+    substream_url: str = Body(None, embed=True, description="Lower-resolution stream of the same camera to decode instead"),
+    idle_keyframes: bool = Body(None, embed=True, description="Decode keyframes only while nobody is tracked (pyav)"),
+    reid: bool = Body(None, embed=True, description="Re-identify lost people by appearance to keep their IDs (defaults to CLASSYCAM_REID)"),
+    wait: bool = Body(True, embed=True, description="False: answer 202 with a job_id right away and poll /stream_jobs/{job_id}")
 ):
-    success = stream_manager.start_stream(rtsp_url)
+    # Opening a camera can take seconds (timeouts, model loading); it runs as a job on the lifecycle pool
+    job_id = get_video_stream_manager().submit_start(rtsp_url, stream_id=stream_id, target_fps=target_fps,
+                                                     adaptive_inference=adaptive_inference,
+                                                     inference_imgsz=inference_imgsz, roi_crop=roi_crop,
+                                                     capture_backend=capture_backend, decode_threads=decode_threads,
+                                                     decode_skip=decode_skip, decode_width=decode_width,
+                                                     substream_url=substream_url, idle_keyframes=idle_keyframes, reid=reid)
+    if not wait:
+        return _job_accepted(job_id, stream_id, "Start queued.")
+    success = await _wait_for_job(job_id)
     if success:
-        return JSONResponse(content={"success": True, "message": "Stream started successfully!"})
+        return JSONResponse(content={"success": True, "stream_id": stream_id, "job_id": job_id, "message": "Stream started successfully!"})
     else:
-        return JSONResponse(content={"success": False, "message": "Failed to start stream. Check logs."}, status_code=500)
+        return JSONResponse(content={"success": False, "stream_id": stream_id, "job_id": job_id, "message": "Failed to start stream. Check logs."}, status_code=500)
 
-# This endpoint STOPS the stream on the backend
+# This endpoint STOPS a stream on the backend
 @router.post("/stop_stream")
-async def stop_stream():
-    success = stream_manager.stop_stream()
+async def stop_stream(
+    stream_id: str = Body(DEFAULT_STREAM_ID, embed=True, description="ID of the classroom stream to stop"),
+    wait: bool = Body(True, embed=True, description="False: answer 202 with a job_id right away")
+):
+    job_id = get_video_stream_manager().submit_stop(stream_id) # Joins threads; runs after any pending start of this stream
+    if not wait:
+        return _job_accepted(job_id, stream_id, "Stop queued.")
+    success = await _wait_for_job(job_id)
     if success:
-        return JSONResponse(content={"success": True, "message": "Stream stopped successfully!"})
+        return JSONResponse(content={"success": True, "stream_id": stream_id, "job_id": job_id, "message": "Stream stopped successfully!"})
     else:
-        return JSONResponse(content={"success": False, "message": "No active stream to stop."})
+        return JSONResponse(content={"success": False, "stream_id": stream_id, "job_id": job_id, "message": "No active stream to stop."})
 
-# This endpoint SERVES the frames from the already running stream
-@router.get("/video_feed") # Changed from /stream
-async def video_feed():
+def _job_accepted(job_id, stream_id, message):
+    return JSONResponse(status_code=202, content={"success": True, "stream_id": stream_id, "job_id": job_id, "message": message,
+                                                  "job": get_video_stream_manager().get_stream_job(job_id)})
+
+async def _wait_for_job(job_id):
+    # shield: a client hanging up must not cancel the job itself
+    return await asyncio.shield(asyncio.wrap_future(get_video_stream_manager().stream_job_future(job_id)))
+
+# Status of start/stop jobs: 'queued', 'running', 'completed' or 'failed' ('success' is the start/stop result)
+@router.get("/stream_jobs")
+async def list_stream_jobs(stream_id: str = Query(None)):
+    return {"jobs": get_video_stream_manager().list_stream_jobs(stream_id)}
+
+@router.get("/stream_jobs/{job_id}")
+async def get_stream_job(job_id: str):
+    job = get_video_stream_manager().get_stream_job(job_id)
+    if job is None:
+        return JSONResponse(content={"success": False, "message": f"Unknown job '{job_id}'."}, status_code=404)
+    return {"success": True, "job": job}
+
+# Lists every registered stream and whether it is running
+@router.get("/streams")
+async def list_streams():
+    return {"streams": get_video_stream_manager().list_streams()}
+
+# Changes processing settings of a running stream without restarting it
+@router.post("/streams/{stream_id}/settings")
+def update_stream_settings(
+    stream_id: str,
+    target_fps: float = Body(None, embed=True, gt=0),
+    adaptive_inference: bool = Body(None, embed=True),
+    inference_imgsz: int = Body(None, embed=True, ge=32),
+    roi_crop: bool = Body(None, embed=True),
+    capture_backend: str = Body(None, embed=True, pattern="^(opencv|pyav)$"),
+    decode_threads: int = Body(None, embed=True, ge=0, le=32),
+    decode_skip: bool = Body(None, embed=True),
+    decode_width: int = Body(None, embed=True, ge=0),
+    substream_url: str = Body(None, embed=True),
+    idle_keyframes: bool = Body(None, embed=True),
+    reid: bool = Body(None, embed=True)
+):
+    # Decoding options other than decode_skip/idle_keyframes apply the next time the source is (re)opened, reid at the next start
+    status = get_video_stream_manager().update_stream_settings(stream_id, target_fps=target_fps, adaptive_inference=adaptive_inference,
+                                                               inference_imgsz=inference_imgsz, roi_crop=roi_crop,
+                                                               capture_backend=capture_backend, decode_threads=decode_threads,
+                                                               decode_skip=decode_skip, decode_width=decode_width,
+                                                               substream_url=substream_url, idle_keyframes=idle_keyframes, reid=reid)
+    if status is None:
+        return JSONResponse(content={"success": False, "message": f"Unknown stream '{stream_id}'."}, status_code=404)
+    return {"success": True, "stream": status}
+
+# Zone polygons and doorway lines of a stream (coordinates are fractions of the frame size)
+# Plain def: FastAPI runs it in its threadpool, since the saved config may be read from disk
+@router.get("/streams/{stream_id}/zones")
+def get_stream_zones(stream_id: str):
+    return {"stream_id": stream_id, "zones": get_video_stream_manager().get_stream_zones(stream_id)}
+
+# Replaces the zones of a stream at runtime and saves them for the next start (file write: threadpool)
+@router.put("/streams/{stream_id}/zones")
+def set_stream_zones(
+    stream_id: str,
+    config: dict = Body(..., description='{"zones": [{"name", "polygon": [[x, y], ...]}], "lines": [{"name", "points": [[x, y], ...]}]}')
+):
+    try:
+        zones = get_video_stream_manager().set_stream_zones(stream_id, config)
+    except ValueError as e:
+        return JSONResponse(content={"success": False, "message": str(e)}, status_code=400)
+    return {"success": True, "stream_id": stream_id, "zones": zones}
+
+def _video_feed_response(stream_id: str, max_width=None, quality=None, fps=None, adaptive=False):
+    stream = get_video_stream_manager().get_stream(stream_id)
+    if stream is None:
+        return JSONResponse(content={"success": False, "message": f"Unknown stream '{stream_id}'."}, status_code=404)
     return StreamingResponse(
-        stream_manager.generate_frames(), # Calls the manager's generator
+        stream.generate_frames(max_width=max_width, quality=quality, max_fps=fps, adaptive=adaptive), # Calls the stream's generator
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
+# Per-viewer profile: remote dashboards on a thin uplink ask for less (e.g. ?max_width=640&quality=60&fps=5&adaptive=true)
+_MAX_WIDTH_QUERY = Query(None, ge=160, description="Downscale to at most this width (snapped to 160/320/480/640/800/960/1280/1920)")
+_QUALITY_QUERY = Query(None, ge=10, le=95, description="JPEG quality (default 95)")
+_FPS_QUERY = Query(None, gt=0, description="Send at most this many frames per second")
+_ADAPTIVE_QUERY = Query(False, description="Lower quality/resolution automatically while this client can't keep up")
+
+# This endpoint SERVES the frames from the already running default stream
+@router.get("/video_feed") # Changed from /stream
+async def video_feed(max_width: int = _MAX_WIDTH_QUERY, quality: int = _QUALITY_QUERY, fps: float = _FPS_QUERY,
+                     adaptive: bool = _ADAPTIVE_QUERY):
+    return _video_feed_response(DEFAULT_STREAM_ID, max_width, quality, fps, adaptive)
+
+# Per-camera variant of /video_feed
+@router.get("/video_feed/{stream_id}")
+async def video_feed_for_stream(stream_id: str, max_width: int = _MAX_WIDTH_QUERY, quality: int = _QUALITY_QUERY,
+                                fps: float = _FPS_QUERY, adaptive: bool = _ADAPTIVE_QUERY):
+    return _video_feed_response(stream_id, max_width, quality, fps, adaptive)
+
+def _encode_update(message):
+    return json.dumps(message, separators=(',', ':')) # Compact: no whitespace in the pushed JSON
+
+# Pushes tracked-person deltas and zone events of one stream (replaces polling /api/detected_objects)
+@router.websocket("/ws/streams/{stream_id}")
+async def stream_updates_ws(websocket: WebSocket, stream_id: str):
+    stream = get_video_stream_manager().get_stream(stream_id)
+    if stream is None:
+        await websocket.close(code=1008, reason=f"Unknown stream '{stream_id}'.")
+        return
+    await websocket.accept()
+    try:
+        # A slow socket just makes send_text wait; meanwhile the hub coalesces deltas for us
+        async for message in stream.subscribe_updates():
+            await websocket.send_text(_encode_update(message))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+# Server-Sent Events variant of /ws/streams/{stream_id} for clients that can't use WebSockets
+@router.get("/streams/{stream_id}/events")
+async def stream_updates_sse(stream_id: str):
+    stream = get_video_stream_manager().get_stream(stream_id)
+    if stream is None:
+        return JSONResponse(content={"success": False, "message": f"Unknown stream '{stream_id}'."}, status_code=404)
+
+    async def event_source():
+        async for message in stream.subscribe_updates():
+            yield f"event: {message['type']}\ndata: {_encode_update(message)}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Liveness probe, answered on the event loop: keep it cheap (per-stream status is GET /streams)
 @router.get("/heartbeat")
 async def heartbeat():
-    return {"status": "alive", "stream_active": stream_manager.is_running()}
\ No newline at end of file
+    return {
+        "status": "alive",
+        "stream_active": get_video_stream_manager().any_running(),
+    }